@@ -2,15 +2,33 @@
 SymptoTwin Backend - Flask API for Health Assessment & Condition Prediction
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 from flask_cors import CORS
 from flask_mail import Mail, Message
+import json
 import logging
 import os
-from typing import Dict, Any
-from utils import predict_conditions, get_condition_suggestions
-from memorymate_routes import memorymate_bp
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# Load environment variables from .env before the local modules read their
+# settings (cache sizes, hashing cost, secrets) at import time
+load_dotenv()
+
+from utils import (
+    predict_conditions,
+    predict_conditions_batch,
+    predict_conditions_incremental,
+    available_symptoms,
+    validate_prediction_input,
+    validate_incremental_input,
+    InvalidScoreToken,
+    MODELS,
+    PREDICTION_CACHE,
+    notify_knowledge_base_changed,
+)
+from memorymate_routes import memorymate_bp, is_admin_request
 from medxplain_routes import medxplain_bp
 from fakemed_routes import fakemed_bp
 from ai_routes import ai_bp
@@ -26,9 +44,6 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Load environment variables from .env when present
-load_dotenv()
-
 # Configure Flask-Mail for email notifications
 app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
 app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
@@ -48,19 +63,13 @@ app.register_blueprint(ai_bp)
 # Make mail available to blueprints
 app.mail = mail
 
-# Available symptoms list
-AVAILABLE_SYMPTOMS = [
-    "headache",
-    "fever",
-    "cough",
-    "sore_throat",
-    "chest_pain",
-    "shortness_of_breath",
-    "nausea",
-    "diarrhea",
-    "body_aches",
-    "fatigue",
-]
+
+# Largest number of records accepted by /api/predict/batch in one request
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 10000))
+
+# /api/predict/stream: longest accepted NDJSON line and records per response chunk
+STREAM_MAX_LINE_BYTES = int(os.getenv('STREAM_MAX_LINE_BYTES', 64 * 1024))
+STREAM_CHUNK_RECORDS = int(os.getenv('STREAM_CHUNK_RECORDS', 256))
 
 
 @app.route('/api/health', methods=['GET'])
@@ -87,7 +96,7 @@ def get_symptoms():
         JSON list of available symptoms
     """
     return jsonify({
-        "symptoms": AVAILABLE_SYMPTOMS
+        "symptoms": available_symptoms()
     }), 200
 
 
@@ -100,7 +109,8 @@ def predict():
     {
         "age": 22,
         "gender": "female",
-        "symptoms": ["headache", "fever"]
+        "symptoms": ["headache", "fever"],
+        "model": "naive_bayes"  (optional, defaults to PREDICTION_MODEL)
     }
     
     Returns:
@@ -116,63 +126,22 @@ def predict():
                 "status": "failed"
             }), 400
         
-        # Validate required fields
-        age = data.get('age')
-        gender = data.get('gender')
-        symptoms = data.get('symptoms', [])
-        
-        # Validation
-        if age is None:
-            return jsonify({
-                "error": "Age is required",
-                "status": "failed"
-            }), 400
+        record, error = validate_prediction_input(data)
+        if error:
+            return jsonify(error), 400
         
-        if not isinstance(age, int) or age < 0 or age > 150:
-            return jsonify({
-                "error": "Age must be a valid integer between 0 and 150",
-                "status": "failed"
-            }), 400
-        
-        if not gender or gender.lower() not in ['male', 'female']:
-            return jsonify({
-                "error": "Gender must be 'male' or 'female'",
-                "status": "failed"
-            }), 400
-        
-        if not symptoms or not isinstance(symptoms, list) or len(symptoms) == 0:
-            return jsonify({
-                "error": "At least one symptom is required",
-                "status": "failed"
-            }), 400
-        
-        # Validate symptoms
-        invalid_symptoms = [s for s in symptoms if s.lower() not in AVAILABLE_SYMPTOMS]
-        if invalid_symptoms:
-            return jsonify({
-                "error": f"Invalid symptoms: {invalid_symptoms}",
-                "status": "failed",
-                "available_symptoms": AVAILABLE_SYMPTOMS
-            }), 400
+        age, gender, symptoms = record['age'], record['gender'], record['symptoms']
         
         logger.info(f"Predicting for age={age}, gender={gender}, symptoms={symptoms}")
         
         # Get predictions
-        conditions = predict_conditions(age, gender, symptoms)
+        conditions = predict_conditions(age, gender, symptoms, model=record['model'])
         
         if not conditions:
             return jsonify({
                 "error": "No conditions found for given symptoms",
                 "status": "failed"
             }), 404
-
-        # Attach suggestions for each predicted condition
-        for cond in conditions:
-            try:
-                cond_name = cond.get('name') if isinstance(cond, dict) else str(cond)
-                cond['suggestions'] = get_condition_suggestions(cond_name)
-            except Exception:
-                cond['suggestions'] = {}
         
         # Build response
         response = {
@@ -198,6 +167,289 @@ def predict():
         }), 500
 
 
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict health conditions for many symptom records in one request.
+    
+    Expected JSON body:
+    {
+        "records": [
+            {"age": 22, "gender": "female", "symptoms": ["headache", "fever"]},
+            {"age": 40, "gender": "male", "symptoms": ["cough"], "model": "naive_bayes"},
+            ...
+        ],
+        "model": "heuristic"  (optional, default for records without their own)
+    }
+    
+    Returns:
+        JSON response with per-record conditions or per-record errors
+    """
+    try:
+        data = request.get_json()
+        records = data.get('records') if isinstance(data, dict) else None
+        model = data.get('model') if isinstance(data, dict) else None
+        
+        if not isinstance(records, list) or not records:
+            return jsonify({
+                "error": "A non-empty 'records' list is required",
+                "status": "failed"
+            }), 400
+        
+        if model is not None and (not isinstance(model, str) or model not in MODELS):
+            return jsonify({
+                "error": f"Unknown model '{model}'",
+                "status": "failed",
+                "available_models": sorted(MODELS)
+            }), 400
+        
+        if len(records) > MAX_BATCH_SIZE:
+            return jsonify({
+                "error": f"Batch size exceeds limit of {MAX_BATCH_SIZE} records",
+                "status": "failed"
+            }), 400
+        
+        # Validate every record in one pass, grouping the valid ones by model
+        # (a record's own "model" overrides the top-level one)
+        groups: Dict[Optional[str], Tuple[List[int], List[Dict[str, Any]]]] = {}
+        results: List[Dict[str, Any]] = [None] * len(records)
+        for index, record in enumerate(records):
+            validated, error = validate_prediction_input(record)
+            if error:
+                error.pop('available_symptoms', None)
+                results[index] = {"index": index, **error}
+            else:
+                indices, group = groups.setdefault(validated['model'] or model, ([], []))
+                indices.append(index)
+                group.append(validated)
+        
+        for group_model, (indices, group) in groups.items():
+            for index, conditions in zip(indices, predict_conditions_batch(group, model=group_model)):
+                if conditions:
+                    results[index] = {"index": index, "status": "success", "conditions": conditions}
+                else:
+                    results[index] = {
+                        "index": index,
+                        "error": "No conditions found for given symptoms",
+                        "status": "failed"
+                    }
+        
+        succeeded = sum(1 for r in results if r["status"] == "success")
+        logger.info(f"Batch predicted {succeeded}/{len(records)} records")
+        
+        return jsonify({
+            "status": "success",
+            "results": results,
+            "summary": {
+                "total": len(records),
+                "succeeded": succeeded,
+                "failed": len(records) - succeeded
+            },
+            "available_symptoms": available_symptoms(),
+            "message": "Prediction completed successfully. Please consult a medical professional for diagnosis."
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error in /api/predict/batch: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "status": "failed",
+            "details": str(e)
+        }), 500
+
+
+def iter_ndjson_lines(stream, max_line_bytes: int = STREAM_MAX_LINE_BYTES) -> Iterator[Tuple[int, Optional[bytes]]]:
+    """
+    Read an NDJSON body incrementally.
+    
+    Yields:
+        (line number, line bytes) for each non-blank line, or (line number, None)
+        for a line longer than max_line_bytes (its remainder is skipped)
+    """
+    line_no = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_no += 1
+        
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Drain the rest of the oversized line without buffering it
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield line_no, None
+            continue
+        
+        line = line.strip()
+        if line:
+            yield line_no, line
+
+
+@app.route('/api/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Predict health conditions for an NDJSON stream of records.
+    
+    Request body (application/x-ndjson), one record per line:
+        {"age": 22, "gender": "female", "symptoms": ["headache", "fever"]}
+    
+    Query parameters:
+        model: Optional scoring model name (default for records without their own)
+    
+    Returns:
+        NDJSON stream with one result per input line, in order, followed by a
+        {"summary": {...}} line. The body is read and answered incrementally, so
+        memory use does not depend on the input size.
+    """
+    model = request.args.get('model')
+    if model is not None and model not in MODELS:
+        return jsonify({
+            "error": f"Unknown model '{model}'",
+            "status": "failed",
+            "available_models": sorted(MODELS)
+        }), 400
+    
+    def generate() -> Iterator[str]:
+        started = time.monotonic()
+        total = succeeded = 0
+        chunk: List[str] = []
+        
+        for line_no, line in iter_ndjson_lines(request.stream):
+            total += 1
+            if line is None:
+                result = {"line": line_no, "status": "failed",
+                          "error": f"Line exceeds {STREAM_MAX_LINE_BYTES} bytes"}
+            else:
+                result = _predict_stream_record(line_no, line, model)
+            if result["status"] == "success":
+                succeeded += 1
+            
+            chunk.append(json.dumps(result, separators=(',', ':')))
+            if len(chunk) >= STREAM_CHUNK_RECORDS:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        
+        elapsed = time.monotonic() - started
+        chunk.append(json.dumps({"summary": {
+            "total": total,
+            "succeeded": succeeded,
+            "failed": total - succeeded,
+            "elapsed_seconds": round(elapsed, 3)
+        }}, separators=(',', ':')))
+        yield '\n'.join(chunk) + '\n'
+        
+        logger.info(f"Streamed predictions for {succeeded}/{total} records in {elapsed:.2f}s")
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _predict_stream_record(line_no: int, line: bytes, model: Optional[str]) -> Dict[str, Any]:
+    """Validate and score one NDJSON record (no per-record logging)."""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return {"line": line_no, "status": "failed", "error": "Invalid JSON"}
+    
+    record, error = validate_prediction_input(data)
+    if error:
+        error.pop('available_symptoms', None)
+        return {"line": line_no, **error}
+    
+    try:
+        conditions = predict_conditions(record['age'], record['gender'], record['symptoms'],
+                                        model=record['model'] or model)
+    except Exception as e:
+        return {"line": line_no, "status": "failed", "error": str(e)}
+    
+    if not conditions:
+        return {"line": line_no, "status": "failed", "error": "No conditions found for given symptoms"}
+    return {"line": line_no, "status": "success", "conditions": conditions}
+
+
+@app.route('/api/predict/incremental', methods=['POST'])
+def predict_incremental():
+    """
+    Update a running prediction as symptoms are ticked or unticked.
+    
+    Expected JSON body:
+    {
+        "token": "...",           (omit on the first call)
+        "age": 22,                (required without a token)
+        "gender": "female",       (required without a token)
+        "add": ["fever"],
+        "remove": ["headache"],
+        "model": "naive_bayes"    (optional)
+    }
+    
+    The token is an opaque signed snapshot of the running per-condition sums;
+    send the one from the previous response with the next delta.
+    
+    Returns:
+        JSON response with the current symptoms, conditions and next token
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data:
+            return jsonify({
+                "error": "No JSON data provided",
+                "status": "failed"
+            }), 400
+        
+        record, error = validate_incremental_input(data)
+        if error:
+            return jsonify(error), 400
+        
+        try:
+            conditions, token, symptoms = predict_conditions_incremental(
+                record['token'], record['add'], record['remove'],
+                age=record['age'], gender=record['gender'], model=record['model'])
+        except InvalidScoreToken as e:
+            return jsonify({
+                "error": str(e),
+                "status": "failed"
+            }), 400
+        
+        return jsonify({
+            "status": "success",
+            "token": token,
+            "symptoms": symptoms,
+            "conditions": conditions
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error in /api/predict/incremental: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "status": "failed",
+            "details": str(e)
+        }), 500
+
+
+@app.route('/api/predict/cache', methods=['GET', 'DELETE'])
+def prediction_cache():
+    """
+    Inspect or invalidate the prediction cache.
+    
+    GET returns hit/miss/eviction counters; DELETE drops every cached
+    prediction and runs the knowledge base invalidation hooks (needs
+    MEMORYMATE_ADMIN_TOKEN as the bearer token).
+    
+    Returns:
+        JSON response with cache statistics
+    """
+    if request.method == 'DELETE':
+        if not is_admin_request():
+            return jsonify({"error": "Forbidden", "status": "failed"}), 403
+        notify_knowledge_base_changed()
+        logger.info("Prediction cache invalidated")
+    
+    return jsonify({
+        "status": "success",
+        "cache": PREDICTION_CACHE.stats()
+    }), 200
+
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
@@ -0,0 +1,110 @@
+"""
+Reminder dispatch benchmark for a large morning slot.
+
+Fills a temporary SQLite store with synthetic opted-in users and medicines,
+then times one dispatch pass: the join of users with their due doses, the
+rendering of every email, and delivery through the mail queue to a local
+aiosmtpd server (or to a no-op sender with --no-smtp, which still builds and
+MIME-encodes every message).
+
+Usage:
+    python benchmarks/bench_dispatch.py [--users 100000] [--medicines 3] [--workers 4] [--no-smtp]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from flask_mail import Mail
+
+from bench_mail import local_server
+from dispatch import dispatch_reminders
+from mailer import MailQueue
+from storage import SQLiteStorage
+
+SLOT = datetime(2024, 3, 1, 8, 0)
+
+
+class EncodeOnly:
+    """Sender that MIME-encodes each message and discards it."""
+
+    def connect(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, message):
+        message.as_bytes()
+
+
+def populate(storage, users, medicines_per_user, seed):
+    rng = random.Random(seed)
+    times = ['morning', 'morning', 'afternoon', 'night']
+    user_records = ({'email': f'user{i}@example.com', 'name': f'User {i}', 'password': 'x',
+                     'created_at': None, 'email_notifications_enabled': True} for i in range(users))
+    medicine_records = ((f'user{i}@example.com',
+                         [{'id': m + 1, 'name': f'Medicine {m}', 'dosage': f'{rng.randint(1, 20) * 25}mg',
+                           'frequency': rng.choice(['once', 'twice', 'thrice']), 'time_of_day': rng.choice(times),
+                           'start_date': '2024-01-01', 'end_date': '2024-12-31', 'created_at': None}
+                          for m in range(medicines_per_user)],
+                         medicines_per_user + 1) for i in range(users))
+    return storage.import_records(user_records, medicine_records)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--medicines', type=int, default=3, help='medicines per user')
+    parser.add_argument('--workers', type=int, default=4, help='mail queue sending threads')
+    parser.add_argument('--no-smtp', action='store_true', help='encode messages without sending them')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(os.path.join(directory, 'memorymate.db'))
+        started = time.perf_counter()
+        n_users, n_medicines = populate(storage, args.users, args.medicines, args.seed)
+        print(f"Stored {n_users:,} users and {n_medicines:,} medicines in {time.perf_counter() - started:.1f}s")
+
+        controller = None
+        app = Flask(__name__)
+        if args.no_smtp:
+            mail = EncodeOnly()
+            Mail(app)
+        else:
+            controller, port = local_server()
+            app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                              MAIL_USERNAME=None, MAIL_PASSWORD=None)
+            mail = Mail(app)
+        try:
+            queue = MailQueue(app, mail, workers=args.workers, maxsize=1000)
+            started = time.perf_counter()
+            report = dispatch_reminders(queue, storage, now=SLOT)
+            queue.wait_idle()
+            elapsed = time.perf_counter() - started
+            queue.stop()
+        finally:
+            if controller is not None:
+                controller.stop()
+
+    stats = queue.stats()
+    print(f"Dispatched the {SLOT:%H:%M} slot: {report['due']:,} of {report['users']:,} users due, "
+          f"{stats['sent']:,} sent, {stats['failed'] + report['dropped'] + report['errors']} failed")
+    print(f"  join + render + queue {report['elapsed']:.1f}s, with delivery {elapsed:.1f}s "
+          f"({stats['sent'] / elapsed:,.0f} emails/sec, {stats['connections']} SMTP connections)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Reminder email throughput: one SMTP connection per email vs the mail queue.
+
+Sends the same reminder emails twice to a local debugging SMTP server: once
+with ``mail.send`` per email (a fresh connection each, as the old request
+path did) and once through mailer.MailQueue (a few workers reusing their
+connections). An aiosmtpd server is started on a free port unless --port
+points at one that is already running.
+
+Usage:
+    pip install aiosmtpd
+    python benchmarks/bench_mail.py [--emails 500] [--workers 2] [--port PORT]
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from flask_mail import Mail
+
+from mailer import MailQueue
+from utils import build_medicine_reminder_message
+
+MEDICINES = [{'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once'},
+             {'name': 'Zinc', 'dosage': '25mg', 'frequency': 'twice'}]
+
+
+def local_server():
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Sink
+    except ImportError:
+        sys.exit("aiosmtpd is not installed: pip install aiosmtpd, or pass --port of a running SMTP server")
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    controller = Controller(Sink(), hostname='127.0.0.1', port=port)
+    controller.start()
+    return controller, port
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=2, help='mail queue sending threads')
+    parser.add_argument('--port', type=int, help='port of an already running SMTP server on 127.0.0.1')
+    args = parser.parse_args()
+
+    controller, port = (None, args.port) if args.port else local_server()
+    try:
+        app = Flask(__name__)
+        app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                          MAIL_USERNAME=None, MAIL_PASSWORD=None)
+        mail = Mail(app)
+        messages = [build_medicine_reminder_message(f'user{i}@example.com', f'User {i}', MEDICINES)
+                    for i in range(args.emails)]
+
+        with app.app_context():
+            started = time.perf_counter()
+            for message in messages:
+                mail.send(message)
+            direct = time.perf_counter() - started
+        print(f"mail.send per email:  {args.emails / direct:>8,.0f} emails/sec  "
+              f"({direct / args.emails * 1000:.2f}ms each, {args.emails} connections)")
+
+        queue = MailQueue(app, mail, workers=args.workers)
+        started = time.perf_counter()
+        for message in messages:
+            queue.enqueue(message)
+        enqueued = time.perf_counter() - started
+        queue.wait_idle()
+        queued = time.perf_counter() - started
+        queue.stop()
+        stats = queue.stats()
+        print(f"MailQueue ({args.workers} workers): {args.emails / queued:>8,.0f} emails/sec  "
+              f"({stats['connections']} connections, enqueue {enqueued / args.emails * 1e6:.1f}us each, "
+              f"latency p50 {stats['latency_p50'] * 1000:.1f}ms p95 {stats['latency_p95'] * 1000:.1f}ms)")
+    finally:
+        if controller is not None:
+            controller.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Throughput benchmark comparing the prediction models.
+
+Times uncached rankings (predictions/sec) for every registered model, on the
+shipped knowledge base and on a synthetic large catalog.
+
+Usage:
+    python benchmarks/bench_models.py [--requests 20000] [--symptoms 5000] [--conditions 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_predict import synthetic_knowledge_base
+from prediction_models import MODELS
+import utils
+
+
+def throughput(model, kb, requests, top_n=5):
+    # Builds any per-version tables outside the timed loop
+    model.rank(kb, 30, "female", requests[0][2], top_n)
+
+    started = time.perf_counter()
+    for age, gender, symptoms in requests:
+        model.rank(kb, age, gender, symptoms, top_n)
+    return len(requests) / (time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--symptoms', type=int, default=5000)
+    parser.add_argument('--conditions', type=int, default=20000)
+    parser.add_argument('--per-symptom', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    catalogs = [
+        ("shipped", utils.get_knowledge_base()),
+        (f"synthetic {args.symptoms}x{args.conditions}",
+         synthetic_knowledge_base(args.symptoms, args.conditions, args.per_symptom, args.seed)),
+    ]
+
+    for label, kb in catalogs:
+        rng = random.Random(args.seed)
+        requests = [(rng.randint(0, 100), rng.choice(("male", "female")),
+                     rng.sample(kb.symptoms, rng.randint(1, min(6, len(kb.symptoms)))))
+                    for _ in range(args.requests)]
+        print(f"{label} knowledge base ({len(kb.symptoms)} symptoms x {len(kb.conditions)} conditions)")
+        for name, model in MODELS.items():
+            rate = throughput(model, kb, requests)
+            print(f"  {name:<12} {rate:>10,.0f} predictions/sec  ({1e6 / rate:.1f}us each)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Login throughput benchmark for the password hashing cost profiles.
+
+Times password verification for a range of scrypt costs through the bounded
+credential pool, with several concurrent callers, and marks the costs that
+still meet a logins/sec target. Pick the highest cost that meets it and set
+MEMORYMATE_SCRYPT_N (existing hashes are upgraded on the next login).
+
+Usage:
+    python benchmarks/bench_passwords.py [--target 50] [--logins 100] [--callers 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from credentials import HASH_WORKERS, CredentialPool, PasswordHasher
+
+
+def throughput(pool, encoded, logins, callers):
+    pool.verify('correct horse', encoded)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as requests:
+        results = list(requests.map(lambda _: pool.verify('correct horse', encoded), range(logins)))
+    elapsed = time.perf_counter() - started
+    assert all(results)
+    return logins / elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--target', type=float, default=50, help='required logins/sec per worker process')
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--callers', type=int, default=8, help='concurrent request threads')
+    parser.add_argument('--workers', type=int, default=HASH_WORKERS, help='hashing threads')
+    parser.add_argument('--log-n', type=int, nargs='+', default=[12, 13, 14, 15, 16, 17])
+    parser.add_argument('--r', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"scrypt r={args.r}, {args.workers} hashing threads, {args.callers} callers, "
+          f"target {args.target:,.0f} logins/sec")
+    for log_n in args.log_n:
+        hasher = PasswordHasher('scrypt', n=2 ** log_n, r=args.r)
+        pool = CredentialPool(hasher, workers=args.workers, queue=args.callers)
+        rate = throughput(pool, hasher.hash('correct horse'), args.logins, args.callers)
+        memory = 128 * hasher.n * hasher.r / 2 ** 20
+        verdict = "ok" if rate >= args.target else "too slow"
+        print(f"  n=2**{log_n:<3} {memory:>6.0f} MiB  {rate:>8,.1f} logins/sec  "
+              f"({1000 / rate * args.workers:.1f}ms each)  {verdict}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Latency benchmark for the sparse prediction engine.
+
+Builds a synthetic knowledge base (default 5k symptoms x 20k conditions) and
+times uncached predict calls for random symptom sets.
+
+Usage:
+    python benchmarks/bench_predict.py [--symptoms 5000] [--conditions 20000] [--max-p99-ms 1.0]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from knowledge_base import KnowledgeBase
+import utils
+from prediction_models import get_model
+
+
+def synthetic_knowledge_base(n_symptoms: int, n_conditions: int, per_symptom: int, seed: int) -> KnowledgeBase:
+    rng = random.Random(seed)
+    conditions = [f"Condition {i}" for i in range(n_conditions)]
+    symptom_conditions = {
+        f"symptom_{s}": {conditions[c]: round(rng.uniform(0.05, 0.95), 2)
+                         for c in rng.sample(range(n_conditions), per_symptom)}
+        for s in range(n_symptoms)
+    }
+    return KnowledgeBase.from_source({
+        "symptom_conditions": symptom_conditions,
+        "severity": {"low": ["condition 1"], "medium": ["condition 2"], "high": ["condition 3"]},
+        "suggestions": {},
+    })
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--symptoms', type=int, default=5000)
+    parser.add_argument('--conditions', type=int, default=20000)
+    parser.add_argument('--per-symptom', type=int, default=40, help="conditions linked to each symptom")
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--max-symptoms', type=int, default=8, help="symptoms per request (1..N)")
+    parser.add_argument('--max-p99-ms', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    kb = synthetic_knowledge_base(args.symptoms, args.conditions, args.per_symptom, args.seed)
+    print(f"Built {args.symptoms} symptoms x {args.conditions} conditions "
+          f"({len(kb.data)} weights) in {time.perf_counter() - started:.2f}s")
+
+    rng = random.Random(args.seed)
+    requests = [rng.sample(kb.symptoms, rng.randint(1, args.max_symptoms)) for _ in range(args.requests)]
+    symptom_index = kb.symptom_index
+    model = get_model("heuristic")
+
+    # Warm up
+    for symptoms in requests[:100]:
+        utils._build_results(kb, model.rank(kb, 30, "female", symptoms, 5))
+
+    timings = []
+    for symptoms in requests:
+        t0 = time.perf_counter()
+        assert all(s in symptom_index for s in symptoms)
+        utils._build_results(kb, model.rank(kb, 30, "female", symptoms, 5))
+        timings.append(time.perf_counter() - t0)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    mean = sum(timings) / len(timings) * 1000
+    print(f"predict (uncached) over {len(timings)} requests: "
+          f"mean={mean:.3f}ms p50={p50:.3f}ms p99={p99:.3f}ms max={timings[-1] * 1000:.3f}ms")
+
+    if p99 >= args.max_p99_ms:
+        print(f"FAIL: p99 {p99:.3f}ms >= {args.max_p99_ms}ms")
+        return 1
+    print(f"OK: p99 below {args.max_p99_ms}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
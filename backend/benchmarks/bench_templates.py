@@ -0,0 +1,131 @@
+"""
+Reminder email render benchmark.
+
+Renders the reminder email for a batch of users with the precompiled
+templates (HTML and plain-text parts) and with the previous f-string
+assembly (HTML only, a ``+=`` loop over the medicines), and reports
+renders/sec and bytes per email for each.
+
+Usage:
+    python benchmarks/bench_templates.py [--renders 20000] [--medicines 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from email_templates import render_reminder
+
+
+def render_fstring(user_name, medicines):
+    # The per-send assembly the templates replaced, verbatim
+    # Build medicine list HTML
+    medicine_html = ""
+    for med in medicines:
+        medicine_html += f"""
+        <tr>
+            <td style="padding: 12px; border-bottom: 1px solid #ddd;">
+                <strong>{med.get('name', 'Unknown')}</strong>
+            </td>
+            <td style="padding: 12px; border-bottom: 1px solid #ddd;">
+                {med.get('dosage', 'N/A')}
+            </td>
+            <td style="padding: 12px; border-bottom: 1px solid #ddd;">
+                {med.get('frequency', 'N/A')}
+            </td>
+        </tr>
+        """
+    
+    # Create email HTML body
+    html_body = f"""
+    <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; background: #f9f9f9; }}
+                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; text-align: center; }}
+                .content {{ background: white; padding: 20px; }}
+                .medicine-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
+                .medicine-table th {{ background: #667eea; color: white; padding: 12px; text-align: left; }}
+                .footer {{ background: #f0f0f0; padding: 15px; text-align: center; font-size: 12px; color: #666; border-radius: 0 0 8px 8px; }}
+                .button {{ background: #667eea; color: white; padding: 10px 20px; text-decoration: none; border-radius: 4px; display: inline-block; margin-top: 15px; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>💊 MemoryMate Medicine Reminder</h1>
+                </div>
+                <div class="content">
+                    <p>Hi <strong>{user_name}</strong>,</p>
+                    <p>This is your medicine reminder from MemoryMate. The following medicines are due now:</p>
+                    
+                    <table class="medicine-table">
+                        <thead>
+                            <tr>
+                                <th>Medicine Name</th>
+                                <th>Dosage</th>
+                                <th>Frequency</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {medicine_html}
+                        </tbody>
+                    </table>
+                    
+                    <p><strong>⏰ Action Required:</strong> Please take your medications as prescribed.</p>
+                    <p>If you have any questions about your medicines, consult your healthcare provider.</p>
+                    
+                    <center>
+                        <a href="http://localhost:3000/memorymate" class="button">View MemoryMate Dashboard</a>
+                    </center>
+                    
+                    <p style="margin-top: 30px; font-size: 12px; color: #999;">
+                        You're receiving this email because you have medicine reminders enabled in MemoryMate.
+                    </p>
+                </div>
+                <div class="footer">
+                    <p>MemoryMate © 2025 - Your Personal Health Assistant</p>
+                    <p><a href="http://localhost:3000" style="color: #667eea; text-decoration: none;">Visit MemoryMate</a></p>
+                </div>
+            </div>
+        </body>
+    </html>
+    """
+    return html_body
+
+
+def rate(render, users, medicines, renders):
+    started = time.perf_counter()
+    size = 0
+    for i in range(renders):
+        result = render(users[i % len(users)], medicines)
+        size = len(result[0] if isinstance(result, tuple) else result)
+    elapsed = time.perf_counter() - started
+    return renders / elapsed, size
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--renders', type=int, default=20000)
+    parser.add_argument('--medicines', type=int, default=3, help='due medicines per email')
+    args = parser.parse_args()
+
+    users = [f'User {i}' for i in range(1000)]
+    medicines = [{'name': f'Medicine {i}', 'dosage': f'{(i + 1) * 50}mg', 'frequency': 'twice'}
+                 for i in range(args.medicines)]
+
+    print(f"{args.renders:,} renders, {args.medicines} medicines each")
+    for label, render in (("f-string (HTML only)", render_fstring),
+                          ("templates (HTML + text)", render_reminder)):
+        renders_per_sec, size = rate(render, users, medicines, args.renders)
+        print(f"  {label:<24} {renders_per_sec:>10,.0f} renders/sec  "
+              f"{1e6 / renders_per_sec:>6.1f}us each  {size:>6,} HTML chars")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
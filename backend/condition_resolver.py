@@ -0,0 +1,102 @@
+"""
+Normalized-name index for condition lookup tables (severity, suggestions).
+
+Lookups used to scan every keyword with bidirectional substring checks. The
+resolver precomputes answers for every known condition name at startup and
+falls back to a token index for names outside the catalog.
+"""
+
+import re
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a condition name and collapse whitespace."""
+    return " ".join(str(name).lower().split())
+
+
+def _name_tokens(name: str) -> List[str]:
+    return _TOKEN_RE.findall(name)
+
+
+class ConditionResolver:
+    """
+    Map condition names to values from a keyword table.
+
+    A name matches a keyword when either contains the other (case-insensitive);
+    keywords earlier in the table win. Catalog names are resolved once with a
+    full scan so they are exact; other names use the token index to find the
+    first keyword sharing a whole token, substring-check only the keywords
+    ranked before it, and memoize the answer.
+    """
+
+    def __init__(self, entries: Sequence[Tuple[str, Any]], default: Any,
+                 catalog: Iterable[str] = (), prefer_exact: bool = False,
+                 max_memoized: int = 4096):
+        """
+        Args:
+            entries: (keyword, value) pairs in priority order
+            default: Value returned when nothing matches
+            catalog: Known condition names to precompute
+            prefer_exact: Whether an exact keyword hit beats an earlier substring match
+            max_memoized: Cap on memoized out-of-catalog names
+        """
+        self.default = default
+        self._keywords: List[Tuple[str, Any]] = [(normalize_name(k), v) for k, v in entries]
+        self._tokens: Dict[str, List[int]] = {}
+        for priority, (keyword, _) in enumerate(self._keywords):
+            for token in set(_name_tokens(keyword)):
+                self._tokens.setdefault(token, []).append(priority)
+
+        self._exact: Dict[str, Any] = {}
+        if prefer_exact:
+            for keyword, value in reversed(self._keywords):
+                self._exact[keyword] = value
+        for name in [keyword for keyword, _ in self._keywords] + list(catalog):
+            key = normalize_name(name)
+            if key not in self._exact:
+                self._exact[key] = self._scan(key)
+
+        self._static_size = len(self._exact)
+        self._max_memoized = max_memoized
+        self._lock = threading.Lock()
+
+    def resolve(self, name: str) -> Any:
+        """Return the value for a condition name, or the default."""
+        key = normalize_name(name)
+        value = self._exact.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self._fuzzy(key)
+        with self._lock:
+            if len(self._exact) - self._static_size < self._max_memoized:
+                self._exact[key] = value
+        return value
+
+    def _fuzzy(self, key: str) -> Any:
+        candidates = sorted({p for token in _name_tokens(key) for p in self._tokens.get(token, ())})
+        hit = next((p for p in candidates if self._matches(self._keywords[p][0], key)), len(self._keywords))
+        # A keyword can also match part of a token ("migraine" in "migraines"),
+        # so the keywords ranked before the token hit still need checking.
+        for keyword, value in islice(self._keywords, hit):
+            if self._matches(keyword, key):
+                return value
+        return self._keywords[hit][1] if hit < len(self._keywords) else self.default
+
+    def _scan(self, key: str) -> Any:
+        for keyword, value in self._keywords:
+            if self._matches(keyword, key):
+                return value
+        return self.default
+
+    @staticmethod
+    def _matches(keyword: str, key: str) -> bool:
+        return keyword in key or key in keyword
+
+
+_MISSING = object()
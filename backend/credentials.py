@@ -0,0 +1,185 @@
+"""
+Password hashing for MemoryMate users.
+
+Passwords are stored as self-describing hashes from a memory-hard KDF:
+scrypt from hashlib (``scrypt$<n>$<r>$<p>$<salt>$<hash>``), or argon2id when
+MEMORYMATE_PASSWORD_HASH=argon2 and argon2-cffi is installed. The cost comes
+from the environment, so it can be raised without invalidating stored hashes:
+a successful login whose hash used other parameters (or a plaintext password
+from before hashing) is rehashed with the current ones.
+
+Hashing and verification run on a bounded thread pool. The KDF releases the
+GIL, so the request worker just waits on it, and the pool caps how many
+hashes (each needing 128 * n * r bytes) run at once; when its queue is full,
+new requests are turned away with CredentialsBusy instead of piling up.
+
+Use benchmarks/bench_passwords.py to pick a cost that meets the login
+throughput target.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional
+
+try:
+    import argon2
+except ImportError:  # argon2-cffi is optional
+    argon2 = None
+
+PASSWORD_HASH = os.getenv('MEMORYMATE_PASSWORD_HASH', 'scrypt').lower()
+SCRYPT_N = int(os.getenv('MEMORYMATE_SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.getenv('MEMORYMATE_SCRYPT_R', '8'))
+SCRYPT_P = int(os.getenv('MEMORYMATE_SCRYPT_P', '1'))
+HASH_WORKERS = int(os.getenv('MEMORYMATE_HASH_WORKERS', str(os.cpu_count() or 1)))
+HASH_QUEUE = int(os.getenv('MEMORYMATE_HASH_QUEUE', '64'))
+HASH_TIMEOUT = float(os.getenv('MEMORYMATE_HASH_TIMEOUT', '10'))
+
+
+class CredentialsBusy(RuntimeError):
+    """Raised when too many hashes are already queued."""
+
+
+class PasswordHasher:
+    """Hash and verify passwords with one cost profile."""
+
+    def __init__(self, scheme: str = PASSWORD_HASH, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P,
+                 salt_bytes: int = 16, key_bytes: int = 32):
+        """
+        Args:
+            scheme: 'scrypt' or 'argon2' (falls back to scrypt if argon2-cffi is missing)
+            n: scrypt CPU/memory cost (a power of two)
+            r: scrypt block size
+            p: scrypt parallelism
+            salt_bytes: Random salt length
+            key_bytes: Derived key length
+        """
+        if n < 2 or n & (n - 1):
+            raise ValueError(f"scrypt n must be a power of two, got {n}")
+        self.scheme = 'argon2' if scheme == 'argon2' and argon2 is not None else 'scrypt'
+        self.n, self.r, self.p = n, r, p
+        self.salt_bytes = salt_bytes
+        self.key_bytes = key_bytes
+        self._argon2 = argon2.PasswordHasher() if self.scheme == 'argon2' else None
+
+    def hash(self, password: str) -> str:
+        if self._argon2 is not None:
+            return self._argon2.hash(password)
+        salt = os.urandom(self.salt_bytes)
+        key = self._scrypt(password, salt, self.n, self.r, self.p, self.key_bytes)
+        return f"scrypt${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        """Check a password against a stored hash (or a legacy plaintext password)."""
+        if not isinstance(encoded, str) or not encoded:
+            return False
+        if encoded.startswith('$argon2'):
+            if argon2 is None:
+                raise RuntimeError("argon2-cffi is required to verify argon2 password hashes")
+            try:
+                return argon2.PasswordHasher().verify(encoded, password)
+            except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHash):
+                return False
+
+        params = _parse_scrypt(encoded)
+        if params is None:
+            # Stored before passwords were hashed
+            return hmac.compare_digest(password.encode('utf-8'), encoded.encode('utf-8'))
+        n, r, p, salt, key = params
+        return hmac.compare_digest(self._scrypt(password, salt, n, r, p, len(key)), key)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        """True if a stored hash was not made with this hasher's scheme and cost."""
+        if self._argon2 is not None:
+            return not encoded.startswith('$argon2') or self._argon2.check_needs_rehash(encoded)
+        params = _parse_scrypt(encoded)
+        return params is None or params[:3] != (self.n, self.r, self.p) or len(params[4]) != self.key_bytes
+
+    @staticmethod
+    def _scrypt(password: str, salt: bytes, n: int, r: int, p: int, key_bytes: int) -> bytes:
+        # OpenSSL refuses to use more than maxmem (32 MiB by default); allow what the cost needs
+        maxmem = 129 * n * r * p + (1 << 20)
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=key_bytes)
+
+
+class CredentialPool:
+    """Runs a PasswordHasher on a bounded thread pool."""
+
+    def __init__(self, hasher: PasswordHasher, workers: int = HASH_WORKERS, queue: int = HASH_QUEUE,
+                 timeout: float = HASH_TIMEOUT):
+        """
+        Args:
+            hasher: Hasher to run
+            workers: Threads hashing at once
+            queue: Hashes allowed to wait for a thread before CredentialsBusy is raised
+            timeout: Seconds a caller waits for its result
+        """
+        self.hasher = hasher
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='credentials')
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max(0, queue))
+
+    def hash(self, password: str) -> str:
+        return self._run(self.hasher.hash, password)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return self._run(self.hasher.verify, password, encoded)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return self.hasher.needs_rehash(encoded)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise CredentialsBusy("Too many logins in progress, try again shortly")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise CredentialsBusy("Password hashing timed out, try again shortly")
+
+
+_pool: Optional[CredentialPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_credentials() -> CredentialPool:
+    """Return the process-wide credential pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CredentialPool(PasswordHasher())
+    return _pool
+
+
+def set_credentials(pool: Optional[CredentialPool]) -> None:
+    """Replace the credential pool (None re-creates it from the environment on next use)."""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+
+def _parse_scrypt(encoded: str):
+    parts = encoded.split('$')
+    if len(parts) != 6 or parts[0] != 'scrypt':
+        return None
+    try:
+        return int(parts[1]), int(parts[2]), int(parts[3]), _b64decode(parts[4]), _b64decode(parts[5])
+    except ValueError:
+        return None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4), validate=True)
@@ -0,0 +1,178 @@
+"""
+Fan-out MemoryMate reminder dispatch.
+
+Sends the reminder email to every user with ``email_notifications_enabled``
+whose medicines have a dose due now, without waiting for them to poll
+check_medicines. One pass reads the opted-in users (email and name only),
+a second streams every user's medicines once and joins them against that
+set, so each user and medicine is read exactly once whatever the backend.
+
+Messages go to the mail queue (mailer.py), whose workers send them over
+reused SMTP connections. When the queue is full the dispatch waits for room
+(up to MEMORYMATE_DISPATCH_ENQUEUE_TIMEOUT seconds per email), so a large
+slot is throttled to the senders' pace instead of dropping mail. Reminders
+use the same dedup key as check_medicines, so when the dispatch runs through
+/api/memorymate/reminders/dispatch, users that worker already emailed for
+these doses are skipped (the command line tool has its own queue).
+
+Usage:
+    python dispatch.py [--at 2024-03-01T08:00] [--workers 4] [--dry-run]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Read .env before the local modules read their settings at import time
+load_dotenv()
+
+from mailer import DUPLICATE, QUEUED, MailQueue
+from reminders import doses_due
+from storage import Storage, get_storage
+from utils import build_medicine_reminder_message
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for room in the mail queue before an email counts as dropped
+DISPATCH_ENQUEUE_TIMEOUT = float(os.getenv('MEMORYMATE_DISPATCH_ENQUEUE_TIMEOUT', 60))
+
+Dose = Tuple[Dict[str, Any], datetime]  # (medicine, end of the dose's window)
+
+
+def reminder_message(email: str, user_name: str, doses: List[Dose]) -> Tuple[Any, Hashable]:
+    """
+    Build a user's reminder email and its dedup key (one per user and set of due doses).
+
+    Returns:
+        (Flask-Mail Message, dedup key)
+    """
+    message = build_medicine_reminder_message(email, user_name, [medicine for medicine, _ in doses])
+    return message, ('reminder', email, tuple((medicine['id'], end) for medicine, end in doses))
+
+
+def dispatch_reminders(mail_queue: Optional[MailQueue], storage: Optional[Storage] = None,
+                       now: Optional[datetime] = None,
+                       enqueue_timeout: float = DISPATCH_ENQUEUE_TIMEOUT) -> Dict[str, Any]:
+    """
+    Queue a reminder for every opted-in user with a dose due at ``now``.
+
+    Args:
+        mail_queue: Queue to hand the emails to (None builds them without sending)
+        storage: Backend to read (defaults to the configured one)
+        now: Local time to check doses at (defaults to now)
+        enqueue_timeout: Seconds to wait for room in the queue per email
+
+    Returns:
+        Report with counts of users, due users, queued / duplicate / dropped /
+        failed emails, elapsed seconds and users per second
+    """
+    storage = storage or get_storage()
+    now = now or datetime.now()
+    started = time.monotonic()
+    report = dict.fromkeys(('users', 'opted_in', 'due', 'queued', 'duplicates', 'dropped', 'errors'), 0)
+
+    names: Dict[str, str] = {}
+    for user in storage.iter_users():
+        report['users'] += 1
+        if user.get('email_notifications_enabled'):
+            names[user['email']] = user.get('name') or 'User'
+    report['opted_in'] = len(names)
+
+    for email, medicines, _ in storage.iter_medicines():
+        name = names.get(email)
+        if name is None:
+            continue
+        doses = [(medicine, window[1]) for medicine in medicines for window in doses_due(medicine, now)]
+        if not doses:
+            continue
+        report['due'] += 1
+        try:
+            message, key = reminder_message(email, name, doses)
+            if mail_queue is None:
+                continue
+            outcome = mail_queue.submit(message, key, timeout=enqueue_timeout)
+        except Exception as e:
+            report['errors'] += 1
+            logger.error(f"Failed to queue a reminder for {email}: {str(e)}")
+            continue
+        report['queued' if outcome == QUEUED else 'duplicates' if outcome == DUPLICATE else 'dropped'] += 1
+
+    elapsed = time.monotonic() - started
+    report.update(at=now.isoformat(), elapsed=round(elapsed, 3),
+                  users_per_sec=round(report['users'] / elapsed, 1) if elapsed else None)
+    logger.info(f"Reminder dispatch: {report}")
+    return report
+
+
+class DispatchRunner:
+    """Runs one dispatch at a time on a background thread and keeps the last report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.report: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mail_queue: MailQueue, now: Optional[datetime] = None) -> bool:
+        """Start a dispatch unless one is running; returns whether it started."""
+        with self._lock:
+            if self.running:
+                return False
+            self._thread = threading.Thread(target=self._run, args=(mail_queue, now),
+                                            name="memorymate-dispatch", daemon=True)
+            self._thread.start()
+        return True
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, mail_queue: MailQueue, now: Optional[datetime]) -> None:
+        try:
+            self.report = dispatch_reminders(mail_queue, now=now)
+        except Exception as e:
+            logger.error(f"Reminder dispatch failed: {str(e)}")
+            self.report = {'error': str(e)}
+
+
+DISPATCHER = DispatchRunner()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Send due medicine reminders to every opted-in user")
+    parser.add_argument('--at', type=datetime.fromisoformat, help="local time to check doses at (default: now)")
+    parser.add_argument('--workers', type=int, help="SMTP sending threads (default: MEMORYMATE_MAIL_WORKERS)")
+    parser.add_argument('--dry-run', action='store_true', help="build the emails without sending them")
+    args = parser.parse_args(argv)
+
+    from app import app
+
+    started = time.monotonic()
+    mail_queue = None
+    if not args.dry_run:
+        options = {'workers': args.workers} if args.workers else {}
+        mail_queue = MailQueue(app, **options)
+    report = dispatch_reminders(mail_queue, now=args.at)
+    if mail_queue is not None:
+        mail_queue.wait_idle()
+        mail_queue.stop()
+        stats = mail_queue.stats()
+        report.update(sent=stats['sent'], failed=stats['failed'], connections=stats['connections'],
+                      elapsed_with_delivery=round(time.monotonic() - started, 3))
+    for name, value in report.items():
+        print(f"{name:>22}: {value}")
+    return 1 if report.get('failed') or report['dropped'] or report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
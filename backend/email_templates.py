@@ -0,0 +1,239 @@
+"""
+Precompiled MemoryMate email templates.
+
+A Template is compiled once, at import: indentation is stripped from the
+layout and it is split into its static chunks and the ``{{ slot }}``
+placeholders between them. Rendering drops the values into a copy of that
+chunk list and joins it once; the medicine rows reuse one chunk list and are
+joined together at the end, instead of growing the document with ``+=``.
+
+Slot values are inserted as given; ``render_reminder`` HTML-escapes the user
+and medicine fields before they reach the HTML layout. PrerenderedMessage
+uses the same mechanism for the MIME document itself.
+"""
+
+import base64
+import re
+import secrets
+from email.utils import formatdate
+from functools import lru_cache
+from html import escape
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+
+from flask_mail import Message, sanitize_address, sanitize_addresses, sanitize_subject
+
+_SLOT = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+class Template:
+    """Static text chunks around ``{{ slot }}`` placeholders."""
+
+    __slots__ = ('names', 'slots', '_chunks')
+
+    def __init__(self, source: str, strip_indent: bool = False):
+        """
+        Args:
+            source: Template text with ``{{ slot }}`` placeholders
+            strip_indent: Strip each line's indentation and drop blank lines (for HTML)
+        """
+        if strip_indent:
+            source = '\n'.join(line.strip() for line in source.splitlines() if line.strip())
+        # split() alternates static text and slot names
+        pieces = _SLOT.split(source)
+        self._chunks: List[str] = pieces
+        self.names: Tuple[str, ...] = tuple(pieces[1::2])  # placeholders in order of appearance
+        self.slots = frozenset(self.names)
+
+    def render(self, **values: str) -> str:
+        """
+        Raises:
+            KeyError: If a slot has no value
+        """
+        chunks = self._chunks[:]
+        chunks[1::2] = [values[name] for name in self.names]
+        return ''.join(chunks)
+
+    def render_rows(self, rows: Iterable[Sequence[str]], separator: str = '\n') -> str:
+        """
+        Render the template once per row and join the results.
+
+        Args:
+            rows: Values for each row, one per placeholder in order of appearance
+        """
+        chunks = self._chunks[:]
+        rendered = []
+        for row in rows:
+            chunks[1::2] = row
+            rendered.append(''.join(chunks))
+        return separator.join(rendered)
+
+
+class PrerenderedMessage(Message):
+    """
+    A Flask-Mail Message whose MIME document comes from a precompiled layout.
+
+    Flask-Mail builds each message with the email package and its SMTP policy,
+    which parses every header back while generating (about 2ms a message, most
+    of a reminder's cost). For the plain case - HTML and text parts, no
+    attachments or extra headers - ``as_bytes`` fills MIME_LAYOUT with base64
+    parts instead; anything else falls back to Flask-Mail. The subject and
+    addresses go through Flask-Mail's own sanitizing, folded with CRLF.
+    """
+
+    def as_bytes(self) -> bytes:
+        if (self.attachments or self.extra_headers or self.cc or self.bcc or self.reply_to
+                or not (self.html and self.body) or self.charset not in (None, 'utf-8')):
+            return super().as_bytes()
+        recipients = dict.fromkeys(_crlf(address) for address in sanitize_addresses(self.recipients))
+        return MIME_LAYOUT.render(
+            subject=_encoded_subject(self.subject or ''),
+            sender=_encoded_address(self.sender),
+            to=', '.join(recipients),
+            date=formatdate(self.date, localtime=True),
+            message_id=self.msgId,
+            boundary=f'=_{secrets.token_hex(16)}',
+            text=_base64(self.body),
+            html=_base64(self.html),
+        ).encode('ascii')
+
+
+@lru_cache(maxsize=64)
+def _encoded_subject(subject: str) -> str:
+    return _crlf(sanitize_subject(subject)) if subject else ''
+
+
+@lru_cache(maxsize=64)
+def _encoded_address(address: Union[str, Tuple[str, str]]) -> str:
+    return _crlf(sanitize_address(address))
+
+
+def _crlf(header: str) -> str:
+    """Fold with CRLF: the email.header encoders fold long values with a bare LF."""
+    return header.replace('\r\n', '\n').replace('\n', '\r\n')
+
+
+def _base64(text: str) -> str:
+    return base64.encodebytes(text.encode('utf-8')).decode('ascii').replace('\n', '\r\n')
+
+
+# Headers and parts of a multipart/alternative message, with CRLF line ends
+MIME_LAYOUT = Template('\r\n'.join([
+    'Content-Type: multipart/alternative; boundary="{{ boundary }}"',
+    'MIME-Version: 1.0',
+    'Subject: {{ subject }}',
+    'From: {{ sender }}',
+    'To: {{ to }}',
+    'Date: {{ date }}',
+    'Message-ID: {{ message_id }}',
+    '',
+    '--{{ boundary }}',
+    'Content-Type: text/plain; charset="utf-8"',
+    'Content-Transfer-Encoding: base64',
+    '',
+    '{{ text }}--{{ boundary }}',
+    'Content-Type: text/html; charset="utf-8"',
+    'Content-Transfer-Encoding: base64',
+    '',
+    '{{ html }}--{{ boundary }}--',
+    '',
+]))
+
+
+REMINDER_SUBJECT = "💊 MemoryMate - Medicine Reminder"
+
+REMINDER_HTML = Template("""
+<html>
+    <head>
+        <style>
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; background: #f9f9f9; }
+            .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; text-align: center; }
+            .content { background: white; padding: 20px; }
+            .medicine-table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+            .medicine-table th { background: #667eea; color: white; padding: 12px; text-align: left; }
+            .footer { background: #f0f0f0; padding: 15px; text-align: center; font-size: 12px; color: #666; border-radius: 0 0 8px 8px; }
+            .button { background: #667eea; color: white; padding: 10px 20px; text-decoration: none; border-radius: 4px; display: inline-block; margin-top: 15px; }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>💊 MemoryMate Medicine Reminder</h1>
+            </div>
+            <div class="content">
+                <p>Hi <strong>{{ user_name }}</strong>,</p>
+                <p>This is your medicine reminder from MemoryMate. The following medicines are due now:</p>
+                <table class="medicine-table">
+                    <thead>
+                        <tr>
+                            <th>Medicine Name</th>
+                            <th>Dosage</th>
+                            <th>Frequency</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {{ rows }}
+                    </tbody>
+                </table>
+                <p><strong>⏰ Action Required:</strong> Please take your medications as prescribed.</p>
+                <p>If you have any questions about your medicines, consult your healthcare provider.</p>
+                <center>
+                    <a href="http://localhost:3000/memorymate" class="button">View MemoryMate Dashboard</a>
+                </center>
+                <p style="margin-top: 30px; font-size: 12px; color: #999;">
+                    You're receiving this email because you have medicine reminders enabled in MemoryMate.
+                </p>
+            </div>
+            <div class="footer">
+                <p>MemoryMate © 2025 - Your Personal Health Assistant</p>
+                <p><a href="http://localhost:3000" style="color: #667eea; text-decoration: none;">Visit MemoryMate</a></p>
+            </div>
+        </div>
+    </body>
+</html>
+""", strip_indent=True)
+
+REMINDER_ROW_HTML = Template("""
+<tr>
+    <td style="padding: 12px; border-bottom: 1px solid #ddd;"><strong>{{ name }}</strong></td>
+    <td style="padding: 12px; border-bottom: 1px solid #ddd;">{{ dosage }}</td>
+    <td style="padding: 12px; border-bottom: 1px solid #ddd;">{{ frequency }}</td>
+</tr>
+""", strip_indent=True)
+
+REMINDER_TEXT = Template("""Hi {{ user_name }},
+
+This is your medicine reminder from MemoryMate. The following medicines are due now:
+
+{{ rows }}
+
+Please take your medications as prescribed. If you have any questions about
+your medicines, consult your healthcare provider.
+
+View your MemoryMate dashboard: http://localhost:3000/memorymate
+
+You're receiving this email because you have medicine reminders enabled in MemoryMate.
+""")
+
+REMINDER_ROW_TEXT = Template("- {{ name }}: {{ dosage }} ({{ frequency }})")
+
+
+def render_reminder(user_name: str, medicines: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """
+    Render the medicine reminder email.
+
+    Args:
+        user_name: User's name for personalization
+        medicines: Medicine dictionaries with name, dosage, frequency
+
+    Returns:
+        (HTML body, plain-text body)
+    """
+    rows = [(str(med.get('name', 'Unknown')), str(med.get('dosage', 'N/A')), str(med.get('frequency', 'N/A')))
+            for med in medicines]
+    html = REMINDER_HTML.render(
+        user_name=escape(user_name),
+        rows=REMINDER_ROW_HTML.render_rows([(escape(name), escape(dosage), escape(frequency))
+                                            for name, dosage, frequency in rows]))
+    text = REMINDER_TEXT.render(user_name=user_name, rows=REMINDER_ROW_TEXT.render_rows(rows))
+    return html, text
@@ -0,0 +1,62 @@
+"""
+Cross-process reader/writer locks on sidecar lock files.
+
+Each acquisition opens its own descriptor and takes an fcntl.flock on it, so
+the lock excludes other threads of the same process as well as other
+processes (gunicorn workers). On platforms without fcntl (Windows) the lock
+falls back to an in-process lock, which still serializes threads but not
+separate processes.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+_fallback_locks: Dict[str, threading.RLock] = {}
+_fallback_guard = threading.Lock()
+
+
+class FileLock:
+    """Shared/exclusive lock backed by ``path`` (created if missing)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Hold a shared (reader) lock for the duration of the block."""
+        with self._acquire(shared=True):
+            yield
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold an exclusive (writer) lock for the duration of the block."""
+        with self._acquire(shared=False):
+            yield
+
+    @contextmanager
+    def _acquire(self, shared: bool) -> Iterator[None]:
+        if fcntl is None:
+            with _fallback_lock(self.path):
+                yield
+            return
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+
+def _fallback_lock(path: str) -> threading.RLock:
+    with _fallback_guard:
+        return _fallback_locks.setdefault(os.path.abspath(path), threading.RLock())
@@ -0,0 +1,177 @@
+"""
+Incremental prediction for live symptom checkers.
+
+Instead of re-sending the whole symptom list on every change, the client holds
+an opaque signed token with the running per-condition sums and sends only the
+symptoms it added or removed. Applying a delta touches just the conditions
+linked to those symptoms; the new top-N is ranked from the updated sums.
+"""
+
+import os
+import secrets
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from knowledge_base import KnowledgeBase
+from prediction_models import PredictionModel, Ranking
+
+
+class InvalidScoreToken(ValueError):
+    """Raised when a score token is tampered with or malformed."""
+
+
+class ScoreState:
+    """
+    Running sums of a model's entry values for one symptom set.
+
+    Symptoms are a set: adding a present symptom or removing an absent one is a
+    no-op. Each touched condition keeps a link count so it disappears exactly
+    when its last linked symptom is removed.
+    """
+
+    def __init__(self, age: int, gender: str, model: str, version: str,
+                 symptoms: Iterable[str] = (), totals: Optional[Dict[int, List[float]]] = None):
+        """
+        Args:
+            age: Patient age
+            gender: Patient gender
+            model: Name of the model the sums were built for
+            version: Knowledge base version the sums were built from
+            symptoms: Present (normalized) symptoms
+            totals: Condition id -> [link count, summed value]
+        """
+        self.age = age
+        self.gender = gender
+        self.model = model
+        self.version = version
+        self.symptoms = set(symptoms)
+        self.totals: Dict[int, List[float]] = totals if totals is not None else {}
+
+    @classmethod
+    def build(cls, kb: KnowledgeBase, scorer: PredictionModel, age: int, gender: str,
+              symptoms: Iterable[str] = ()) -> 'ScoreState':
+        """Start a state for a model and knowledge base, optionally with initial symptoms."""
+        state = cls(age, gender, scorer.name, kb.version)
+        state.apply(kb, scorer, added=symptoms)
+        return state
+
+    def apply(self, kb: KnowledgeBase, scorer: PredictionModel, added: Iterable[str] = (),
+              removed: Iterable[str] = ()) -> 'ScoreState':
+        """
+        Apply a symptom delta (removals first, then additions). If the knowledge
+        base was rebuilt or another model is requested, the sums are rebuilt
+        from the symptom set first.
+
+        Returns:
+            The updated state (a new object when a rebuild was needed)
+        """
+        if self.version != kb.version or self.model != scorer.name:
+            known = [s for s in self.symptoms if s in kb.symptom_index]
+            state = ScoreState(self.age, self.gender, scorer.name, kb.version)
+            state._update(kb, scorer.entry_values(kb), known, ())
+        else:
+            state = self
+        state._update(kb, scorer.entry_values(kb), added, removed)
+        return state
+
+    def rank(self, kb: KnowledgeBase, scorer: PredictionModel, top_n: int) -> Ranking:
+        """Return the top_n (condition id, probability 0-1) pairs for the current symptoms."""
+        columns = np.fromiter(self.totals.keys(), dtype=np.int64, count=len(self.totals))
+        sums = np.fromiter((total[1] for total in self.totals.values()), dtype=np.float64,
+                           count=len(self.totals))
+        order = np.argsort(columns)
+        return scorer.rank_sums(kb, self.age, self.gender, len(self.symptoms),
+                                columns[order], sums[order], top_n)
+
+    def _update(self, kb: KnowledgeBase, values: np.ndarray, added: Iterable[str],
+                removed: Iterable[str]) -> None:
+        for symptom, sign in [(s, -1) for s in removed] + [(s, 1) for s in added]:
+            symptom = _normalize(symptom)
+            row = kb.symptom_index.get(symptom)
+            if row is None or (sign > 0) == (symptom in self.symptoms):
+                continue
+
+            if sign > 0:
+                self.symptoms.add(symptom)
+            else:
+                self.symptoms.discard(symptom)
+
+            start, end = int(kb.indptr[row]), int(kb.indptr[row + 1])
+            for column, value in zip(kb.indices[start:end].tolist(), values[start:end].tolist()):
+                total = self.totals.get(column)
+                if total is None:
+                    self.totals[column] = [1, value]
+                elif total[0] + sign == 0:
+                    del self.totals[column]
+                else:
+                    total[0] += sign
+                    total[1] += sign * value
+
+    def to_payload(self) -> Dict[str, Any]:
+        columns = sorted(self.totals)
+        return {
+            "a": self.age, "g": self.gender, "m": self.model, "v": self.version,
+            "s": sorted(self.symptoms),
+            "c": columns,
+            "n": [int(self.totals[c][0]) for c in columns],
+            "w": [self.totals[c][1] for c in columns],
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> 'ScoreState':
+        try:
+            totals = {int(c): [int(n), float(w)] for c, n, w in zip(payload["c"], payload["n"], payload["w"])}
+            return cls(payload["a"], payload["g"], payload["m"], payload["v"], payload["s"], totals)
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidScoreToken(f"Malformed score token: {e}")
+
+
+class ScoreTokenCodec:
+    """Sign and compress ScoreState payloads into URL-safe tokens."""
+
+    def __init__(self, secret: Optional[str] = None, salt: str = "incremental-prediction"):
+        """
+        Args:
+            secret: Signing key (shared by all workers); None reads
+                PREDICTION_TOKEN_SECRET on first use, or makes a random key
+            salt: Namespace for the signatures
+        """
+        self._secret = secret
+        self._salt = salt
+        self._serializer: Optional[URLSafeSerializer] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _signer(self) -> URLSafeSerializer:
+        if self._serializer is None:
+            with self._lock:
+                if self._serializer is None:
+                    secret = self._secret or os.getenv('PREDICTION_TOKEN_SECRET') or secrets.token_hex(32)
+                    self._serializer = URLSafeSerializer(secret, salt=self._salt)
+        return self._serializer
+
+    def dumps(self, state: ScoreState) -> str:
+        return self._signer.dumps(state.to_payload())
+
+    def loads(self, token: str) -> ScoreState:
+        """
+        Raises:
+            InvalidScoreToken: If the signature does not match or the payload is malformed
+        """
+        if not isinstance(token, str) or not token:
+            raise InvalidScoreToken("Score token must be a non-empty string")
+        try:
+            payload = self._signer.loads(token)
+        except BadSignature:
+            raise InvalidScoreToken("Invalid score token")
+        if not isinstance(payload, dict):
+            raise InvalidScoreToken("Malformed score token")
+        return ScoreState.from_payload(payload)
+
+
+def _normalize(symptom: str) -> str:
+    return symptom.lower().replace(" ", "_")
+
@@ -0,0 +1,400 @@
+"""
+Condition knowledge base: symptom/condition weights plus severity and suggestion tables.
+
+The editable source is ``data/knowledge_base.json``. ``python knowledge_base.py build``
+compiles it into ``data/knowledge_base/``:
+
+    csr-<version>.{indptr,indices,data}.npy   sparse symptom -> condition weights (CSR)
+    tables.json                               symptom/condition names, severity keywords, suggestions
+
+The weights are a CSR inverted index: row ``s`` of ``indices``/``data`` (between
+``indptr[s]`` and ``indptr[s + 1]``) lists the condition ids and weights for symptom
+``s``, so scoring only touches the conditions linked to the requested symptoms.
+
+Workers memory-map the arrays read-only, so every gunicorn process shares one
+copy of the pages. ``tables.json`` is replaced last and names the array files
+it belongs to, so readers never see half a build. The store polls its mtime and
+swaps in a new KnowledgeBase object atomically; in-flight requests keep using
+the object they already hold.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from condition_resolver import ConditionResolver
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / 'data'
+SOURCE_FILE = Path(os.getenv('KNOWLEDGE_BASE_SOURCE', DATA_DIR / 'knowledge_base.json'))
+COMPILED_DIR = Path(os.getenv('KNOWLEDGE_BASE_DIR', DATA_DIR / 'knowledge_base'))
+TABLES_FILE = 'tables.json'
+CSR_ARRAYS = ('indptr', 'indices', 'data')
+
+# Used when the source does not define its own default suggestions
+DEFAULT_SUGGESTIONS = {
+    "medicines": ["paracetamol for fever/pain as needed"],
+    "diet": ["stay hydrated, eat light nutritious meals"],
+    "precautions": ["rest and monitor symptoms, seek care if worsening"],
+    "advice": "Consult a healthcare professional for diagnosis and treatment."
+}
+
+
+def compile_condition_index(symptom_conditions: Dict[str, Dict[str, float]]) -> Tuple[List[str], List[str], Dict[str, np.ndarray]]:
+    """
+    Compile a symptom/condition table into a CSR inverted index.
+
+    Args:
+        symptom_conditions: Mapping of symptom key to {condition: weight}
+
+    Returns:
+        Tuple of (symptoms by row, condition names by id, {"indptr", "indices", "data"} arrays)
+    """
+    condition_index: Dict[str, int] = {}
+    indptr = np.zeros(len(symptom_conditions) + 1, dtype=np.int64)
+    indices: List[int] = []
+    data: List[float] = []
+    for row, conditions in enumerate(symptom_conditions.values()):
+        for condition, weight in conditions.items():
+            indices.append(condition_index.setdefault(condition, len(condition_index)))
+            data.append(weight)
+        indptr[row + 1] = len(indices)
+
+    csr = {
+        'indptr': indptr,
+        'indices': np.asarray(indices, dtype=np.int32),
+        'data': np.asarray(data, dtype=np.float64),
+    }
+    return list(symptom_conditions), list(condition_index), csr
+
+
+class KnowledgeBase:
+    """Immutable compiled knowledge base; replaced wholesale on reload."""
+
+    def __init__(self, symptoms: List[str], conditions: List[str], csr: Dict[str, np.ndarray],
+                 severity: Dict[str, List[str]], suggestions: Dict[str, Dict[str, Any]],
+                 default_suggestions: Optional[Dict[str, Any]] = None,
+                 priors: Optional[Dict[str, Dict[str, Dict[str, float]]]] = None,
+                 version: Optional[str] = None):
+        indptr, indices = csr['indptr'], csr['indices']
+        if len(indptr) != len(symptoms) + 1 or indptr[-1] != len(indices) or len(indices) != len(csr['data']):
+            raise ValueError(f"CSR index does not match {len(symptoms)} symptoms")
+        if len(indices) and int(indices.max()) >= len(conditions):
+            raise ValueError(f"CSR index references more than {len(conditions)} conditions")
+
+        self.symptoms = symptoms
+        self.conditions = conditions
+        self.indptr = indptr
+        self.indices = indices
+        self.data = csr['data']
+        self.severity = severity
+        self.suggestions = suggestions
+        self.default_suggestions = default_suggestions or DEFAULT_SUGGESTIONS
+        # Relative prior factors: {"age_band": {band: {condition: factor}}, "gender": {...}}
+        self.priors = priors or {}
+        self.symptom_index = {symptom: i for i, symptom in enumerate(symptoms)}
+        self.version = version or self._fingerprint()
+
+        # Normalized-name indexes, precomputed for every condition in the catalog
+        self.severity_resolver = ConditionResolver(
+            [(keyword, level) for level, keywords in severity.items() for keyword in keywords],
+            default="medium",  # Default to medium severity
+            catalog=conditions,
+        )
+        self.suggestion_resolver = ConditionResolver(
+            list(suggestions.items()),
+            default=self.default_suggestions,
+            catalog=conditions,
+            prefer_exact=True,
+        )
+
+    @classmethod
+    def from_source(cls, source: Dict[str, Any]) -> 'KnowledgeBase':
+        """Compile the editable JSON source format."""
+        symptoms, conditions, csr = compile_condition_index(source['symptom_conditions'])
+        return cls(symptoms, conditions, csr,
+                   source.get('severity', {}),
+                   source.get('suggestions', {}),
+                   source.get('default_suggestions'),
+                   source.get('priors'))
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> 'KnowledgeBase':
+        """Load a compiled knowledge base, memory-mapping the CSR arrays."""
+        directory = Path(directory)
+        with open(directory / TABLES_FILE, 'r', encoding='utf-8') as f:
+            tables = json.load(f)
+
+        csr = {name: np.load(directory / filename, mmap_mode='r' if mmap else None)
+               for name, filename in tables['csr_files'].items()}
+        return cls(tables['symptoms'], tables['conditions'], csr,
+                   tables['severity'], tables['suggestions'],
+                   tables.get('default_suggestions'), tables.get('priors'), tables['version'])
+
+    def row(self, symptom_row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (condition ids, weights) linked to one symptom row."""
+        start, end = self.indptr[symptom_row], self.indptr[symptom_row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def rows_for(self, symptoms: Sequence[str]) -> List[int]:
+        """Map symptoms to rows (repeats kept, unknown symptoms ignored)."""
+        rows = []
+        for symptom in symptoms:
+            row = self.symptom_index.get(symptom.lower().replace(" ", "_"))
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def accumulate(self, symptom_rows: Sequence[int], data: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sum the weights of the given symptom rows (repeats count again).
+
+        Args:
+            symptom_rows: Rows to sum
+            data: Per-entry values aligned with ``indices`` (defaults to the weights)
+
+        Returns:
+            Tuple of (touched condition ids, summed weights); cost is proportional
+            to the touched entries, not to the catalog size
+        """
+        data = self.data if data is None else data
+        if not symptom_rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        if len(symptom_rows) == 1:
+            start, end = self.indptr[symptom_rows[0]], self.indptr[symptom_rows[0] + 1]
+            return np.array(self.indices[start:end]), np.array(data[start:end], dtype=np.float64)
+
+        slices = [slice(self.indptr[r], self.indptr[r + 1]) for r in symptom_rows]
+        ids = np.concatenate([self.indices[s] for s in slices])
+        weights = np.concatenate([data[s] for s in slices])
+        touched, inverse = np.unique(ids, return_inverse=True)
+        return touched, np.bincount(inverse.ravel(), weights=weights, minlength=len(touched))
+
+    def accumulate_batch(self, record_ids: np.ndarray, symptom_rows: np.ndarray,
+                         n_records: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sparse (records x symptoms) @ (symptoms x conditions) product.
+
+        Args:
+            record_ids: Record index of each (record, symptom) occurrence
+            symptom_rows: Symptom row of each occurrence
+            n_records: Number of records
+
+        Returns:
+            Tuple of (record ids, condition ids, summed weights) for every
+            non-zero cell, sorted by record then condition
+        """
+        starts = np.asarray(self.indptr[symptom_rows], dtype=np.int64)
+        lengths = np.asarray(self.indptr[symptom_rows + 1], dtype=np.int64) - starts
+        total = int(lengths.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float64)
+
+        # Position of every expanded entry inside indices/data
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        records = np.repeat(np.asarray(record_ids, dtype=np.int64), lengths)
+        keys = records * len(self.conditions) + self.indices[offsets]
+
+        cells, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=self.data[offsets], minlength=len(cells))
+        return cells // len(self.conditions), cells % len(self.conditions), sums
+
+    def save(self, directory: Path) -> None:
+        """Write the compiled form; tables.json is swapped in last."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        tables_path = directory / TABLES_FILE
+
+        previous: List[str] = []
+        if tables_path.exists():
+            try:
+                previous = list(json.loads(tables_path.read_text(encoding='utf-8')).get('csr_files', {}).values())
+            except (OSError, ValueError):
+                pass
+
+        csr_files = {}
+        for name in CSR_ARRAYS:
+            array = getattr(self, name)
+            filename = f"csr-{self.version}.{name}.npy"
+            if not (directory / filename).exists():
+                _atomic_write(directory / filename, lambda f, a=array: np.save(f, np.ascontiguousarray(a)))
+            csr_files[name] = filename
+
+        tables = {
+            'version': self.version,
+            'csr_files': csr_files,
+            'symptoms': self.symptoms,
+            'conditions': self.conditions,
+            'severity': self.severity,
+            'suggestions': self.suggestions,
+            'default_suggestions': self.default_suggestions,
+            'priors': self.priors,
+        }
+        payload = json.dumps(tables, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        _atomic_write(tables_path, lambda f: f.write(payload))
+
+        # Keep the previous arrays for workers still mapping them; drop older builds
+        keep = set(csr_files.values()) | set(previous)
+        for path in directory.glob('*.npy'):
+            if path.name not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _fingerprint(self) -> str:
+        digest = hashlib.sha1()
+        for name in CSR_ARRAYS:
+            digest.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        digest.update(json.dumps([self.symptoms, self.conditions, self.severity,
+                                  self.suggestions, self.default_suggestions, self.priors],
+                                 sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+
+def _atomic_write(path: Path, write: Callable[[Any], None]) -> None:
+    """Write a file via a temp file in the same directory and os.replace."""
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class KnowledgeBaseStore:
+    """Holds the active KnowledgeBase and hot-reloads it when the files change."""
+
+    def __init__(self, directory: Path = COMPILED_DIR, source_file: Path = SOURCE_FILE,
+                 check_interval: float = 2.0):
+        """
+        Args:
+            directory: Compiled knowledge base directory
+            source_file: JSON source, compiled in memory if no build exists
+            check_interval: Minimum seconds between mtime checks
+        """
+        self.directory = Path(directory)
+        self.source_file = Path(source_file)
+        self.check_interval = check_interval
+        self._kb: Optional[KnowledgeBase] = None
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+    def current(self) -> KnowledgeBase:
+        """Return the active knowledge base, reloading it first if its files changed."""
+        if self._kb is None or time.monotonic() >= self._next_check:
+            self.reload()
+        return self._kb
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reload the knowledge base if its files changed (or always, if force).
+
+        Returns:
+            True if a new knowledge base was swapped in
+        """
+        if self._kb is None:
+            self._lock.acquire()
+        elif not self._lock.acquire(blocking=False):
+            # Another thread is already reloading; keep serving the current one
+            return False
+
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            stamp = self._file_stamp()
+            if self._kb is not None and not force and stamp == self._stamp:
+                return False
+
+            try:
+                kb = self._load()
+            except Exception as e:
+                if self._kb is None:
+                    raise
+                logger.error(f"Knowledge base reload failed, keeping version {self._kb.version}: {e}")
+                return False
+
+            previous = self._kb
+            self._kb, self._stamp = kb, stamp
+        finally:
+            self._lock.release()
+
+        if previous is not None:
+            logger.info(f"Knowledge base reloaded: {previous.version} -> {kb.version}")
+            self.notify()
+        return True
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Register a callback to run after the knowledge base changes."""
+        self._listeners.append(callback)
+
+    def notify(self) -> None:
+        """Run change listeners (cache invalidation and similar)."""
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Knowledge base listener failed: {e}")
+
+    def _tables_path(self) -> Path:
+        return self.directory / TABLES_FILE
+
+    def _file_stamp(self):
+        path = self._tables_path() if self._tables_path().exists() else self.source_file
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return str(path), st.st_mtime_ns, st.st_ino, st.st_size
+
+    def _load(self) -> KnowledgeBase:
+        if self._tables_path().exists():
+            return KnowledgeBase.load(self.directory)
+
+        logger.warning(f"No compiled knowledge base in {self.directory}; compiling {self.source_file} in memory")
+        with open(self.source_file, 'r', encoding='utf-8') as f:
+            return KnowledgeBase.from_source(json.load(f))
+
+
+def build(source_file: Path = SOURCE_FILE, directory: Path = COMPILED_DIR) -> KnowledgeBase:
+    """Compile a JSON source file into the on-disk format."""
+    with open(source_file, 'r', encoding='utf-8') as f:
+        kb = KnowledgeBase.from_source(json.load(f))
+    kb.save(directory)
+    return kb
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compile the condition knowledge base")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_cmd = sub.add_parser('build', help="compile the JSON source into the memory-mapped format")
+    build_cmd.add_argument('--source', default=str(SOURCE_FILE))
+    build_cmd.add_argument('--out', default=str(COMPILED_DIR))
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        kb = build(Path(args.source), Path(args.out))
+        print(f"Built knowledge base {kb.version}: {len(kb.symptoms)} symptoms x "
+              f"{len(kb.conditions)} conditions -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Outbound MemoryMate mail queue.
+
+Routes hand reminder emails to a MailQueue instead of sending them in the
+request thread. A small pool of worker threads sends them, each keeping one
+Flask-Mail connection (``mail.connect()``) open while there is mail and for
+MEMORYMATE_MAIL_IDLE seconds after, so a burst of reminders pays for one SMTP
+connection and TLS handshake per worker instead of one per email (Flask-Mail's
+MAIL_MAX_EMAILS still caps the messages sent per connection).
+
+A failed send drops the connection and is retried with exponential backoff
+(MEMORYMATE_MAIL_BACKOFF seconds, doubled per attempt) up to
+MEMORYMATE_MAIL_RETRIES times. Messages queued with a key are sent at most
+once per key within MEMORYMATE_MAIL_DEDUP_TTL seconds; reminders use one key
+per user and due doses, so polling check_medicines does not repeat an email.
+
+The queue is per worker process and held in memory: mail still queued when
+the process exits is lost.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sending threads per worker process
+MAIL_WORKERS = int(os.getenv('MEMORYMATE_MAIL_WORKERS', 2))
+# Emails waiting to be sent before enqueue() turns new ones away
+MAIL_QUEUE = int(os.getenv('MEMORYMATE_MAIL_QUEUE', 1000))
+# Seconds an idle worker keeps its SMTP connection open
+MAIL_IDLE = float(os.getenv('MEMORYMATE_MAIL_IDLE', 30))
+# Retries after a failed send, and the first retry delay in seconds (doubled each time)
+MAIL_RETRIES = int(os.getenv('MEMORYMATE_MAIL_RETRIES', 3))
+MAIL_BACKOFF = float(os.getenv('MEMORYMATE_MAIL_BACKOFF', 2))
+# Seconds a dedup key is remembered after its email was queued
+MAIL_DEDUP_TTL = float(os.getenv('MEMORYMATE_MAIL_DEDUP_TTL', 24 * 3600))
+
+# Send latencies (enqueue to delivery) kept for the stats percentiles
+LATENCY_SAMPLES = 1000
+
+# MailQueue.submit outcomes
+QUEUED, DUPLICATE, FULL = 'queued', 'duplicate', 'full'
+
+
+@dataclass
+class _Outgoing:
+    message: Any
+    key: Optional[Hashable]
+    queued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+class MailQueue:
+    """Bounded outbound mail queue sent by a pool of connection-reusing workers."""
+
+    def __init__(self, app, mail=None, workers: int = MAIL_WORKERS, maxsize: int = MAIL_QUEUE,
+                 idle_seconds: float = MAIL_IDLE, retries: int = MAIL_RETRIES,
+                 backoff: float = MAIL_BACKOFF, dedup_ttl: float = MAIL_DEDUP_TTL):
+        """
+        Args:
+            app: Flask app the workers send in the context of
+            mail: Flask-Mail instance (defaults to ``app.mail``)
+            workers: Sending threads
+            maxsize: Emails waiting to be sent before new ones are turned away
+            idle_seconds: Seconds an idle worker keeps its connection open
+            retries: Retries after a failed send
+            backoff: First retry delay in seconds, doubled for each further attempt
+            dedup_ttl: Seconds a dedup key is remembered
+        """
+        self.app = app
+        self.mail = mail if mail is not None else app.mail
+        self.workers = max(1, workers)
+        self.idle_seconds = idle_seconds
+        self.retries = retries
+        self.backoff = backoff
+        self.dedup_ttl = dedup_ttl
+
+        self._queue: 'queue.Queue[_Outgoing]' = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0  # queued, being sent or waiting for a retry
+        self._keys: Dict[Hashable, float] = {}
+        self._key_order: deque = deque()
+        self._latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = dict.fromkeys(
+            ('queued', 'sent', 'retried', 'failed', 'deduplicated', 'dropped', 'connections'), 0)
+        self._threads: List[threading.Thread] = []
+        self._names = itertools.count(1)
+        self._stop = threading.Event()
+
+    def enqueue(self, message: Any, key: Optional[Hashable] = None) -> bool:
+        """
+        Queue a Flask-Mail message for delivery.
+
+        Args:
+            message: Message to send
+            key: Dedup key; a message whose key was queued within the dedup TTL is skipped
+
+        Returns:
+            True if the message was queued, False if it was a duplicate or the queue is full
+        """
+        return self.submit(message, key) == QUEUED
+
+    def submit(self, message: Any, key: Optional[Hashable] = None, timeout: float = 0) -> str:
+        """
+        Queue a Flask-Mail message for delivery, waiting up to ``timeout`` seconds for room.
+
+        Returns:
+            QUEUED, DUPLICATE, or FULL if there was no room in time
+        """
+        item = _Outgoing(message, key)
+        with self._lock:
+            now = time.monotonic()
+            if key is not None:
+                if self._keys.get(key, 0) > now:
+                    self._counters['deduplicated'] += 1
+                    return DUPLICATE
+                # Keys expire in the order they were added (the TTL is fixed)
+                while self._key_order and self._key_order[0][0] <= now:
+                    expiry, expired = self._key_order.popleft()
+                    if self._keys.get(expired) == expiry:
+                        del self._keys[expired]
+                self._keys[key] = now + self.dedup_ttl
+                self._key_order.append((self._keys[key], key))
+            self._outstanding += 1
+            self._start_workers()
+
+        # Wait for room without the lock, which the workers need to finish sends
+        try:
+            if timeout > 0:
+                self._queue.put(item, timeout=timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning("Mail queue is full, dropping an email")
+            with self._idle:
+                self._counters['dropped'] += 1
+                if key is not None:
+                    self._keys.pop(key, None)
+                self._outstanding -= 1
+                if self._outstanding == 0:
+                    self._idle.notify_all()
+            return FULL
+        with self._lock:
+            self._counters['queued'] += 1
+        return QUEUED
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, counters and send latency percentiles (seconds)."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self._counters, depth=self._queue.qsize(), outstanding=self._outstanding,
+                         workers=sum(thread.is_alive() for thread in self._threads))
+        for name, fraction in (('latency_p50', 0.5), ('latency_p95', 0.95), ('latency_max', 1.0)):
+            stats[name] = round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))], 4) \
+                if latencies else None
+        return stats
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued email was sent or given up on; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def stop(self) -> None:
+        """Stop the workers after the email each is sending (mail still queued is not sent)."""
+        self._stop.set()
+
+    # Workers
+
+    def _start_workers(self) -> None:
+        # Called with the lock held
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers and not self._stop.is_set():
+            thread = threading.Thread(target=self._run, name=f"memorymate-mail-{next(self._names)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self) -> None:
+        connection, last_sent = None, time.monotonic()
+        # Poll so idle connections are closed and stop() is noticed
+        poll = max(0.05, min(self.idle_seconds, 1.0))
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    item = self._queue.get(timeout=poll)
+                except queue.Empty:
+                    if connection is not None and time.monotonic() - last_sent >= self.idle_seconds:
+                        connection = self._close(connection)
+                    continue
+
+                try:
+                    if connection is None:
+                        connection = self.mail.connect().__enter__()
+                        with self._lock:
+                            self._counters['connections'] += 1
+                    connection.send(item.message)
+                except Exception as e:
+                    connection = self._close(connection)
+                    self._failed(item, e)
+                else:
+                    self._done(item, sent=True)
+                last_sent = time.monotonic()
+            self._close(connection)
+
+    def _close(self, connection) -> None:
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception as e:
+                logger.debug(f"Closing SMTP connection failed: {str(e)}")
+        return None
+
+    def _failed(self, item: _Outgoing, error: Exception) -> None:
+        item.attempts += 1
+        if item.attempts > self.retries or self._stop.is_set():
+            logger.error(f"Giving up on an email after {item.attempts} attempts: {str(error)}")
+            self._done(item, sent=False)
+            return
+        delay = self.backoff * 2 ** (item.attempts - 1)
+        logger.warning(f"Sending an email failed ({str(error)}), retrying in {delay:g}s")
+        with self._lock:
+            self._counters['retried'] += 1
+        timer = threading.Timer(delay, self._requeue, args=(item,))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, item: _Outgoing) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning("Mail queue is full, dropping a retried email")
+            with self._lock:
+                self._counters['dropped'] += 1
+            self._done(item, sent=False)
+
+    def _done(self, item: _Outgoing, sent: bool) -> None:
+        with self._idle:
+            if sent:
+                self._counters['sent'] += 1
+                self._latencies.append(time.monotonic() - item.queued_at)
+            else:
+                self._counters['failed'] += 1
+                # Let a later request try again
+                if item.key is not None:
+                    self._keys.pop(item.key, None)
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._idle.notify_all()
+
+
+_mail_queue: Optional[MailQueue] = None
+_mail_queue_lock = threading.Lock()
+
+
+def get_mail_queue(app) -> MailQueue:
+    """Return the process-wide mail queue, creating it for ``app`` on first use."""
+    global _mail_queue
+    if _mail_queue is None:
+        with _mail_queue_lock:
+            if _mail_queue is None:
+                _mail_queue = MailQueue(app)
+    return _mail_queue
+
+
+def set_mail_queue(mail_queue: Optional[MailQueue]) -> None:
+    """Replace the mail queue (None creates a new one on next use)."""
+    global _mail_queue
+    with _mail_queue_lock:
+        if _mail_queue is not None and _mail_queue is not mail_queue:
+            _mail_queue.stop()
+        _mail_queue = mail_queue
@@ -0,0 +1,90 @@
+"""
+Per-user medicine records keyed by a monotonic id.
+
+Ids are never reused: the counter only moves forward and is persisted with the
+records ({"next_id": n, "medicines": {"<id>": {...}}}), so a deleted medicine's
+id stays retired across restarts. The older list format is still accepted.
+Records are MedicineRecord objects; serialize books with records.dumps.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from records import MedicineRecord
+
+logger = logging.getLogger(__name__)
+
+
+class MedicineBook:
+    """
+    One user's medicines: an insertion-ordered id -> record map plus the next id.
+
+    Lookups, updates and deletes are O(1). Updates replace the record
+    instead of mutating it, so a record handed out to a reader never changes.
+    """
+
+    __slots__ = ('medicines', 'next_id')
+
+    def __init__(self, medicines: Optional[Dict[int, MedicineRecord]] = None, next_id: int = 1):
+        self.medicines: Dict[int, MedicineRecord] = medicines if medicines is not None else {}
+        self.next_id = max(next_id, max(self.medicines, default=0) + 1)
+
+    @classmethod
+    def from_json(cls, value: Any) -> 'MedicineBook':
+        """Build from the stored form (or a legacy list of medicines)."""
+        if isinstance(value, dict):
+            medicines = {int(medicine_id): MedicineRecord.from_dict(record)
+                         for medicine_id, record in (value.get('medicines') or {}).items()}
+            return cls(medicines, int(value.get('next_id', 1)))
+
+        book = cls()
+        duplicates = []
+        for record in value if isinstance(value, list) else []:
+            medicine_id = record.get('id')
+            if not isinstance(medicine_id, int) or medicine_id in book.medicines:
+                duplicates.append(record)
+            else:
+                book.put(MedicineRecord.from_dict(record))
+        # Old files could hold repeated ids (ids used to be len + 1); give those fresh ids
+        for record in duplicates:
+            new_id = book.allocate_id()
+            logger.warning(f"Reassigned duplicate medicine id {record.get('id')} to {new_id}")
+            book.put(MedicineRecord.from_dict(dict(record, id=new_id)))
+        return book
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'next_id': self.next_id,
+            'medicines': {str(medicine_id): record for medicine_id, record in self.medicines.items()},
+        }
+
+    def list(self) -> List[MedicineRecord]:
+        """Records in insertion order (safe to call while another thread writes)."""
+        return list(self.medicines.values())
+
+    def get(self, medicine_id: int) -> Optional[MedicineRecord]:
+        return self.medicines.get(medicine_id)
+
+    def allocate_id(self) -> int:
+        medicine_id = self.next_id
+        self.next_id += 1
+        return medicine_id
+
+    def put(self, record: MedicineRecord) -> None:
+        """Insert or replace a record by its id."""
+        self.medicines[record.id] = record
+        self.next_id = max(self.next_id, record.id + 1)
+
+    def update(self, medicine_id: int, fields: Dict[str, Any]) -> Optional[MedicineRecord]:
+        record = self.medicines.get(medicine_id)
+        if record is None:
+            return None
+        record = record.replace(fields)
+        self.medicines[medicine_id] = record
+        return record
+
+    def delete(self, medicine_id: int) -> bool:
+        return self.medicines.pop(medicine_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self.medicines)
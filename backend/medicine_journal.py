@@ -0,0 +1,317 @@
+"""
+Append-only journal for MemoryMate medicines.
+
+medicines.json is the snapshot ({email: {"next_id", "medicines"}}, see
+medicine_book.py; the older {email: [medicine, ...]} form is read too).
+Every add, update or delete is appended to medicines.json.log as one compact
+JSON line instead of rewriting the whole file; on startup the log is replayed
+over the snapshot into the in-memory index. Once the log holds ``compact_ops``
+records a background thread writes a fresh snapshot and starts a new log
+(writers wait while it runs).
+
+Log records are idempotent (adds carry their id and advance the user's id
+counter, updates set fields, deletes drop an id), so replaying a log over a
+snapshot that already contains some of its records - e.g. after a crash
+during compaction - gives the same result. A record torn by a crash is the
+last line of the log and is skipped.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from file_lock import FileLock
+from medicine_book import MedicineBook
+from records import MedicineRecord, dumps, loads
+
+logger = logging.getLogger(__name__)
+
+Medicines = Dict[str, MedicineBook]
+
+
+class MedicineJournal:
+    """
+    In-memory medicines index backed by a snapshot file plus an operation log.
+
+    Appends from concurrent threads share fsync calls (group commit): a writer
+    whose record was already covered by another thread's fsync returns
+    without syncing again. Other processes' appends and compactions are picked
+    up from the log size / inode, checked at most every ``check_interval``
+    seconds on reads and always before a write.
+
+    Appends and compactions hold an exclusive lock on ``<snapshot>.lock`` and
+    reloads a shared one, so workers never assign the same id, lose a record
+    or replay a log that is being swapped out.
+    """
+
+    def __init__(self, snapshot_path: str, log_path: Optional[str] = None,
+                 compact_ops: int = 1000, check_interval: float = 1.0, fsync: bool = True):
+        """
+        Args:
+            snapshot_path: Snapshot file ({email: {"next_id", "medicines"}})
+            log_path: Operation log (defaults to snapshot_path + '.log')
+            compact_ops: Log records that trigger a background compaction (0 disables it)
+            check_interval: Minimum seconds between checks for other processes' writes on reads
+            fsync: Whether appends are fsynced before returning
+        """
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or snapshot_path + '.log'
+        self.compact_ops = compact_ops
+        self.check_interval = check_interval
+        self.fsync = fsync
+
+        self._data: Medicines = {}
+        self._snapshot_signature: Optional[Tuple[int, int, int]] = None
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        self._log_ops = 0
+        self._torn = False
+        self._next_check = 0.0
+
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._compacting = False
+        self._fd: Optional[int] = None
+        self._file_lock = FileLock(snapshot_path + '.lock')
+
+        with self._file_lock.exclusive(), self._lock:
+            if not os.path.exists(snapshot_path):
+                _atomic_write_json(snapshot_path, {})
+            self._load()
+
+    # Reads
+
+    def read(self) -> Medicines:
+        """Return the index ({email: MedicineBook}); callers must not mutate it."""
+        if time.monotonic() >= self._next_check:
+            with self._file_lock.shared(), self._lock:
+                self._catch_up()
+        return self._data
+
+    # Writes
+
+    def add(self, email: str, medicine: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a medicine, assigning the next id for the user."""
+        return self.add_many(email, [medicine])[0]
+
+    def add_many(self, email: str, medicines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Append several medicines with consecutive ids in one write and one fsync."""
+        if not medicines:
+            return []
+        with self._file_lock.exclusive(), self._lock:
+            self._catch_up(force=True)
+            book = self._data.get(email)
+            if book is None:
+                book = MedicineBook()
+            records = [MedicineRecord.from_dict(dict(medicine, id=book.next_id + i))
+                       for i, medicine in enumerate(medicines)]
+            seq = self._commit(*({"op": "add", "email": email, "medicine": record} for record in records))
+        self._after_commit(seq)
+        return [record.to_dict() for record in records]
+
+    def update(self, email: str, medicine_id: int, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Set some fields of a medicine; None if it does not exist."""
+        with self._file_lock.exclusive(), self._lock:
+            self._catch_up(force=True)
+            book = self._data.get(email)
+            if book is None or book.get(medicine_id) is None:
+                return None
+            seq = self._commit({"op": "update", "email": email, "id": medicine_id, "fields": fields})
+            medicine = book.get(medicine_id).to_dict()
+        self._after_commit(seq)
+        return medicine
+
+    def delete(self, email: str, medicine_id: int) -> bool:
+        """Remove a medicine; False if it does not exist."""
+        with self._file_lock.exclusive(), self._lock:
+            self._catch_up(force=True)
+            book = self._data.get(email)
+            if book is None or book.get(medicine_id) is None:
+                return False
+            seq = self._commit({"op": "delete", "email": email, "id": medicine_id})
+        self._after_commit(seq)
+        return True
+
+    def compact(self) -> None:
+        """Write the current index as the snapshot and start an empty log."""
+        with self._file_lock.exclusive(), self._lock:
+            self._catch_up(force=True)
+            # A torn record at the end of the old log is dropped with it
+            _atomic_write_json(self.snapshot_path, {email: book.to_json() for email, book in self._data.items()})
+            _atomic_write_bytes(self.log_path, b'')
+            self._close_log()
+            self._snapshot_signature = _signature(self.snapshot_path)
+            self._log_inode = os.stat(self.log_path).st_ino
+            self._log_offset = 0
+            self._log_ops = 0
+            self._torn = False
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_log()
+
+    # Internals
+
+    def _commit(self, *records: Dict[str, Any]) -> int:
+        """Append records in one write and apply them to the index (caller holds the lock); returns the sequence number."""
+        line = b''.join(dumps(record) + b'\n' for record in records)
+        if self._torn:
+            # Terminate a record torn by an earlier crash so it stays on its own line
+            line = b'\n' + line
+            self._torn = False
+
+        os.write(self._log_fd(), line)
+        self._log_offset += len(line)
+        self._log_ops += len(records)
+        self._written_seq += 1
+        for record in records:
+            _apply(self._data, record)
+        return self._written_seq
+
+    def _after_commit(self, seq: int) -> None:
+        # Runs without the index lock so other writers can append and share the fsync
+        if self.fsync:
+            self._sync(seq)
+
+        if self.compact_ops and self._log_ops >= self.compact_ops and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._background_compact, name="medicine-journal-compact",
+                             daemon=True).start()
+
+    def _sync(self, seq: int) -> None:
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return
+            target = self._written_seq
+            fd = self._fd
+            if fd is not None:
+                os.fsync(fd)
+            self._synced_seq = target
+
+    def _background_compact(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Medicine journal compaction failed: {str(e)}")
+        finally:
+            self._compacting = False
+
+    def _log_fd(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _close_log(self) -> None:
+        if self._fd is not None:
+            with self._sync_lock:
+                os.close(self._fd)
+                self._fd = None
+                self._synced_seq = self._written_seq
+
+    def _load(self) -> None:
+        with open(self.snapshot_path, 'rb') as f:
+            data = loads(f.read())
+        self._data = {email: MedicineBook.from_json(book) for email, book in data.items()} \
+            if isinstance(data, dict) else {}
+        self._snapshot_signature = _signature(self.snapshot_path)
+        self._close_log()
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_ops = 0
+        self._torn = False
+        self._replay()
+        self._next_check = time.monotonic() + self.check_interval
+
+    def _replay(self) -> None:
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            return
+
+        if st.st_ino != self._log_inode:
+            self._log_inode = st.st_ino
+            self._log_offset = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            chunk = f.read()
+
+        end = chunk.rfind(b'\n') + 1
+        for raw in chunk[:end].splitlines():
+            if not raw.strip():
+                continue
+            try:
+                _apply(self._data, loads(raw))
+                self._log_ops += 1
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"Skipping corrupt medicine journal record in {self.log_path}")
+        self._log_offset += end
+        # Trailing bytes without a newline are a record torn by a crash
+        self._torn = end < len(chunk)
+
+    def _catch_up(self, force: bool = False) -> None:
+        if not force and time.monotonic() < self._next_check:
+            return
+        try:
+            log = os.stat(self.log_path)
+        except FileNotFoundError:
+            log = None
+
+        if _signature(self.snapshot_path) != self._snapshot_signature or (
+                log is not None and self._log_inode is not None and
+                (log.st_ino != self._log_inode or log.st_size < self._log_offset)):
+            # Another process compacted: start over from its snapshot
+            self._load()
+            return
+        if log is not None and log.st_size > self._log_offset:
+            self._replay()
+        self._next_check = time.monotonic() + self.check_interval
+
+
+def _apply(data: Medicines, record: Dict[str, Any]) -> None:
+    """Apply one log record to the index."""
+    op, email = record["op"], record["email"]
+    if op == "add":
+        medicine = record["medicine"]
+        if not isinstance(medicine, MedicineRecord):
+            # Replayed from the log
+            medicine = MedicineRecord.from_dict(medicine)
+        data.setdefault(email, MedicineBook()).put(medicine)
+    elif op == "update":
+        if email in data:
+            data[email].update(record["id"], record["fields"])
+    elif op == "delete":
+        if email in data:
+            data[email].delete(record["id"])
+    else:
+        raise ValueError(f"Unknown journal operation '{op}'")
+
+
+def _signature(path: str) -> Tuple[int, int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_ino, st.st_size
+
+
+def _atomic_write_json(path: str, data: Any) -> None:
+    _atomic_write_bytes(path, dumps(data))
+
+
+def _atomic_write_bytes(path: str, payload: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
@@ -1,14 +1,65 @@
 """
 MemoryMate - Medicine Reminder System Routes
+
+Login returns a session token; the other routes (apart from register) need it
+as ``Authorization: Bearer <token>`` and only serve the token's own user.
+The /events stream also accepts it as ``?token=``, since EventSource cannot
+send headers.
 """
 
-from flask import Blueprint, request, jsonify, current_app
+import hmac
+import json
+import os
+import time
+from functools import wraps
+
+from flask import Blueprint, Response, request, jsonify, current_app, g, stream_with_context
+from dispatch import DISPATCHER, reminder_message
+from mailer import get_mail_queue
 from models import User, Medicine
+from records import MedicineRecord, RecordError
+from reminders import get_scheduler
 from datetime import datetime
-from utils import send_medicine_reminder_email
+from push import SSE_HEARTBEAT, SSE_RETRY_MS, HubFull, due_event, format_event, get_hub
+from sessions import SESSIONS, InvalidSession
 
 memorymate_bp = Blueprint('memorymate', __name__, url_prefix='/api/memorymate')
 
+REQUIRED_MEDICINE_FIELDS = ['name', 'dosage', 'frequency', 'time_of_day', 'start_date', 'end_date']
+# Most medicines accepted by one /medicines/bulk request
+MAX_BULK_MEDICINES = int(os.getenv('MEMORYMATE_MAX_BULK', 500))
+# Medicines per chunk of an NDJSON export
+EXPORT_CHUNK_RECORDS = int(os.getenv('MEMORYMATE_EXPORT_CHUNK_RECORDS', 256))
+# Bearer token for exporting every user's medicines (unset disables it)
+ADMIN_TOKEN = os.getenv('MEMORYMATE_ADMIN_TOKEN', '')
+
+
+def session_required(view=None, query_token: bool = False):
+    """
+    Verify the bearer token and check it belongs to the <email> in the URL.
+    
+    With query_token=True the token may also come as ?token= (EventSource
+    cannot set headers).
+    """
+    if view is None:
+        return lambda view: session_required(view, query_token)
+    
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        token = header[7:].strip() if header[:7].lower() == 'bearer ' else None
+        if token is None and query_token:
+            token = request.args.get('token')
+        try:
+            g.session = SESSIONS.verify(token)
+        except InvalidSession as e:
+            return jsonify({'error': str(e)}), 401
+        
+        if 'email' in kwargs and str(kwargs['email']).lower().strip() != g.session['sub']:
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 
 @memorymate_bp.route('/register', methods=['POST'])
 def register():
@@ -23,6 +74,8 @@ def register():
         
         if result['success']:
             return jsonify(result), 201
+        elif result.get('busy'):
+            return jsonify(result), 503
         else:
             return jsonify(result), 400
     except Exception as e:
@@ -41,25 +94,36 @@ def login():
         result = User.login(data['email'], data['password'])
         
         if result['success']:
+            result.update(SESSIONS.issue(result['user']['email'], result['user']['name']))
             return jsonify(result), 200
+        elif result.get('busy'):
+            return jsonify(result), 503
         else:
             return jsonify(result), 401
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@memorymate_bp.route('/logout', methods=['POST'])
+@session_required
+def logout():
+    """Revoke the current session token."""
+    SESSIONS.revoke(g.session)
+    return jsonify({'success': True, 'message': 'Logged out'}), 200
+
+
 @memorymate_bp.route('/add_medicine', methods=['POST'])
+@session_required
 def add_medicine():
     """Add a new medicine reminder."""
     try:
         data = request.get_json()
-        email = str(data.get('email', '')).lower().strip()
+        email = str(data.get('email') or g.session['sub']).lower().strip()
         
-        if not email:
-            return jsonify({'error': 'Email required'}), 400
+        if email != g.session['sub']:
+            return jsonify({'error': 'Forbidden'}), 403
         
-        required_fields = ['name', 'dosage', 'frequency', 'time_of_day', 'start_date', 'end_date']
-        if not all(field in data for field in required_fields):
+        if not all(field in data for field in REQUIRED_MEDICINE_FIELDS):
             return jsonify({'error': 'Missing required fields'}), 400
         
         result = Medicine.add_medicine(email, {
@@ -80,7 +144,129 @@ def add_medicine():
         return jsonify({'error': str(e), 'details': traceback.format_exc()}), 500
 
 
+@memorymate_bp.route('/medicines/bulk', methods=['POST'])
+@session_required
+def add_medicines_bulk():
+    """
+    Add many medicine reminders in one storage write.
+    
+    Request body:
+    {
+        "medicines": [{"name": "...", "dosage": "...", "frequency": "...",
+                       "time_of_day": "...", "start_date": "...", "end_date": "..."}, ...]
+    }
+    
+    Returns:
+        201 with the stored medicines (consecutive ids), or 400 with per-item
+        errors; nothing is stored unless every item is valid
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            data = {}
+        medicines = data.get('medicines')
+        email = str(data.get('email') or g.session['sub']).lower().strip()
+        
+        if email != g.session['sub']:
+            return jsonify({'error': 'Forbidden'}), 403
+        
+        if not isinstance(medicines, list) or not medicines:
+            return jsonify({'error': "A non-empty 'medicines' list is required"}), 400
+        
+        if len(medicines) > MAX_BULK_MEDICINES:
+            return jsonify({'error': f'Bulk import exceeds limit of {MAX_BULK_MEDICINES} medicines'}), 400
+        
+        # Validate each item once; storage receives the cleaned records
+        errors, cleaned = [], []
+        created_at = datetime.now().isoformat()
+        for index, medicine in enumerate(medicines):
+            if not isinstance(medicine, dict):
+                errors.append({'index': index, 'error': 'Medicine must be an object'})
+                continue
+            missing = [field for field in REQUIRED_MEDICINE_FIELDS if field not in medicine]
+            if missing:
+                errors.append({'index': index, 'error': f"Missing required fields: {', '.join(missing)}"})
+                continue
+            try:
+                cleaned.append(MedicineRecord.clean_new(medicine, created_at=created_at))
+            except RecordError as e:
+                errors.append({'index': index, 'error': str(e)})
+        if errors:
+            return jsonify({'error': 'Invalid medicines', 'errors': errors}), 400
+        
+        result = Medicine.add_medicines(email, cleaned)
+        
+        if result['success']:
+            return jsonify(result), 201
+        else:
+            return jsonify(result), 400
+    except Exception as e:
+        import traceback
+        return jsonify({'error': str(e), 'details': traceback.format_exc()}), 500
+
+
+@memorymate_bp.route('/medicines/export', methods=['GET'])
+@session_required
+def export_medicines():
+    """Stream the session user's medicines as NDJSON, one medicine per line."""
+    return _ndjson_response(Medicine.export(g.session['sub']))
+
+
+@memorymate_bp.route('/medicines/export/all', methods=['GET'])
+def export_all_medicines():
+    """Stream every user's medicines as NDJSON (needs MEMORYMATE_ADMIN_TOKEN as the bearer token)."""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return _ndjson_response(Medicine.export())
+
+
+@memorymate_bp.route('/mail/stats', methods=['GET'])
+def mail_stats():
+    """Outbound mail queue depth, counters and latency (needs MEMORYMATE_ADMIN_TOKEN as the bearer token)."""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(get_mail_queue(current_app._get_current_object()).stats()), 200
+
+
+@memorymate_bp.route('/reminders/dispatch', methods=['GET', 'POST'])
+def dispatch_reminders():
+    """
+    POST starts emailing every opted-in user with a dose due now (in the
+    background); GET reports whether a dispatch is running and the last
+    one's results. Needs MEMORYMATE_ADMIN_TOKEN as the bearer token.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'POST':
+        if not DISPATCHER.start(get_mail_queue(current_app._get_current_object())):
+            return jsonify({'error': 'A dispatch is already running'}), 409
+        return jsonify({'started': True}), 202
+    return jsonify({'running': DISPATCHER.running, 'report': DISPATCHER.report}), 200
+
+
+def is_admin_request() -> bool:
+    """Whether the request carries MEMORYMATE_ADMIN_TOKEN as its bearer token (never while unset)."""
+    header = request.headers.get('Authorization', '')
+    token = header[7:].strip() if header[:7].lower() == 'bearer ' else ''
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+def _ndjson_response(medicines) -> Response:
+    def generate():
+        chunk = []
+        for medicine in medicines:
+            chunk.append(json.dumps(medicine, separators=(',', ':'), default=str))
+            if len(chunk) >= EXPORT_CHUNK_RECORDS:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @memorymate_bp.route('/list_medicines/<email>', methods=['GET'])
+@session_required
 def list_medicines(email):
     """Get all medicines for a user."""
     try:
@@ -93,6 +279,7 @@ def list_medicines(email):
 
 
 @memorymate_bp.route('/edit_medicine/<email>/<int:medicine_id>', methods=['PUT'])
+@session_required
 def edit_medicine(email, medicine_id):
     """Edit a medicine."""
     try:
@@ -111,6 +298,7 @@ def edit_medicine(email, medicine_id):
 
 
 @memorymate_bp.route('/delete_medicine/<email>/<int:medicine_id>', methods=['DELETE'])
+@session_required
 def delete_medicine(email, medicine_id):
     """Delete a medicine."""
     try:
@@ -128,53 +316,35 @@ def delete_medicine(email, medicine_id):
 
 
 @memorymate_bp.route('/check_medicines/<email>', methods=['GET'])
+@session_required
 def check_medicines(email):
     """Check if any medicines are due now and send email notifications if enabled."""
     try:
         email = str(email).lower().strip()
         send_email = request.args.get('send_email', 'false').lower() == 'true'
         
-        medicines = Medicine.get_medicines(email)
-        user = User.get_user(email)
-        current_time = datetime.now().strftime('%H:%M')
-        current_hour = int(datetime.now().strftime('%H'))
+        # The session token carries the name, so no user lookup is needed
+        user = g.session
         
-        due_medicines = []
+        # Answered from the scheduler's due index (no scan of the user's medicines)
+        doses = get_scheduler().due_doses(email)
+        due_medicines = [{
+            'name': medicine['name'],
+            'dosage': medicine['dosage'],
+            'frequency': medicine['frequency'],
+            'message': f"Time to take {medicine['name']} - {medicine['dosage']}"
+        } for medicine, end in doses]
         
-        for medicine in medicines:
-            # Simple time matching logic
-            time_of_day = str(medicine.get('time_of_day', '')).lower().strip()
-            should_remind = False
-            
-            if time_of_day == 'morning' and 6 <= current_hour < 12:
-                should_remind = True
-            elif time_of_day == 'afternoon' and 12 <= current_hour < 18:
-                should_remind = True
-            elif time_of_day == 'night' and (current_hour >= 18 or current_hour < 6):
-                should_remind = True
-            
-            if should_remind:
-                due_medicines.append({
-                    'name': medicine['name'],
-                    'dosage': medicine['dosage'],
-                    'frequency': medicine['frequency'],
-                    'message': f"Time to take {medicine['name']} - {medicine['dosage']}"
-                })
-        
-        # Send email notification if requested and medicines are due
+        # Queue an email notification if requested and medicines are due (once per set of due doses)
         email_sent = False
         if send_email and due_medicines and user:
             try:
-                email_sent = send_medicine_reminder_email(
-                    current_app.mail,
-                    email,
-                    user.get('name', 'User'),
-                    due_medicines
-                )
+                message, key = reminder_message(email, user.get('name', 'User'), doses)
+                email_sent = get_mail_queue(current_app._get_current_object()).enqueue(message, key)
             except Exception as e:
                 import logging
                 logger = logging.getLogger(__name__)
-                logger.error(f"Failed to send email notification: {str(e)}")
+                logger.error(f"Failed to queue email notification: {str(e)}")
         
         return jsonify({
             'due_medicines': due_medicines,
@@ -185,7 +355,47 @@ def check_medicines(email):
         return jsonify({'error': str(e)}), 500
 
 
+@memorymate_bp.route('/events/<email>', methods=['GET'])
+@session_required(query_token=True)
+def reminder_events(email):
+    """
+    Stream due-medicine events (text/event-stream) until the session expires.
+    
+    Sends the doses due at connect time, then an event each time the reminder
+    scheduler fires one of the user's doses, with heartbeat comments between.
+    """
+    email = str(email).lower().strip()
+    hub = get_hub()
+    scheduler = get_scheduler()
+    hub.attach(scheduler)
+    try:
+        subscription = hub.subscribe(email)
+    except HubFull as e:
+        return jsonify({'error': str(e)}), 503
+    # Read after subscribing so a dose firing in between is not missed
+    due_now = scheduler.due_doses(email)
+    expires_at = g.session['exp']
+    
+    def generate():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        for medicine, until in due_now:
+            yield format_event(due_event(medicine, until))
+        while True:
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                yield format_event({'error': 'Session expired'}, 'expired')
+                return
+            event = subscription.get(min(SSE_HEARTBEAT, remaining))
+            yield format_event(event) if event is not None else ": ping\n\n"
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: hub.unsubscribe(subscription))
+    return response
+
+
 @memorymate_bp.route('/email_preference/<email>', methods=['GET', 'POST'])
+@session_required
 def email_preference(email):
     """Get or set email notification preferences."""
     try:
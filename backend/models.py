@@ -1,28 +1,22 @@
 """
 Database models for MemoryMate and user authentication.
-Using simple JSON-based storage instead of heavy database.
+Records are kept by a pluggable backend (storage.py): JSON files for
+development, or SQLite / per-user shards for production, selected with
+MEMORYMATE_STORAGE. File backends lock every read-modify-write across
+processes (file_lock.py) and replace files atomically. Passwords are stored
+as scrypt/argon2 hashes (credentials.py).
 """
 
-import json
-import os
+import logging
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 
-# Data directory
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-os.makedirs(DATA_DIR, exist_ok=True)
+import reminders
+from credentials import CredentialsBusy, get_credentials
+from records import MedicineRecord, RecordError, UserRecord
+from storage import get_storage
 
-USERS_FILE = os.path.join(DATA_DIR, 'users.json')
-MEDICINES_FILE = os.path.join(DATA_DIR, 'medicines.json')
-
-# Initialize files if they don't exist
-if not os.path.exists(USERS_FILE):
-    with open(USERS_FILE, 'w') as f:
-        json.dump({}, f)
-
-if not os.path.exists(MEDICINES_FILE):
-    with open(MEDICINES_FILE, 'w') as f:
-        json.dump({}, f)
+logger = logging.getLogger(__name__)
 
 
 class User:
@@ -32,35 +26,25 @@ class User:
     def register(email: str, name: str, password: str) -> Dict[str, Any]:
         """Register a new user."""
         try:
-            # Normalize email
-            email = str(email).lower().strip()
-            name = str(name).strip()
-            password = str(password).strip()
+            # Validate and normalize once (trimmed, email lowercased)
+            user = UserRecord.from_input(email, name, password, created_at=datetime.now().isoformat())
             
-            with open(USERS_FILE, 'r') as f:
-                users = json.load(f)
+            # Skip the (deliberately slow) hash for an obvious duplicate
+            if get_storage().get_user(user.email) is not None:
+                return {'success': False, 'error': 'User already exists'}
             
-            # Ensure users is a dict
-            if not isinstance(users, dict):
-                users = {}
+            user.password = get_credentials().hash(user.password)
+            added = get_storage().add_user(user.to_dict())
             
             # Check if user already exists
-            if email in users:
+            if not added:
                 return {'success': False, 'error': 'User already exists'}
             
-            # Store user (in production, hash password with bcrypt)
-            users[email] = {
-                'name': name,
-                'email': email,
-                'password': password,  # WARNING: Never store plain passwords in production!
-                'created_at': datetime.now().isoformat(),
-                'email_notifications_enabled': False  # Initialize email preference
-            }
-            
-            with open(USERS_FILE, 'w') as f:
-                json.dump(users, f, indent=2, default=str)
-            
             return {'success': True, 'message': 'User registered successfully'}
+        except RecordError as e:
+            return {'success': False, 'error': str(e)}
+        except CredentialsBusy as e:
+            return {'success': False, 'error': str(e), 'busy': True}
         except Exception as e:
             import traceback
             return {'success': False, 'error': str(e), 'details': traceback.format_exc()}
@@ -73,16 +57,21 @@ class User:
             email = str(email).lower().strip()
             password = str(password).strip()
             
-            with open(USERS_FILE, 'r') as f:
-                users = json.load(f)
-            
-            if not isinstance(users, dict) or email not in users:
+            user = get_storage().get_user(email)
+            if user is None:
                 return {'success': False, 'error': 'User not found'}
             
-            user = users[email]
-            if user['password'] != password:
+            credentials = get_credentials()
+            if not credentials.verify(password, user['password']):
                 return {'success': False, 'error': 'Invalid password'}
             
+            # Upgrade hashes made with older cost settings (or stored in plaintext)
+            if credentials.needs_rehash(user['password']):
+                try:
+                    get_storage().update_user(email, {'password': credentials.hash(password)})
+                except Exception as e:
+                    logger.warning(f"Failed to rehash password for {email}: {str(e)}")
+            
             return {
                 'success': True,
                 'user': {
@@ -90,6 +79,8 @@ class User:
                     'name': user['name']
                 }
             }
+        except CredentialsBusy as e:
+            return {'success': False, 'error': str(e), 'busy': True}
         except Exception as e:
             import traceback
             return {'success': False, 'error': str(e), 'details': traceback.format_exc()}
@@ -101,14 +92,9 @@ class User:
             # Normalize email
             email = str(email).lower().strip()
             
-            with open(USERS_FILE, 'r') as f:
-                users = json.load(f)
-            
-            if not isinstance(users, dict) or email not in users:
-                return None
-            
-            return users[email]
+            return get_storage().get_user(email)
         except Exception as e:
+            logger.error(f"Failed to read user {email}: {str(e)}")
             return None
     
     @staticmethod
@@ -119,20 +105,9 @@ class User:
             email = str(email).lower().strip()
             enabled = bool(enabled)
             
-            with open(USERS_FILE, 'r') as f:
-                users = json.load(f)
-            
-            if not isinstance(users, dict):
-                users = {}
-            
-            if email not in users:
+            if get_storage().update_user(email, {'email_notifications_enabled': enabled}) is None:
                 return {'success': False, 'error': 'User not found'}
             
-            users[email]['email_notifications_enabled'] = enabled
-            
-            with open(USERS_FILE, 'w') as f:
-                json.dump(users, f, indent=2, default=str)
-            
             status = 'enabled' if enabled else 'disabled'
             return {
                 'success': True,
@@ -154,37 +129,34 @@ class Medicine:
             # Ensure email is a string
             email = str(email).lower().strip()
             
-            with open(MEDICINES_FILE, 'r') as f:
-                medicines = json.load(f)
-            
-            # Ensure medicines is a dict
-            if not isinstance(medicines, dict):
-                medicines = {}
-            
-            if email not in medicines:
-                medicines[email] = []
-            
-            # Ensure medicines[email] is a list
-            if not isinstance(medicines[email], list):
-                medicines[email] = []
-            
-            medicine = {
-                'id': len(medicines[email]) + 1,
-                'name': str(medicine_data.get('name', '')).strip(),
-                'dosage': str(medicine_data.get('dosage', '')).strip(),
-                'frequency': str(medicine_data.get('frequency', 'once')).strip(),
-                'time_of_day': str(medicine_data.get('time_of_day', 'morning')).strip(),
-                'start_date': str(medicine_data.get('start_date', '')).strip(),
-                'end_date': str(medicine_data.get('end_date', '')).strip(),
-                'created_at': datetime.now().isoformat()
-            }
+            medicine = get_storage().add_medicine(
+                email, MedicineRecord.clean_new(medicine_data, created_at=datetime.now().isoformat()))
+            reminders.medicine_changed(email, medicine)
             
-            medicines[email].append(medicine)
+            return {'success': True, 'message': 'Medicine added', 'medicine': medicine}
+        except RecordError as e:
+            return {'success': False, 'error': str(e)}
+        except Exception as e:
+            import traceback
+            return {'success': False, 'error': str(e), 'details': traceback.format_exc()}
+    
+    @staticmethod
+    def add_medicines(email: str, medicines_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Add several medicines in one storage write (all or nothing).
+        
+        Args:
+            email: User's email
+            medicines_data: Medicines already validated with MedicineRecord.clean_new
+        """
+        try:
+            email = str(email).lower().strip()
             
-            with open(MEDICINES_FILE, 'w') as f:
-                json.dump(medicines, f, indent=2, default=str)
+            medicines = get_storage().add_medicines(email, medicines_data)
+            for medicine in medicines:
+                reminders.medicine_changed(email, medicine)
             
-            return {'success': True, 'message': 'Medicine added', 'medicine': medicine}
+            return {'success': True, 'message': f'{len(medicines)} medicines added', 'medicines': medicines}
         except Exception as e:
             import traceback
             return {'success': False, 'error': str(e), 'details': traceback.format_exc()}
@@ -195,44 +167,43 @@ class Medicine:
         try:
             email = str(email).lower().strip()
             
-            with open(MEDICINES_FILE, 'r') as f:
-                medicines = json.load(f)
-            
-            if not isinstance(medicines, dict):
-                return []
-            
-            return medicines.get(email, [])
+            return get_storage().get_medicines(email)
         except Exception as e:
+            logger.error(f"Failed to read medicines for {email}: {str(e)}")
             return []
     
+    @staticmethod
+    def export(email: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield medicines tagged with their user's email, for one user or all of them."""
+        if email is not None:
+            email = str(email).lower().strip()
+            for medicine in get_storage().get_medicines(email):
+                yield dict(medicine, email=email)
+            return
+        
+        for owner, medicines, _ in get_storage().iter_medicines():
+            for medicine in medicines:
+                yield dict(medicine, email=owner)
+    
     @staticmethod
     def update_medicine(email: str, medicine_id: int, medicine_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update a medicine."""
         try:
             email = str(email).lower().strip()
             
-            with open(MEDICINES_FILE, 'r') as f:
-                medicines = json.load(f)
+            # Fields left out keep their value
+            fields = MedicineRecord.clean_fields(medicine_data)
             
-            if not isinstance(medicines, dict) or email not in medicines:
-                return {'success': False, 'error': 'No medicines found'}
-            
-            for medicine in medicines[email]:
-                if medicine['id'] == medicine_id:
-                    # Update with string conversions
-                    medicine['name'] = str(medicine_data.get('name', medicine['name'])).strip()
-                    medicine['dosage'] = str(medicine_data.get('dosage', medicine['dosage'])).strip()
-                    medicine['frequency'] = str(medicine_data.get('frequency', medicine['frequency'])).strip()
-                    medicine['time_of_day'] = str(medicine_data.get('time_of_day', medicine['time_of_day'])).strip()
-                    medicine['start_date'] = str(medicine_data.get('start_date', medicine['start_date'])).strip()
-                    medicine['end_date'] = str(medicine_data.get('end_date', medicine['end_date'])).strip()
-                    
-                    with open(MEDICINES_FILE, 'w') as f:
-                        json.dump(medicines, f, indent=2, default=str)
-                    
-                    return {'success': True, 'message': 'Medicine updated', 'medicine': medicine}
+            medicine = get_storage().update_medicine(email, medicine_id, fields)
+            if medicine is not None:
+                reminders.medicine_changed(email, medicine)
+                return {'success': True, 'message': 'Medicine updated', 'medicine': medicine}
             
+            if not get_storage().get_medicines(email):
+                return {'success': False, 'error': 'No medicines found'}
             return {'success': False, 'error': 'Medicine not found'}
+        except RecordError as e:
+            return {'success': False, 'error': str(e)}
         except Exception as e:
             import traceback
             return {'success': False, 'error': str(e), 'details': traceback.format_exc()}
@@ -243,20 +214,11 @@ class Medicine:
         try:
             email = str(email).lower().strip()
             
-            with open(MEDICINES_FILE, 'r') as f:
-                medicines = json.load(f)
-            
-            if not isinstance(medicines, dict) or email not in medicines:
-                return {'success': False, 'error': 'No medicines found'}
-            
-            original_count = len(medicines[email])
-            medicines[email] = [m for m in medicines[email] if m['id'] != medicine_id]
-            
-            if len(medicines[email]) == original_count:
+            if not get_storage().delete_medicine(email, medicine_id):
+                if not get_storage().get_medicines(email):
+                    return {'success': False, 'error': 'No medicines found'}
                 return {'success': False, 'error': 'Medicine not found'}
-            
-            with open(MEDICINES_FILE, 'w') as f:
-                json.dump(medicines, f, indent=2, default=str)
+            reminders.medicine_removed(email, medicine_id)
             
             return {'success': True, 'message': 'Medicine deleted'}
         except Exception as e:
@@ -0,0 +1,255 @@
+"""
+Pluggable scoring models behind predict_conditions.
+
+Every model ranks knowledge base conditions for one symptom set and returns
+(condition id, probability in 0-1) pairs, so the response shape is the same
+whichever model is selected.
+"""
+
+import heapq
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge_base import KnowledgeBase
+
+Ranking = List[Tuple[int, float]]
+
+AGE_BANDS = ("child", "adult", "elderly")
+
+
+def age_band(age: int) -> str:
+    """
+    Bucket an age into the bands used by the prediction models.
+
+    Args:
+        age: Patient age
+
+    Returns:
+        'child', 'adult' or 'elderly'
+    """
+    if age < 12:
+        return "child"
+    if age > 65:
+        return "elderly"
+    return "adult"
+
+
+def top_conditions(columns: np.ndarray, scores: np.ndarray, top_n: int) -> List[Tuple[int, float]]:
+    """
+    Select the top_n positive scores with a bounded heap, highest first.
+    Ties are broken by knowledge base order.
+
+    Returns:
+        List of (condition id, score) pairs
+    """
+    if top_n <= 0:
+        return []
+
+    candidates = ((score, column) for score, column in zip(scores.tolist(), columns.tolist()) if score > 0)
+    best = heapq.nlargest(top_n, candidates, key=lambda pair: (pair[0], -pair[1]))
+    return [(column, score) for score, column in best]
+
+
+class PredictionModel:
+    """Interface for condition scoring models."""
+
+    name = ""
+
+    def rank(self, kb: KnowledgeBase, age: int, gender: str, symptoms: List[str], top_n: int) -> Ranking:
+        """Return the top_n (condition id, probability 0-1) pairs, best first."""
+        raise NotImplementedError
+
+    def rank_batch(self, kb: KnowledgeBase, records: List[Dict[str, Any]], top_n: int) -> List[Ranking]:
+        """Rank many validated records; models can override with a vectorized path."""
+        return [self.rank(kb, r['age'], r['gender'], r.get('symptoms') or [], top_n) for r in records]
+
+    def entry_values(self, kb: KnowledgeBase) -> np.ndarray:
+        """Per-entry values (aligned with kb.indices) whose per-condition sums the model ranks."""
+        raise NotImplementedError
+
+    def rank_sums(self, kb: KnowledgeBase, age: int, gender: str, n_symptoms: int,
+                  columns: np.ndarray, sums: np.ndarray, top_n: int) -> Ranking:
+        """
+        Rank from per-condition sums of entry_values over the present symptoms,
+        so callers can maintain the sums incrementally.
+        """
+        raise NotImplementedError
+
+
+class HeuristicModel(PredictionModel):
+    """
+    Original scoring: sum of per-symptom weights divided by the number of
+    symptoms, halved and capped at 1. Age and gender do not affect the score.
+    """
+
+    name = "heuristic"
+
+    def rank(self, kb: KnowledgeBase, age: int, gender: str, symptoms: List[str], top_n: int) -> Ranking:
+        columns, sums = kb.accumulate(kb.rows_for(symptoms))
+        return self.rank_sums(kb, age, gender, len(symptoms), columns, sums, top_n)
+
+    def entry_values(self, kb: KnowledgeBase) -> np.ndarray:
+        return kb.data
+
+    def rank_sums(self, kb: KnowledgeBase, age: int, gender: str, n_symptoms: int,
+                  columns: np.ndarray, sums: np.ndarray, top_n: int) -> Ranking:
+        scores = self._scores(sums, max(n_symptoms, 1))
+        return [(column, self._probability(score)) for column, score in top_conditions(columns, scores, top_n)]
+
+    def rank_batch(self, kb: KnowledgeBase, records: List[Dict[str, Any]], top_n: int) -> List[Ranking]:
+        # (record, symptom) occurrences of the sparse records x symptoms matrix
+        record_ids, rows = [], []
+        counts = np.ones(len(records), dtype=np.float64)
+        for i, record in enumerate(records):
+            symptoms = record.get('symptoms') or []
+            counts[i] = max(len(symptoms), 1)
+            for row in kb.rows_for(symptoms):
+                record_ids.append(i)
+                rows.append(row)
+
+        # One sparse product scores every record; cells come back sorted by record
+        cell_records, cell_columns, sums = kb.accumulate_batch(
+            np.asarray(record_ids, dtype=np.int64), np.asarray(rows, dtype=np.int64), len(records))
+        scores = self._scores(sums, counts[cell_records])
+        bounds = np.searchsorted(cell_records, np.arange(len(records) + 1))
+
+        return [
+            [(column, self._probability(score))
+             for column, score in top_conditions(cell_columns[bounds[i]:bounds[i + 1]],
+                                                 scores[bounds[i]:bounds[i + 1]], top_n)]
+            for i in range(len(records))
+        ]
+
+    @staticmethod
+    def _scores(sums: np.ndarray, counts: Any) -> np.ndarray:
+        # Rounding away summation-order noise keeps ties (broken by knowledge base
+        # order) stable whether sums come from one pass, a batch or incremental updates
+        return np.round(sums / counts, 12)
+
+    @staticmethod
+    def _probability(score: float) -> float:
+        # Divide by 2 to normalize aggregate scores into the 0-1 range
+        return min(score / 2.0, 1.0)
+
+
+class NaiveBayesModel(PredictionModel):
+    """
+    Bernoulli Naive Bayes over the knowledge base.
+
+    Knowledge base weights are read as P(symptom | condition); unlisted pairs
+    get ``epsilon``. Priors start uniform and are scaled by the knowledge base
+    ``priors`` factors for the patient's age band and gender.
+
+    The log-posterior of condition c for present symptoms S is
+
+        base[band, gender, c] + |S| * d0 + sum over listed (s, c), s in S of delta[s, c]
+
+    where base holds the log prior plus every log(1 - p), d0 is the log-odds
+    shift of an unlisted symptom and delta the extra shift of a listed one.
+    base and delta are precomputed per knowledge base version, so a request is a
+    sparse row sum plus one vectorized log-sum-exp.
+    """
+
+    name = "naive_bayes"
+
+    def __init__(self, epsilon: float = 0.01):
+        self.epsilon = epsilon
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def rank(self, kb: KnowledgeBase, age: int, gender: str, symptoms: List[str], top_n: int) -> Ranking:
+        # Presence model: a repeated symptom is still one observation
+        rows = sorted(set(kb.rows_for(symptoms)))
+        columns, deltas = kb.accumulate(rows, self.entry_values(kb))
+        return self.rank_sums(kb, age, gender, len(rows), columns, deltas, top_n)
+
+    def entry_values(self, kb: KnowledgeBase) -> np.ndarray:
+        return self.tables(kb)['delta']
+
+    def rank_sums(self, kb: KnowledgeBase, age: int, gender: str, n_symptoms: int,
+                  columns: np.ndarray, sums: np.ndarray, top_n: int) -> Ranking:
+        if n_symptoms <= 0:
+            return []
+
+        tables = self.tables(kb)
+        band = age_band(age)
+        # Unknown genders fall back to the age-band prior alone
+        base = tables['base'].get((band, str(gender).lower()), tables['base'][(band, '')])
+        log_posterior = base + n_symptoms * tables['d0']
+        log_posterior[columns] += sums
+
+        # Vectorized log-sum-exp over every condition
+        peak = log_posterior.max()
+        log_norm = peak + np.log(np.exp(log_posterior - peak).sum())
+        probabilities = np.exp(log_posterior[columns] - log_norm)
+
+        # Only conditions linked to at least one symptom are reported
+        return top_conditions(columns, probabilities, top_n)
+
+    def tables(self, kb: KnowledgeBase) -> Dict[str, Any]:
+        """Return (building on first use) the log tables for a knowledge base version."""
+        tables = self._tables.get(kb.version)
+        if tables is None:
+            with self._lock:
+                tables = self._tables.get(kb.version)
+                if tables is None:
+                    tables = self._build_tables(kb)
+                    # Only the active knowledge base version is kept
+                    self._tables = {kb.version: tables}
+        return tables
+
+    def _build_tables(self, kb: KnowledgeBase) -> Dict[str, Any]:
+        eps = self.epsilon
+        n_conditions = len(kb.conditions)
+        p = np.clip(np.asarray(kb.data, dtype=np.float64), eps, 1 - eps)
+
+        d0 = np.log(eps) - np.log1p(-eps)
+        delta = (np.log(p) - np.log1p(-p)) - d0
+
+        # sum over all symptoms of log(1 - p(s|c)), starting from "every pair unlisted"
+        log_absent = len(kb.symptoms) * np.log1p(-eps) + np.bincount(
+            kb.indices, weights=np.log1p(-p) - np.log1p(-eps), minlength=n_conditions)
+
+        condition_ids = {name: i for i, name in enumerate(kb.conditions)}
+
+        def factors(table: Dict[str, float]) -> np.ndarray:
+            scale = np.ones(n_conditions, dtype=np.float64)
+            for name, factor in (table or {}).items():
+                if name in condition_ids and factor > 0:
+                    scale[condition_ids[name]] = factor
+            return scale
+
+        band_priors = kb.priors.get('age_band', {})
+        gender_priors = kb.priors.get('gender', {})
+        base = {}
+        for band in AGE_BANDS:
+            for gender in ('male', 'female', ''):
+                prior = factors(band_priors.get(band)) * factors(gender_priors.get(gender))
+                log_prior = np.log(prior) - np.log(prior.sum())
+                base[(band, gender)] = log_prior + log_absent
+
+        return {'base': base, 'delta': delta, 'd0': d0}
+
+
+MODELS: Dict[str, PredictionModel] = {
+    model.name: model for model in (HeuristicModel(), NaiveBayesModel())
+}
+
+# Model used when a request does not pick one
+DEFAULT_MODEL = os.getenv('PREDICTION_MODEL', HeuristicModel.name)
+
+
+def get_model(name: Optional[str] = None) -> PredictionModel:
+    """
+    Look up a model by name (None selects the configured default).
+
+    Raises:
+        ValueError: If the name is not a registered model
+    """
+    name = name or DEFAULT_MODEL
+    if name not in MODELS:
+        raise ValueError(f"Unknown model '{name}'. Available models: {sorted(MODELS)}")
+    return MODELS[name]
@@ -0,0 +1,162 @@
+"""
+Server-Sent Events push channel for MemoryMate reminders.
+
+Dashboards open one long-lived GET /api/memorymate/events/<email> stream
+instead of polling check_medicines every minute. The ReminderHub keeps each
+open stream's small bounded queue, filed by user, and is registered as an
+``on_fire`` callback of the worker's reminder scheduler: when a dose becomes
+due the scheduler tick hands it to the hub, which puts it on that user's
+queues. An idle stream costs one parked wait and a heartbeat comment every
+MEMORYMATE_SSE_HEARTBEAT seconds (which also notices closed connections).
+
+Every worker's scheduler indexes all users, so a stream receives its events
+on whichever worker serves it. Each open stream holds a worker thread for its
+lifetime, so serve many of them with gevent workers
+(``gunicorn -k gevent``; the hub only uses threading and queue primitives,
+which gevent patches) or with enough ``--threads``.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from reminders import ReminderScheduler, Window
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on an idle stream
+SSE_HEARTBEAT = float(os.getenv('MEMORYMATE_SSE_HEARTBEAT', 15))
+# Open streams per worker process before new ones are turned away
+SSE_MAX_SUBSCRIBERS = int(os.getenv('MEMORYMATE_SSE_MAX_SUBSCRIBERS', 10000))
+# Undelivered events kept per stream; older events are dropped for slow clients
+SSE_QUEUE_SIZE = 32
+# Milliseconds a browser waits before reconnecting a dropped stream
+SSE_RETRY_MS = 5000
+
+
+class HubFull(RuntimeError):
+    """Raised when a worker already has its maximum number of open streams."""
+
+
+class Subscription:
+    """One open stream's queue of pending events."""
+
+    __slots__ = ('email', 'events')
+
+    def __init__(self, email: str):
+        self.email = email
+        self.events: 'queue.Queue[Dict[str, Any]]' = queue.Queue(SSE_QUEUE_SIZE)
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the next event, or None if none arrived within ``timeout`` seconds."""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, event: Dict[str, Any]) -> None:
+        while True:
+            try:
+                self.events.put_nowait(event)
+                return
+            except queue.Full:
+                # A client that stopped reading loses its oldest events
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class ReminderHub:
+    """Fans reminder events out to the open streams of each user."""
+
+    def __init__(self, max_subscribers: int = SSE_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, email: str) -> Subscription:
+        """
+        Raises:
+            HubFull: If the worker already has max_subscribers open streams
+        """
+        subscription = Subscription(email)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise HubFull('Too many open event streams, try again later')
+            self._subscribers.setdefault(email, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.email)
+            if subscriptions and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._count -= 1
+                if not subscriptions:
+                    del self._subscribers[subscription.email]
+
+    def publish(self, email: str, event: Dict[str, Any]) -> int:
+        """Queue an event on each of the user's open streams; returns how many there were."""
+        with self._lock:
+            subscriptions = list(self._subscribers.get(email, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+        return len(subscriptions)
+
+    def attach(self, scheduler: ReminderScheduler) -> None:
+        """Receive the scheduler's fired doses (idempotent)."""
+        if self.reminder_fired not in scheduler.on_fire:
+            scheduler.on_fire.append(self.reminder_fired)
+
+    def reminder_fired(self, email: str, medicine: Dict[str, Any], window: Window) -> None:
+        # Skip building the event for users without an open stream
+        if email in self._subscribers:
+            self.publish(email, due_event(medicine, window[1]))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def due_event(medicine: Dict[str, Any], until: datetime) -> Dict[str, Any]:
+    """The 'due' event for a medicine dose (same fields as a check_medicines entry)."""
+    return {
+        'id': medicine.get('id'),
+        'name': medicine['name'],
+        'dosage': medicine['dosage'],
+        'frequency': medicine['frequency'],
+        'message': f"Time to take {medicine['name']} - {medicine['dosage']}",
+        'until': until.isoformat(),
+    }
+
+
+def format_event(event: Dict[str, Any], name: str = 'due') -> str:
+    """Encode an event in the text/event-stream format."""
+    return f"event: {name}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+_hub: Optional[ReminderHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> ReminderHub:
+    """Return the process-wide hub (created on first use)."""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = ReminderHub()
+    return _hub
+
+
+def set_hub(hub: Optional[ReminderHub]) -> None:
+    """Replace the hub (None creates a new one on next use)."""
+    global _hub
+    with _hub_lock:
+        _hub = hub
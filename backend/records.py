@@ -0,0 +1,154 @@
+"""
+Typed MemoryMate records and their compact serialization.
+
+UserRecord and MedicineRecord are slotted dataclasses. Input from requests is
+validated and normalized once, at ingress (``from_input``, ``clean_new``,
+``clean_fields``); records loaded from storage (``from_dict``) are trusted as
+stored. The in-memory caches hold these records instead of dicts, which takes
+roughly a third of the memory per record.
+
+``dumps`` / ``loads`` write compact JSON (no indentation) with orjson when it
+is installed, falling back to the standard json module; both read each
+other's files.
+"""
+
+import json
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+class RecordError(ValueError):
+    """Raised when request data does not fit a record's schema."""
+
+
+def _slotted(cls: type) -> type:
+    """
+    Rebuild a dataclass with ``__slots__`` for its fields.
+
+    Same effect as ``dataclass(slots=True)``, which needs Python 3.10; field
+    defaults live in the generated ``__init__``, so the class attributes that
+    would clash with the slots are dropped.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items() if k not in names + ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@_slotted
+@dataclass
+class UserRecord:
+    email: str
+    name: str
+    password: str
+    created_at: Optional[str] = None
+    email_notifications_enabled: bool = False
+
+    @classmethod
+    def from_input(cls, email: Any, name: Any, password: Any, created_at: str) -> 'UserRecord':
+        """
+        Validate and normalize registration data (trimmed, email lowercased).
+
+        Raises:
+            RecordError: If a field is missing or not a string
+        """
+        return cls(email=_text('email', email).lower(), name=_text('name', name),
+                   password=_text('password', password), created_at=created_at)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UserRecord':
+        return cls(**{f: data[f] for f in USER_FIELDS if f in data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in USER_FIELDS}
+
+    def replace(self, changes: Dict[str, Any]) -> 'UserRecord':
+        return replace(self, **changes)
+
+
+@_slotted
+@dataclass
+class MedicineRecord:
+    id: int
+    name: str = ''
+    dosage: str = ''
+    frequency: str = 'once'
+    time_of_day: str = 'morning'
+    start_date: str = ''
+    end_date: str = ''
+    created_at: Optional[str] = None
+
+    @classmethod
+    def clean_new(cls, data: Dict[str, Any], created_at: str) -> Dict[str, Any]:
+        """
+        Validate and normalize a new medicine (storage assigns the id).
+
+        Returns:
+            Dictionary of every editable field plus created_at
+
+        Raises:
+            RecordError: If a field is not a string or number
+        """
+        values = {f: MEDICINE_DEFAULTS[f] for f in MEDICINE_EDITABLE_FIELDS}
+        values.update(cls.clean_fields(data))
+        values['created_at'] = created_at
+        return values
+
+    @staticmethod
+    def clean_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate and normalize the editable fields present in ``data``; others are ignored.
+
+        Raises:
+            RecordError: If a field is not a string or number
+        """
+        return {f: _text(f, data[f], required=False) for f in MEDICINE_EDITABLE_FIELDS if f in data}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MedicineRecord':
+        return cls(**{f: data[f] for f in MEDICINE_FIELDS if f in data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in MEDICINE_FIELDS}
+
+    def replace(self, changes: Dict[str, Any]) -> 'MedicineRecord':
+        return replace(self, **changes)
+
+
+USER_FIELDS: Tuple[str, ...] = tuple(f.name for f in fields(UserRecord))
+MEDICINE_FIELDS: Tuple[str, ...] = tuple(f.name for f in fields(MedicineRecord))
+MEDICINE_EDITABLE_FIELDS: Tuple[str, ...] = ('name', 'dosage', 'frequency', 'time_of_day', 'start_date', 'end_date')
+MEDICINE_DEFAULTS: Dict[str, Any] = {f.name: f.default for f in fields(MedicineRecord) if f.name != 'id'}
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact JSON bytes (records are written as objects)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (UserRecord, MedicineRecord)):
+        return value.to_dict()
+    return str(value)
+
+
+def _text(field: str, value: Any, required: bool = True) -> str:
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise RecordError(f"Field '{field}' must be a string")
+    text = str(value).strip()
+    if required and not text:
+        raise RecordError(f"Field '{field}' is required")
+    return text
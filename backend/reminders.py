@@ -0,0 +1,315 @@
+"""
+Server-side MemoryMate reminder scheduler.
+
+Every medicine has one to three doses a day (``frequency``: once, twice,
+thrice), spaced evenly from the start of its ``time_of_day`` window
+(morning 06-12, afternoon 12-18, night 18-06). Each dose is due for the
+length of that window, capped at the spacing between doses, on the days
+between ``start_date`` and ``end_date``.
+
+The scheduler keeps a heap of the next due window of every dose across all
+users. A tick pops only the windows that have opened since the last tick,
+fires them once (``on_fire`` callbacks) and files them under their user, so
+``due(email)`` answers in O(that user's due doses) instead of re-scanning
+the user's medicines. Medicine changes made through models.py are applied
+to the index right away; changes from other workers are picked up by a full
+rebuild every MEMORYMATE_REMINDER_REBUILD seconds.
+
+Each worker runs its own scheduler, so ``on_fire`` callbacks run once per
+worker process.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from storage import Storage, get_storage
+
+logger = logging.getLogger(__name__)
+
+# Seconds between scheduler ticks (0 disables the background thread)
+REMINDER_TICK = float(os.getenv('MEMORYMATE_REMINDER_TICK', 30))
+# Seconds between full rebuilds from storage (picks up other workers' changes)
+REMINDER_REBUILD = float(os.getenv('MEMORYMATE_REMINDER_REBUILD', 300))
+
+# time_of_day -> (window start hour, window length in hours)
+TIME_WINDOWS: Dict[str, Tuple[int, int]] = {
+    'morning': (6, 6),
+    'afternoon': (12, 6),
+    'night': (18, 12),
+}
+DOSES_PER_DAY: Dict[str, int] = {'once': 1, 'twice': 2, 'thrice': 3}
+
+Window = Tuple[datetime, datetime]
+DoseKey = Tuple[int, int]  # (medicine id, dose number)
+
+
+def dose_windows(medicine: Dict[str, Any], day: date) -> List[Window]:
+    """Return the (start, end) window of each of the medicine's doses that starts on ``day``."""
+    window = TIME_WINDOWS.get(str(medicine.get('time_of_day', '')).lower().strip())
+    if window is None:
+        return []
+    start_date, end_date = _parse_date(medicine.get('start_date')), _parse_date(medicine.get('end_date'))
+    if (start_date and day < start_date) or (end_date and day > end_date):
+        return []
+
+    doses = DOSES_PER_DAY.get(str(medicine.get('frequency', '')).lower().strip(), 1)
+    spacing = timedelta(hours=24 / doses)
+    length = min(timedelta(hours=window[1]), spacing)
+    first = datetime.combine(day, datetime.min.time()) + timedelta(hours=window[0])
+    return [(first + spacing * dose, first + spacing * dose + length) for dose in range(doses)]
+
+
+def next_window(medicine: Dict[str, Any], dose: int, after: datetime) -> Optional[Window]:
+    """Return the first window of a dose that has not ended by ``after``, or None if there is none."""
+    start_date, end_date = _parse_date(medicine.get('start_date')), _parse_date(medicine.get('end_date'))
+    # A window can start on the previous day (night doses) and still be open
+    day = after.date() - timedelta(days=1)
+    if start_date and day < start_date:
+        day = start_date
+    while end_date is None or day <= end_date:
+        windows = dose_windows(medicine, day)
+        if dose >= len(windows):
+            return None
+        if windows[dose][1] > after:
+            return windows[dose]
+        day += timedelta(days=1)
+    return None
+
+
+def doses_due(medicine: Dict[str, Any], now: datetime) -> List[Window]:
+    """Return the windows of the medicine's doses that are open at ``now``."""
+    # Windows are at most a day long, so only yesterday's and today's can be open
+    today = now.date()
+    return [window for day in (today - timedelta(days=1), today) for window in dose_windows(medicine, day)
+            if window[0] <= now < window[1]]
+
+
+class ReminderScheduler:
+    """Heap index of the next due window of every medicine dose."""
+
+    def __init__(self, storage: Optional[Storage] = None, tick_seconds: float = REMINDER_TICK,
+                 rebuild_seconds: float = REMINDER_REBUILD, clock: Callable[[], datetime] = datetime.now):
+        """
+        Args:
+            storage: Backend to read medicines from (defaults to the configured one)
+            tick_seconds: Seconds between background ticks
+            rebuild_seconds: Seconds between full rebuilds from storage (0 disables them)
+            clock: Returns the current local time
+        """
+        self._storage = storage
+        self.tick_seconds = tick_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.clock = clock
+        self.on_fire: List[Callable[[str, Dict[str, Any], Window], None]] = []
+
+        self._lock = threading.RLock()
+        self._medicines: Dict[Tuple[str, int], Tuple[int, Dict[str, Any]]] = {}
+        self._pending: List[Tuple[datetime, int, str, int, int, int]] = []  # next windows to open
+        self._expiring: List[Tuple[datetime, int, str, DoseKey]] = []  # open windows by end
+        self._due: Dict[str, Dict[DoseKey, Tuple[datetime, Dict[str, Any]]]] = {}
+        self._fired: set = set()  # (email, dose key) already fired for its open window
+        self._generations = itertools.count(1)
+        self._sequence = itertools.count()
+        self._built_at: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def storage(self) -> Storage:
+        return self._storage or get_storage()
+
+    # Index maintenance
+
+    def rebuild(self, now: Optional[datetime] = None) -> None:
+        """
+        Re-index every medicine from storage. Doses that were already due do
+        not fire again; on the first build, windows that are already open are
+        indexed as due without firing.
+        """
+        now = now or self.clock()
+        medicines = [(email, medicine) for email, records, _ in self.storage.iter_medicines()
+                     for medicine in records]
+        with self._lock:
+            first_build = self._built_at is None
+            self._fired = {(email, key) for email, doses in self._due.items() for key in doses}
+            self._medicines.clear()
+            self._pending.clear()
+            self._expiring.clear()
+            self._due.clear()
+            for email, medicine in medicines:
+                self._index(email, medicine, now)
+            self._built_at = now
+            self._open_windows(now, fire=not first_build)
+
+    def upsert(self, email: str, medicine: Dict[str, Any], now: Optional[datetime] = None) -> None:
+        """Index a new or changed medicine (a dose that is already due does not fire again)."""
+        now = now or self.clock()
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._fired.update((email, key) for key in self._due.get(email, {}) if key[0] == medicine['id'])
+            self._drop(email, medicine['id'])
+            self._index(email, medicine, now)
+
+    def remove(self, email: str, medicine_id: int) -> None:
+        with self._lock:
+            self._drop(email, medicine_id)
+
+    # Sweeping
+
+    def tick(self, now: Optional[datetime] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Open the windows that started since the last tick and close the ones that ended.
+
+        Returns:
+            (email, medicine) for every dose that became due, after firing ``on_fire``
+        """
+        now = now or self.clock()
+        if self._built_at is None or (self.rebuild_seconds and
+                                      (now - self._built_at).total_seconds() >= self.rebuild_seconds):
+            self.rebuild(now)
+        with self._lock:
+            return self._open_windows(now)
+
+    def due(self, email: str, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Return the user's medicines with a dose due at ``now``."""
+        return [medicine for medicine, end in self.due_doses(email, now)]
+
+    def due_doses(self, email: str, now: Optional[datetime] = None) -> List[Tuple[Dict[str, Any], datetime]]:
+        """Return (medicine, end of the dose's window) for each of the user's doses due at ``now``."""
+        now = now or self.clock()
+        self.tick(now)
+        with self._lock:
+            doses = self._due.get(email, {})
+            return [(dict(medicine), end) for (medicine_id, dose), (end, medicine) in sorted(doses.items())
+                    if end > now]
+
+    # Background thread
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="memorymate-reminders", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Reminder tick failed: {str(e)}")
+            self._stop.wait(self.tick_seconds)
+
+    # Internals (callers hold the lock)
+
+    def _index(self, email: str, medicine: Dict[str, Any], now: datetime) -> None:
+        generation = next(self._generations)
+        self._medicines[(email, medicine['id'])] = (generation, medicine)
+        for dose in range(DOSES_PER_DAY.get(str(medicine.get('frequency', '')).lower().strip(), 1)):
+            self._schedule(email, medicine, dose, generation, now)
+
+    def _schedule(self, email: str, medicine: Dict[str, Any], dose: int, generation: int,
+                  after: datetime) -> None:
+        window = next_window(medicine, dose, after)
+        if window is not None:
+            heapq.heappush(self._pending, (window[0], next(self._sequence), email, medicine['id'], dose, generation))
+
+    def _drop(self, email: str, medicine_id: int) -> None:
+        # Heap entries of the old generation are skipped when they surface
+        self._medicines.pop((email, medicine_id), None)
+        doses = self._due.get(email)
+        if doses:
+            for key in [key for key in doses if key[0] == medicine_id]:
+                del doses[key]
+
+    def _open_windows(self, now: datetime, fire: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+        while self._expiring and self._expiring[0][0] <= now:
+            end, _, email, key = heapq.heappop(self._expiring)
+            doses = self._due.get(email)
+            if doses and key in doses and doses[key][0] == end:
+                del doses[key]
+                if not doses:
+                    del self._due[email]
+
+        fired = []
+        while self._pending and self._pending[0][0] <= now:
+            start, _, email, medicine_id, dose, generation = heapq.heappop(self._pending)
+            current = self._medicines.get((email, medicine_id))
+            if current is None or current[0] != generation:
+                continue
+            medicine = current[1]
+            window = next_window(medicine, dose, start)
+            if window is None or window[0] != start:
+                continue
+
+            # Queue the dose's following window before handling this one
+            self._schedule(email, medicine, dose, generation, window[1])
+            if window[1] <= now:
+                continue  # closed between ticks
+            key = (medicine_id, dose)
+            self._due.setdefault(email, {})[key] = (window[1], medicine)
+            heapq.heappush(self._expiring, (window[1], next(self._sequence), email, key))
+            if (email, key) in self._fired:
+                self._fired.discard((email, key))
+            elif fire:
+                fired.append((email, medicine, window))
+
+        for email, medicine, window in fired:
+            for callback in self.on_fire:
+                try:
+                    callback(email, medicine, window)
+                except Exception as e:
+                    logger.error(f"Reminder callback failed for {email}: {str(e)}")
+        return [(email, medicine) for email, medicine, _ in fired]
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value).strip()[:10]) if value else None
+    except ValueError:
+        return None
+
+
+_scheduler: Optional[ReminderScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ReminderScheduler:
+    """Return the process-wide scheduler, creating (and starting) it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                scheduler = ReminderScheduler()
+                if scheduler.tick_seconds > 0:
+                    scheduler.start()
+                _scheduler = scheduler
+    return _scheduler
+
+
+def set_scheduler(scheduler: Optional[ReminderScheduler]) -> None:
+    """Replace the scheduler (None creates a new one on next use)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None and _scheduler is not scheduler:
+            _scheduler.stop()
+        _scheduler = scheduler
+
+
+def medicine_changed(email: str, medicine: Dict[str, Any]) -> None:
+    """Update the index after a medicine was added or edited (no-op until the scheduler exists)."""
+    if _scheduler is not None:
+        _scheduler.upsert(email, medicine)
+
+
+def medicine_removed(email: str, medicine_id: int) -> None:
+    if _scheduler is not None:
+        _scheduler.remove(email, medicine_id)
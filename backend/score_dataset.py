@@ -0,0 +1,246 @@
+"""
+Offline scoring CLI - run the prediction engine over CSV/Parquet datasets.
+
+Rows are read in a streaming fashion, sharded into chunks and scored across a
+process pool with the same code path as /api/predict (validate_prediction_input
++ predict_conditions_batch). Results are written in input order as they
+complete, with progress and rows/sec on stderr.
+
+Input columns: age, gender, symptoms. In CSV the symptoms are separated by
+';', '|' or ','; in Parquet the column may also be a list.
+
+Usage:
+    python score_dataset.py intake.csv scored.ndjson
+    python score_dataset.py intake.parquet scored.csv --workers 8 --model naive_bayes
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Read .env before the local modules read their settings at import time
+load_dotenv()
+
+from prediction_models import get_model
+from utils import predict_conditions_batch, validate_prediction_input
+
+_SYMPTOM_SEPARATORS = re.compile(r"[;|,]")
+
+CSV_FIELDS = ['row', 'age', 'gender', 'symptoms', 'status', 'error',
+              'top_condition', 'top_probability', 'conditions']
+
+
+def read_csv_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows from a CSV file with a header line."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def read_parquet_rows(path: str, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """Stream rows from a Parquet file (requires pyarrow)."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Reading Parquet requires pyarrow: pip install pyarrow")
+
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=['age', 'gender', 'symptoms']):
+        yield from batch.to_pylist()
+
+
+def parse_row(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert raw CSV/Parquet values into a prediction record (validated later)."""
+    age = raw.get('age')
+    if isinstance(age, str):
+        age = age.strip()
+        age = int(age) if age.lstrip('-').isdigit() else age
+    elif isinstance(age, float) and age.is_integer():
+        age = int(age)
+
+    symptoms = raw.get('symptoms')
+    if isinstance(symptoms, str):
+        symptoms = [s.strip() for s in _SYMPTOM_SEPARATORS.split(symptoms) if s.strip()]
+
+    gender = raw.get('gender')
+    return {
+        'age': age,
+        'gender': gender.strip() if isinstance(gender, str) else gender,
+        'symptoms': symptoms,
+    }
+
+
+def score_chunk(chunk: List[Tuple[int, Dict[str, Any]]], model: Optional[str], top_n: int,
+                output_format: str) -> Tuple[str, int]:
+    """
+    Validate and score one shard (runs in a worker process).
+
+    Results are encoded in the worker so only text crosses the process boundary.
+
+    Returns:
+        Tuple of (encoded output for the chunk, number of successfully scored rows)
+    """
+    results: List[Dict[str, Any]] = [None] * len(chunk)
+    valid_positions, valid_records = [], []
+    for position, (row_no, raw) in enumerate(chunk):
+        record, error = validate_prediction_input(parse_row(raw))
+        if error:
+            results[position] = {"row": row_no, "status": "failed", "error": error["error"]}
+        else:
+            valid_positions.append(position)
+            valid_records.append(record)
+
+    for position, conditions in zip(valid_positions, predict_conditions_batch(valid_records, top_n, model)):
+        row_no = chunk[position][0]
+        if conditions:
+            results[position] = {"row": row_no, "status": "success", "conditions": conditions}
+        else:
+            results[position] = {"row": row_no, "status": "failed",
+                                 "error": "No conditions found for given symptoms"}
+
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    if output_format == 'ndjson':
+        return ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in results), succeeded
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for (row_no, raw), result in zip(chunk, results):
+        conditions = result.get("conditions", [])
+        writer.writerow([
+            row_no, raw.get('age'), raw.get('gender'),
+            raw.get('symptoms') if isinstance(raw.get('symptoms'), str) else ';'.join(raw.get('symptoms') or []),
+            result["status"], result.get("error", ''),
+            conditions[0]["name"] if conditions else '',
+            conditions[0]["probability"] if conditions else '',
+            json.dumps([{k: c[k] for k in ("name", "probability", "severity")} for c in conditions],
+                       separators=(',', ':')),
+        ])
+    return buffer.getvalue(), succeeded
+
+
+def chunked(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    """Group rows into numbered shards of at most size rows."""
+    chunk = []
+    for row_no, row in enumerate(rows, start=1):
+        chunk.append((row_no, row))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Progress:
+    """Periodic rows/sec reporting on stderr."""
+
+    def __init__(self, interval: float = 2.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.rows = 0
+        self.succeeded = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def update(self, rows: int, succeeded: int) -> None:
+        self.rows += rows
+        self.succeeded += succeeded
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        label = "done" if final else "progress"
+        print(f"[{label}] {self.rows:,} rows ({self.succeeded:,} scored, {self.rows - self.succeeded:,} failed) "
+              f"in {elapsed:.1f}s - {self.rows / elapsed:,.0f} rows/sec", file=self.stream, flush=True)
+
+
+def score_file(input_path: str, output_path: str, workers: int, chunk_size: int,
+               model: Optional[str] = None, top_n: int = 5, progress: Optional[Progress] = None) -> Progress:
+    """
+    Score a dataset file and write results in input order.
+
+    Args:
+        input_path: .csv or .parquet input
+        output_path: .csv or .ndjson/.jsonl output ('-' for stdout as NDJSON)
+        workers: Worker processes (1 scores in-process)
+        chunk_size: Rows per shard
+        model: Scoring model name
+        top_n: Conditions per row
+
+    Returns:
+        Progress with final counts
+    """
+    if input_path.lower().endswith(('.parquet', '.pq')):
+        rows = read_parquet_rows(input_path)
+    else:
+        rows = read_csv_rows(input_path)
+
+    output_format = 'csv' if output_path.lower().endswith('.csv') else 'ndjson'
+    progress = progress or Progress()
+    out = sys.stdout if output_path == '-' else open(output_path, 'w', encoding='utf-8', newline='')
+
+    try:
+        if output_format == 'csv':
+            csv.writer(out).writerow(CSV_FIELDS)
+
+        def write(result: Tuple[str, int], rows_in_chunk: int) -> None:
+            text, succeeded = result
+            out.write(text)
+            progress.update(rows_in_chunk, succeeded)
+
+        if workers <= 1:
+            for chunk in chunked(rows, chunk_size):
+                write(score_chunk(chunk, model, top_n, output_format), len(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Bounded number of shards in flight keeps memory flat for any input size
+                pending = deque()
+                for chunk in chunked(rows, chunk_size):
+                    pending.append((pool.submit(score_chunk, chunk, model, top_n, output_format), len(chunk)))
+                    if len(pending) >= workers * 2:
+                        future, size = pending.popleft()
+                        write(future.result(), size)
+                while pending:
+                    future, size = pending.popleft()
+                    write(future.result(), size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet dataset with the prediction engine")
+    parser.add_argument('input', help="input .csv or .parquet file with age, gender, symptoms columns")
+    parser.add_argument('output', help="output .csv or .ndjson file ('-' for NDJSON on stdout)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="rows per shard")
+    parser.add_argument('--model', default=None, help="scoring model (default: PREDICTION_MODEL)")
+    parser.add_argument('--top-n', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    try:
+        get_model(args.model)
+    except ValueError as e:
+        parser.error(str(e))
+
+    progress = score_file(args.input, args.output, args.workers, args.chunk_size, args.model, args.top_n)
+    progress.report(final=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
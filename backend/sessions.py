@@ -0,0 +1,116 @@
+"""
+Stateless MemoryMate sessions.
+
+/api/memorymate/login issues a signed JWT (HS256) carrying the user's email
+and name. Protected routes verify the signature and expiry against a key
+read from the environment on first use (after .env is loaded), so authorizing a request needs no user lookup.
+Logging out adds the token's id to a small in-memory revocation set, kept
+only until the token would have expired anyway.
+
+The revocation set is per process: with several gunicorn workers a revoked
+token stays usable on the other workers until it expires, so keep
+MEMORYMATE_SESSION_TTL short. Set MEMORYMATE_SESSION_SECRET so all workers
+(and restarts) accept each other's tokens.
+"""
+
+import os
+import secrets
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+
+SESSION_TTL = int(os.getenv('MEMORYMATE_SESSION_TTL', str(12 * 3600)))
+
+
+class InvalidSession(ValueError):
+    """Raised when a session token is missing, tampered with, expired or revoked."""
+
+
+class RevocationSet:
+    """Token ids revoked before their expiry, forgotten once they expire."""
+
+    def __init__(self):
+        self._expiry: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, token_id: str, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            if expires_at > now:
+                self._expiry[token_id] = expires_at
+            # Expired tokens are rejected by their exp claim already
+            for expired in [t for t, exp in self._expiry.items() if exp <= now]:
+                del self._expiry[expired]
+
+    def __contains__(self, token_id: str) -> bool:
+        return token_id in self._expiry
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+
+class SessionTokens:
+    """Issue, verify and revoke signed session tokens."""
+
+    algorithm = 'HS256'
+
+    def __init__(self, secret: Optional[str] = None, ttl: int = SESSION_TTL):
+        """
+        Args:
+            secret: HMAC signing key (shared by all workers); None reads
+                MEMORYMATE_SESSION_SECRET on first use, or makes a random key
+            ttl: Token lifetime in seconds
+        """
+        self._secret = secret
+        self._key: Optional[bytes] = None
+        self._key_lock = threading.Lock()
+        self.ttl = ttl
+        self.revoked = RevocationSet()
+
+    @property
+    def _signing_key(self) -> bytes:
+        if self._key is None:
+            with self._key_lock:
+                if self._key is None:
+                    secret = self._secret or os.getenv('MEMORYMATE_SESSION_SECRET') or secrets.token_hex(32)
+                    self._key = secret.encode('utf-8')
+        return self._key
+
+    def issue(self, email: str, name: str) -> Dict[str, Any]:
+        """
+        Returns:
+            Dictionary with the token and its expiry (unix seconds)
+        """
+        now = int(time.time())
+        claims = {'sub': email, 'name': name, 'iat': now, 'exp': now + self.ttl,
+                  'jti': secrets.token_urlsafe(12)}
+        return {'token': jwt.encode(claims, self._signing_key, algorithm=self.algorithm), 'expires_at': claims['exp']}
+
+    def verify(self, token: Optional[str]) -> Dict[str, Any]:
+        """
+        Returns:
+            The token's claims ('sub' is the user's email)
+
+        Raises:
+            InvalidSession: If the token is missing, invalid, expired or revoked
+        """
+        if not token:
+            raise InvalidSession('Missing session token')
+        try:
+            claims = jwt.decode(token, self._signing_key, algorithms=[self.algorithm],
+                                options={'require': ['sub', 'exp', 'jti']})
+        except jwt.ExpiredSignatureError:
+            raise InvalidSession('Session expired')
+        except jwt.InvalidTokenError:
+            raise InvalidSession('Invalid session token')
+        if claims['jti'] in self.revoked:
+            raise InvalidSession('Session revoked')
+        return claims
+
+    def revoke(self, claims: Dict[str, Any]) -> None:
+        self.revoked.add(claims['jti'], claims['exp'])
+
+
+SESSIONS = SessionTokens()
@@ -0,0 +1,710 @@
+"""
+Pluggable storage backends for MemoryMate users and medicines.
+
+The backend is selected with MEMORYMATE_STORAGE:
+  - json   - users.json / medicines.json in data/, cached in memory with
+             write-through (default, handy for development)
+  - sqlite - a single SQLite database in WAL mode (MEMORYMATE_DB), safe for
+             concurrent writers across gunicorn workers
+  - sharded - one JSON file per user hashed into MEMORYMATE_SHARD_DIR buckets,
+             so requests only touch that user's data
+
+Backends work on plain dicts; validation and response shaping stay in models.py.
+
+Usage:
+    python storage.py migrate json sharded   # copy users.json / medicines.json into shards
+    python storage.py import-json            # same as: migrate json sqlite
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from file_lock import FileLock
+from medicine_book import MedicineBook
+from medicine_journal import MedicineJournal
+from records import MEDICINE_FIELDS, USER_FIELDS, MedicineRecord, UserRecord, dumps, loads
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+USERS_FILE = os.path.join(DATA_DIR, 'users.json')
+MEDICINES_FILE = os.path.join(DATA_DIR, 'medicines.json')
+SQLITE_FILE = os.getenv('MEMORYMATE_DB', os.path.join(DATA_DIR, 'memorymate.db'))
+SHARD_DIR = os.getenv('MEMORYMATE_SHARD_DIR', os.path.join(DATA_DIR, 'shards'))
+
+
+# (email, medicines, next medicine id) as exchanged by migrations
+MedicineExport = Tuple[str, List[Dict[str, Any]], int]
+
+
+class Storage:
+    """Interface shared by the storage backends."""
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        """Return the user record, or None."""
+        raise NotImplementedError
+
+    def add_user(self, user: Dict[str, Any]) -> bool:
+        """Insert a user keyed on user['email']; False if the email is taken."""
+        raise NotImplementedError
+
+    def update_user(self, email: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update some user fields; returns the updated record, or None if missing."""
+        raise NotImplementedError
+
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        """Yield every user record."""
+        raise NotImplementedError
+
+    def get_medicines(self, email: str) -> List[Dict[str, Any]]:
+        """Return a user's medicines in insertion order."""
+        raise NotImplementedError
+
+    def get_medicine(self, email: str, medicine_id: int) -> Optional[Dict[str, Any]]:
+        """Return one medicine by id, or None."""
+        raise NotImplementedError
+
+    def add_medicine(self, email: str, medicine: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a medicine under the user's next id (ids are never reused); returns the stored record."""
+        raise NotImplementedError
+
+    def add_medicines(self, email: str, medicines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Store several medicines with consecutive ids in one write; returns the stored records."""
+        return [self.add_medicine(email, medicine) for medicine in medicines]
+
+    def update_medicine(self, email: str, medicine_id: int,
+                        fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update some medicine fields; returns the updated record, or None if missing."""
+        raise NotImplementedError
+
+    def delete_medicine(self, email: str, medicine_id: int) -> bool:
+        """Delete a medicine; False if it does not exist."""
+        raise NotImplementedError
+
+    def iter_medicines(self) -> Iterator[MedicineExport]:
+        """Yield (email, medicines, next id) for every user that has had medicines."""
+        raise NotImplementedError
+
+    def import_records(self, users: Iterator[Dict[str, Any]],
+                       medicines: Iterator[MedicineExport]) -> Tuple[int, int]:
+        """Bulk-copy records from another backend (migration target only)."""
+        raise NotImplementedError(f"{type(self).__name__} cannot be a migration target")
+
+
+class JSONDocument:
+    """
+    A JSON object file cached in memory with write-through updates.
+
+    Reads are served from the cached object. Changes made by other processes
+    are noticed through the file's (mtime, inode, size) signature, checked at
+    most every ``check_interval`` seconds on reads and always before a write.
+    Writes go to a temp file that atomically replaces the original, so readers
+    never see a partial file. Changes are applied copy-on-write: ``modify``
+    hands out a shallow copy and the cached object is swapped in one step, so
+    lock-free readers see either the old or the new version.
+
+    Read-modify-write cycles hold an exclusive lock on ``<path>.lock`` and
+    reloads hold a shared one, so concurrent workers never lose an update.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0,
+                 decode: Optional[Callable[[str, Any], Any]] = None):
+        """
+        Args:
+            path: JSON file (created as {} if missing)
+            check_interval: Minimum seconds between signature checks on reads
+            decode: Converts each (key, value) read from the file into the cached value
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.decode = decode
+        self._data: Dict[str, Any] = {}
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._next_check = 0.0
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(path + '.lock')
+
+        with self._file_lock.exclusive():
+            if not os.path.exists(path):
+                self._write({})
+
+    def read(self) -> Dict[str, Any]:
+        """Return the cached object; callers must not mutate it."""
+        if self._signature is None or time.monotonic() >= self._next_check:
+            with self._file_lock.shared(), self._lock:
+                self._refresh()
+        return self._data
+
+    def modify(self, change: Callable[[Dict[str, Any]], Tuple[Any, bool]]) -> Any:
+        """
+        Apply ``change`` to the latest object and write it through if it reports a change.
+
+        Args:
+            change: Called with a shallow copy of the object; it must replace
+                (not mutate) nested values it changes. Returns (result, changed)
+
+        Returns:
+            The result from ``change``
+        """
+        with self._file_lock.exclusive(), self._lock:
+            self._refresh(force=True)
+            data = dict(self._data)
+            result, changed = change(data)
+            if changed:
+                self._write(data)
+            return result
+
+    def _refresh(self, force: bool = False) -> None:
+        if not force and self._signature is not None and time.monotonic() < self._next_check:
+            return
+        signature = self._stat()
+        if signature != self._signature:
+            with open(self.path, 'rb') as f:
+                data = loads(f.read())
+            data = data if isinstance(data, dict) else {}
+            self._data = {k: self.decode(k, v) for k, v in data.items()} if self.decode else data
+            self._signature = signature
+        self._next_check = time.monotonic() + self.check_interval
+
+    def _stat(self) -> Tuple[int, int, int]:
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_ino, st.st_size
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        _atomic_write_bytes(self.path, dumps(data))
+        self._data = data
+        self._signature = self._stat()
+        self._next_check = time.monotonic() + self.check_interval
+
+
+class JSONStorage(Storage):
+    """
+    JSON file storage (the original users.json / medicines.json format).
+
+    Each file is loaded once and served from memory. User writes rewrite
+    users.json; medicine writes are appended to medicines.json.log and
+    periodically compacted into medicines.json (see medicine_journal.py).
+    Records are handed out as copies so callers cannot modify the cache.
+    """
+
+    def __init__(self, users_file: str = USERS_FILE, medicines_file: str = MEDICINES_FILE,
+                 check_interval: float = float(os.getenv('MEMORYMATE_JSON_CHECK_INTERVAL', 1.0))):
+        self.users_file = users_file
+        self.medicines_file = medicines_file
+        self._users = JSONDocument(users_file, check_interval,
+                                   decode=lambda email, user: UserRecord.from_dict(dict(user, email=email)))
+        self._medicines = MedicineJournal(
+            medicines_file, compact_ops=int(os.getenv('MEMORYMATE_JOURNAL_COMPACT_OPS', 1000)),
+            check_interval=check_interval)
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        user = self._users.read().get(email)
+        return user.to_dict() if user is not None else None
+
+    def add_user(self, user: Dict[str, Any]) -> bool:
+        def change(users):
+            if user['email'] in users:
+                return False, False
+            users[user['email']] = UserRecord.from_dict(user)
+            return True, True
+        return self._users.modify(change)
+
+    def update_user(self, email: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        def change(users):
+            if email not in users:
+                return None, False
+            users[email] = users[email].replace(fields)
+            return users[email].to_dict(), True
+        return self._users.modify(change)
+
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        for user in list(self._users.read().values()):
+            yield user.to_dict()
+
+    def get_medicines(self, email: str) -> List[Dict[str, Any]]:
+        book = self._medicines.read().get(email)
+        return [m.to_dict() for m in book.list()] if book else []
+
+    def get_medicine(self, email: str, medicine_id: int) -> Optional[Dict[str, Any]]:
+        book = self._medicines.read().get(email)
+        medicine = book.get(medicine_id) if book else None
+        return medicine.to_dict() if medicine is not None else None
+
+    def add_medicine(self, email: str, medicine: Dict[str, Any]) -> Dict[str, Any]:
+        return self._medicines.add(email, medicine)
+
+    def add_medicines(self, email: str, medicines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._medicines.add_many(email, medicines)
+
+    def update_medicine(self, email: str, medicine_id: int,
+                        fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._medicines.update(email, medicine_id, fields)
+
+    def delete_medicine(self, email: str, medicine_id: int) -> bool:
+        return self._medicines.delete(email, medicine_id)
+
+    def iter_medicines(self) -> Iterator[MedicineExport]:
+        # The journal sets keys in place, so iterate over a snapshot of the items
+        for email, book in list(self._medicines.read().items()):
+            yield email, [m.to_dict() for m in book.list()], book.next_id
+
+
+class SQLiteStorage(Storage):
+    """
+    SQLite storage in WAL mode.
+
+    Each thread reuses one connection (and its prepared statement cache);
+    lookups go through the email and (email, id) primary key indexes (medicines
+    are clustered on (email, id), so listing a user's medicines is one range
+    scan). Medicine ids come from a per-user counter row in medicine_ids,
+    bumped in the same BEGIN IMMEDIATE transaction as the insert, so ids are
+    never handed out twice or reused after a delete.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS users (
+            email TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            password TEXT NOT NULL,
+            created_at TEXT,
+            email_notifications_enabled INTEGER NOT NULL DEFAULT 0
+        )""",
+        """CREATE TABLE IF NOT EXISTS medicines (
+            email TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            name TEXT,
+            dosage TEXT,
+            frequency TEXT,
+            time_of_day TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            created_at TEXT,
+            PRIMARY KEY (email, id)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS medicine_ids (
+            email TEXT PRIMARY KEY,
+            next_id INTEGER NOT NULL
+        )""",
+    )
+
+    _SELECT_USER = "SELECT email, name, password, created_at, email_notifications_enabled FROM users WHERE email = ?"
+    _INSERT_USER = ("INSERT OR IGNORE INTO users (email, name, password, created_at, email_notifications_enabled) "
+                    "VALUES (?, ?, ?, ?, ?)")
+    _SELECT_MEDICINES = ("SELECT id, name, dosage, frequency, time_of_day, start_date, end_date, created_at "
+                         "FROM medicines WHERE email = ? ORDER BY id")
+    _SELECT_MEDICINE = ("SELECT id, name, dosage, frequency, time_of_day, start_date, end_date, created_at "
+                        "FROM medicines WHERE email = ? AND id = ?")
+    # Databases from before the counter existed seed it from the highest id.
+    # The counter statements avoid UPSERT (SQLite 3.24+) and RETURNING (3.35+),
+    # which older Python builds lack; BEGIN IMMEDIATE makes read-then-update safe.
+    _SEED_MEDICINE_ID = ("INSERT OR IGNORE INTO medicine_ids (email, next_id) "
+                         "VALUES (?, (SELECT COALESCE(MAX(id), 0) + 1 FROM medicines WHERE email = ?))")
+    _SELECT_MEDICINE_ID = "SELECT next_id FROM medicine_ids WHERE email = ?"
+    _TAKE_MEDICINE_IDS = "UPDATE medicine_ids SET next_id = next_id + ? WHERE email = ?"
+    _INSERT_MEDICINE_ID = "INSERT OR IGNORE INTO medicine_ids (email, next_id) VALUES (?, ?)"
+    _RAISE_MEDICINE_ID = "UPDATE medicine_ids SET next_id = MAX(next_id, ?) WHERE email = ?"
+    _INSERT_MEDICINE = ("INSERT INTO medicines (email, id, name, dosage, frequency, time_of_day, start_date, "
+                        "end_date, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    _DELETE_MEDICINE = "DELETE FROM medicines WHERE email = ? AND id = ?"
+    _UPSERT_USER = ("INSERT OR REPLACE INTO users (email, name, password, created_at, email_notifications_enabled) "
+                    "VALUES (?, ?, ?, ?, ?)")
+    _UPSERT_MEDICINE = ("INSERT OR REPLACE INTO medicines (email, id, name, dosage, frequency, time_of_day, "
+                        "start_date, end_date, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+    def __init__(self, path: str = SQLITE_FILE, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._transaction() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared with a forked child (gunicorn --preload)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self) -> '_Transaction':
+        return _Transaction(self._connection())
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _user(row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        user = dict(zip(USER_FIELDS, row))
+        user['email_notifications_enabled'] = bool(user['email_notifications_enabled'])
+        return user
+
+    @staticmethod
+    def _medicine(row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        return None if row is None else dict(zip(MEDICINE_FIELDS, row))
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._user(self._connection().execute(self._SELECT_USER, (email,)).fetchone())
+
+    def add_user(self, user: Dict[str, Any]) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(self._INSERT_USER, (
+                user['email'], user['name'], user['password'], user.get('created_at'),
+                int(bool(user.get('email_notifications_enabled', False)))))
+            return cursor.rowcount == 1
+
+    def update_user(self, email: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        columns = [f for f in USER_FIELDS if f in fields and f != 'email']
+        with self._transaction() as conn:
+            if columns:
+                values = [int(bool(fields[c])) if c == 'email_notifications_enabled' else fields[c]
+                          for c in columns]
+                conn.execute(f"UPDATE users SET {', '.join(c + ' = ?' for c in columns)} WHERE email = ?",
+                             (*values, email))
+            return self._user(conn.execute(self._SELECT_USER, (email,)).fetchone())
+
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        cursor = self._connection().execute(
+            "SELECT email, name, password, created_at, email_notifications_enabled FROM users ORDER BY email")
+        for row in cursor:
+            yield self._user(row)
+
+    def get_medicines(self, email: str) -> List[Dict[str, Any]]:
+        return [self._medicine(row) for row in self._connection().execute(self._SELECT_MEDICINES, (email,))]
+
+    def get_medicine(self, email: str, medicine_id: int) -> Optional[Dict[str, Any]]:
+        return self._medicine(self._connection().execute(self._SELECT_MEDICINE, (email, medicine_id)).fetchone())
+
+    def add_medicine(self, email: str, medicine: Dict[str, Any]) -> Dict[str, Any]:
+        return self.add_medicines(email, [medicine])[0]
+
+    def add_medicines(self, email: str, medicines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not medicines:
+            return []
+        with self._transaction() as conn:
+            # Reserve a block of ids with one counter update
+            conn.execute(self._SEED_MEDICINE_ID, (email, email))
+            first_id = conn.execute(self._SELECT_MEDICINE_ID, (email,)).fetchone()[0]
+            conn.execute(self._TAKE_MEDICINE_IDS, (len(medicines), email))
+            records = [{f: medicine.get(f) for f in MEDICINE_FIELDS} for medicine in medicines]
+            for i, record in enumerate(records):
+                record['id'] = first_id + i
+            conn.executemany(self._INSERT_MEDICINE,
+                             [(email, *(record[f] for f in MEDICINE_FIELDS)) for record in records])
+        return records
+
+    def update_medicine(self, email: str, medicine_id: int,
+                        fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        columns = [f for f in MEDICINE_FIELDS if f in fields and f != 'id']
+        with self._transaction() as conn:
+            if columns:
+                conn.execute(f"UPDATE medicines SET {', '.join(c + ' = ?' for c in columns)} "
+                             f"WHERE email = ? AND id = ?", (*(fields[c] for c in columns), email, medicine_id))
+            return self._medicine(conn.execute(self._SELECT_MEDICINE, (email, medicine_id)).fetchone())
+
+    def delete_medicine(self, email: str, medicine_id: int) -> bool:
+        with self._transaction() as conn:
+            return conn.execute(self._DELETE_MEDICINE, (email, medicine_id)).rowcount == 1
+
+    def iter_medicines(self) -> Iterator[MedicineExport]:
+        conn = self._connection()
+        next_ids = dict(conn.execute("SELECT email, next_id FROM medicine_ids"))
+        cursor = conn.execute(
+            "SELECT email, id, name, dosage, frequency, time_of_day, start_date, end_date, created_at "
+            "FROM medicines ORDER BY email, id")
+        email, medicines = None, []
+        for row in cursor:
+            if row[0] != email:
+                if medicines:
+                    yield email, medicines, max(next_ids.pop(email, 1), medicines[-1]['id'] + 1)
+                email, medicines = row[0], []
+            medicines.append(self._medicine(row[1:]))
+        if medicines:
+            yield email, medicines, max(next_ids.pop(email, 1), medicines[-1]['id'] + 1)
+        # Users whose medicines were all deleted still carry their counter
+        for email, next_id in sorted(next_ids.items()):
+            yield email, [], next_id
+
+    def import_records(self, users: Iterator[Dict[str, Any]],
+                       medicines: Iterator[MedicineExport]) -> Tuple[int, int]:
+        """
+        Bulk-copy users and medicines (keeping medicine ids) in one transaction.
+        Existing rows with the same keys are replaced.
+
+        Returns:
+            Tuple of (users imported, medicines imported)
+        """
+        n_users = n_medicines = 0
+        with self._transaction() as conn:
+            for user in users:
+                conn.execute(self._UPSERT_USER, (
+                    user['email'], user.get('name', ''), user.get('password', ''),
+                    user.get('created_at'), int(bool(user.get('email_notifications_enabled')))))
+                n_users += 1
+            for email, records, next_id in medicines:
+                for medicine in records:
+                    conn.execute(self._UPSERT_MEDICINE, (email, *(medicine.get(f) for f in MEDICINE_FIELDS)))
+                    n_medicines += 1
+                conn.execute(self._INSERT_MEDICINE_ID, (email, next_id))
+                conn.execute(self._RAISE_MEDICINE_ID, (next_id, email))
+        return n_users, n_medicines
+
+
+class ShardedStorage(Storage):
+    """
+    One small JSON file per user, hashed into directory buckets:
+    <root>/<aa>/<bb>/<sha1(email)>.json holding {"email", "user", "medicines"}
+    (medicines in the MedicineBook form).
+
+    A request reads or rewrites only that user's shard. Writes hold an
+    exclusive lock on the shard's bucket (``<aa>/<bb>/.lock``), which excludes
+    other threads and workers but never users in other buckets. Shards are
+    replaced atomically, so readers need no lock.
+    """
+
+    def __init__(self, root: str = SHARD_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _digest(self, email: str) -> str:
+        return hashlib.sha1(email.encode('utf-8')).hexdigest()
+
+    def _path(self, email: str) -> str:
+        digest = self._digest(email)
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.json")
+
+    def _read(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._read_path(self._path(email))
+
+    @staticmethod
+    def _read_path(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'rb') as f:
+                return loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _modify(self, email: str, change: Callable[[Dict[str, Any]], Tuple[Any, bool]]) -> Any:
+        path = self._path(email)
+        with FileLock(os.path.join(os.path.dirname(path), '.lock')).exclusive():
+            shard = self._read_path(path) or {'email': email, 'user': None, 'medicines': None}
+            result, changed = change(shard)
+            if changed:
+                _atomic_write_bytes(path, dumps(shard))
+            return result
+
+    def _shards(self) -> Iterator[Dict[str, Any]]:
+        for directory, subdirs, files in os.walk(self.root):
+            subdirs.sort()
+            for name in sorted(files):
+                if name.endswith('.json') and not name.startswith('.'):
+                    shard = self._read_path(os.path.join(directory, name))
+                    if shard is not None:
+                        yield shard
+
+    @staticmethod
+    def _user(shard: Optional[Dict[str, Any]]) -> Optional[UserRecord]:
+        user = shard.get('user') if shard else None
+        return UserRecord.from_dict(dict(user, email=shard['email'])) if user is not None else None
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        user = self._user(self._read(email))
+        return user.to_dict() if user is not None else None
+
+    def add_user(self, user: Dict[str, Any]) -> bool:
+        def change(shard):
+            if shard.get('user') is not None:
+                return False, False
+            shard['user'] = UserRecord.from_dict(user)
+            return True, True
+        return self._modify(user['email'], change)
+
+    def update_user(self, email: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        def change(shard):
+            user = self._user(shard)
+            if user is None:
+                return None, False
+            shard['user'] = user.replace(fields)
+            return shard['user'].to_dict(), True
+        return self._modify(email, change)
+
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        for shard in self._shards():
+            user = self._user(shard)
+            if user is not None:
+                yield user.to_dict()
+
+    def _modify_book(self, email: str, change: Callable[[MedicineBook], Tuple[Any, bool]]) -> Any:
+        def change_shard(shard):
+            book = MedicineBook.from_json(shard.get('medicines'))
+            result, changed = change(book)
+            if changed:
+                shard['medicines'] = book.to_json()
+            return result, changed
+        return self._modify(email, change_shard)
+
+    def get_medicines(self, email: str) -> List[Dict[str, Any]]:
+        shard = self._read(email)
+        return [m.to_dict() for m in MedicineBook.from_json(shard.get('medicines')).list()] if shard else []
+
+    def get_medicine(self, email: str, medicine_id: int) -> Optional[Dict[str, Any]]:
+        shard = self._read(email)
+        medicine = MedicineBook.from_json(shard.get('medicines')).get(medicine_id) if shard else None
+        return medicine.to_dict() if medicine is not None else None
+
+    def add_medicine(self, email: str, medicine: Dict[str, Any]) -> Dict[str, Any]:
+        return self.add_medicines(email, [medicine])[0]
+
+    def add_medicines(self, email: str, medicines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        def change(book):
+            records = [MedicineRecord.from_dict(dict(medicine, id=book.allocate_id())) for medicine in medicines]
+            for record in records:
+                book.put(record)
+            return [record.to_dict() for record in records], bool(records)
+        return self._modify_book(email, change)
+
+    def update_medicine(self, email: str, medicine_id: int,
+                        fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        def change(book):
+            medicine = book.update(medicine_id, fields)
+            return (medicine.to_dict(), True) if medicine is not None else (None, False)
+        return self._modify_book(email, change)
+
+    def delete_medicine(self, email: str, medicine_id: int) -> bool:
+        def change(book):
+            removed = book.delete(medicine_id)
+            return removed, removed
+        return self._modify_book(email, change)
+
+    def iter_medicines(self) -> Iterator[MedicineExport]:
+        for shard in self._shards():
+            if shard.get('medicines'):
+                book = MedicineBook.from_json(shard['medicines'])
+                yield shard['email'], [m.to_dict() for m in book.list()], book.next_id
+
+    def import_records(self, users: Iterator[Dict[str, Any]],
+                       medicines: Iterator[MedicineExport]) -> Tuple[int, int]:
+        """
+        Copy users and medicines into their shards, keeping medicine ids and
+        id counters. Existing records with the same keys are replaced.
+
+        Returns:
+            Tuple of (users imported, medicines imported)
+        """
+        n_users = n_medicines = 0
+        for user in users:
+            self._modify(user['email'], lambda shard, user=user: (shard.update(user=UserRecord.from_dict(user)), True))
+            n_users += 1
+
+        for email, records, next_id in medicines:
+            def change(book, records=records, next_id=next_id):
+                for medicine in records:
+                    book.put(MedicineRecord.from_dict(medicine))
+                book.next_id = max(book.next_id, next_id)
+                return None, True
+            self._modify_book(email, change)
+            n_medicines += len(records)
+        return n_users, n_medicines
+
+
+def _atomic_write_bytes(path: str, payload: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block on an autocommit connection."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+BACKENDS = {
+    'json': JSONStorage,
+    'sqlite': SQLiteStorage,
+    'sharded': ShardedStorage,
+}
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """Return the configured storage backend (created on first use)."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                name = os.getenv('MEMORYMATE_STORAGE', 'json').lower()
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown MEMORYMATE_STORAGE '{name}'. Available: {sorted(BACKENDS)}")
+                _storage = BACKENDS[name]()
+    return _storage
+
+
+def set_storage(storage: Optional[Storage]) -> None:
+    """Replace the active backend (None re-reads the configuration on next use)."""
+    global _storage
+    with _storage_lock:
+        _storage = storage
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="MemoryMate storage tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate = commands.add_parser('migrate', help="copy every user and medicine between backends")
+    migrate.add_argument('source', choices=sorted(BACKENDS))
+    migrate.add_argument('target', choices=sorted(name for name in BACKENDS if name != 'json'))
+    commands.add_parser('import-json', help="shorthand for: migrate json sqlite")
+    args = parser.parse_args(argv)
+
+    source_name, target_name = ('json', 'sqlite') if args.command == 'import-json' else (args.source, args.target)
+    if source_name == target_name:
+        parser.error("source and target must differ")
+
+    source, target = BACKENDS[source_name](), BACKENDS[target_name]()
+    started = time.monotonic()
+    n_users, n_medicines = target.import_records(source.iter_users(), source.iter_medicines())
+    print(f"Migrated {n_users} users and {n_medicines} medicines from {source_name} to {target_name} "
+          f"in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import memorymate_routes
+import storage
+from records import MedicineRecord
+from sessions import SESSIONS
+
+MEDICINE = {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json'))
+    storage.set_storage(backend)
+    yield backend
+    storage.set_storage(None)
+
+
+def auth(email):
+    return {'Authorization': f"Bearer {SESSIONS.issue(email, 'Ana')['token']}"}
+
+
+def test_bulk_import_is_one_journal_write(client, backend, tmp_path, monkeypatch):
+    journal = backend._medicines
+    commits = []
+    commit = journal._commit
+    monkeypatch.setattr(journal, '_commit', lambda *records: commits.append(len(records)) or commit(*records))
+    # Each item is validated once, at the route
+    cleaned = []
+    clean_fields = MedicineRecord.clean_fields
+    monkeypatch.setattr(MedicineRecord, 'clean_fields', lambda data: cleaned.append(1) or clean_fields(data))
+
+    medicines = [dict(MEDICINE, name=f'm{i}') for i in range(50)]
+    response = client.post('/api/memorymate/medicines/bulk', headers=auth('ana@example.com'),
+                           json={'medicines': medicines})
+    assert response.status_code == 201
+    assert [m['id'] for m in response.get_json()['medicines']] == list(range(1, 51))
+    # All 50 records were appended by a single write
+    assert commits == [50]
+    assert len(cleaned) == 50
+    assert (tmp_path / 'medicines.json.log').read_bytes().count(b'\n') == 50
+    assert [m['name'] for m in backend.get_medicines('ana@example.com')] == [f'm{i}' for i in range(50)]
+
+
+def test_bulk_import_rejects_invalid_items(client, backend):
+    headers = auth('ana@example.com')
+    bad = [MEDICINE, {'name': 'Ibuprofen'}, 'x']
+    response = client.post('/api/memorymate/medicines/bulk', headers=headers, json={'medicines': bad})
+    assert response.status_code == 400
+    assert [e['index'] for e in response.get_json()['errors']] == [1, 2]
+    assert backend.get_medicines('ana@example.com') == []
+
+    assert client.post('/api/memorymate/medicines/bulk', headers=headers, json={}).status_code == 400
+    assert client.post('/api/memorymate/medicines/bulk', headers=headers,
+                       json={'email': 'bob@example.com', 'medicines': [MEDICINE]}).status_code == 403
+    assert client.post('/api/memorymate/medicines/bulk', json={'medicines': [MEDICINE]}).status_code == 401
+
+
+def test_export_streams_ndjson(client, backend, monkeypatch):
+    backend.add_medicines('ana@example.com', [dict(MEDICINE, name=f'a{i}') for i in range(3)])
+    backend.add_medicines('bob@example.com', [dict(MEDICINE, name='b0')])
+    monkeypatch.setattr(memorymate_routes, 'EXPORT_CHUNK_RECORDS', 2)
+
+    response = client.get('/api/memorymate/medicines/export', headers=auth('ana@example.com'))
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(m['email'], m['id'], m['name']) for m in lines] == \
+        [('ana@example.com', 1, 'a0'), ('ana@example.com', 2, 'a1'), ('ana@example.com', 3, 'a2')]
+
+    assert client.get('/api/memorymate/medicines/export/all').status_code == 403
+    monkeypatch.setattr(memorymate_routes, 'ADMIN_TOKEN', 'admin-token')
+    assert client.get('/api/memorymate/medicines/export/all', headers=auth('ana@example.com')).status_code == 403
+    response = client.get('/api/memorymate/medicines/export/all', headers={'Authorization': 'Bearer admin-token'})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted((m['email'], m['name']) for m in lines) == \
+        [('ana@example.com', 'a0'), ('ana@example.com', 'a1'), ('ana@example.com', 'a2'), ('bob@example.com', 'b0')]
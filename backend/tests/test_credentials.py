@@ -0,0 +1,111 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import credentials
+import storage
+from credentials import CredentialPool, CredentialsBusy, PasswordHasher
+from models import User
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json'))
+    storage.set_storage(backend)
+    # A cheap cost keeps the tests fast
+    credentials.set_credentials(CredentialPool(PasswordHasher('scrypt', n=2 ** 8), workers=2))
+    yield backend
+    credentials.set_credentials(None)
+    storage.set_storage(None)
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher('scrypt', n=2 ** 8)
+    encoded = hasher.hash('secret')
+    assert encoded.startswith('scrypt$256$8$1$')
+    assert encoded != hasher.hash('secret')
+    assert hasher.verify('secret', encoded)
+    assert not hasher.verify('Secret', encoded)
+    assert not hasher.needs_rehash(encoded)
+    assert PasswordHasher('scrypt', n=2 ** 9).needs_rehash(encoded)
+    # Hashes made with another cost still verify
+    assert PasswordHasher('scrypt', n=2 ** 9).verify('secret', encoded)
+
+    with pytest.raises(ValueError):
+        PasswordHasher('scrypt', n=1000)
+
+
+def test_passwords_are_hashed_and_upgraded_on_login(backend):
+    assert User.register('ana@example.com', 'Ana', 'secret')['success']
+    stored = backend.get_user('ana@example.com')['password']
+    assert stored.startswith('scrypt$256$')
+    assert User.login('ana@example.com', 'wrong')['error'] == 'Invalid password'
+
+    # Raising the cost rehashes on the next successful login
+    credentials.set_credentials(CredentialPool(PasswordHasher('scrypt', n=2 ** 9), workers=2))
+    assert User.login('ana@example.com', 'wrong')['error'] == 'Invalid password'
+    assert backend.get_user('ana@example.com')['password'] == stored
+    assert User.login('ana@example.com', 'secret')['success']
+    assert backend.get_user('ana@example.com')['password'].startswith('scrypt$512$')
+    assert User.login('ana@example.com', 'secret')['success']
+
+
+def test_plaintext_passwords_are_migrated_on_login(backend):
+    backend.add_user({'email': 'bob@example.com', 'name': 'Bob', 'password': 'hunter2',
+                      'created_at': '2024-01-01T00:00:00', 'email_notifications_enabled': False})
+    assert User.login('bob@example.com', 'hunter')['error'] == 'Invalid password'
+    assert backend.get_user('bob@example.com')['password'] == 'hunter2'
+    assert User.login('bob@example.com', 'hunter2')['success']
+    assert backend.get_user('bob@example.com')['password'].startswith('scrypt$')
+    assert User.login('bob@example.com', 'hunter2')['success']
+
+
+def test_pool_turns_away_requests_beyond_its_queue():
+    release = threading.Event()
+
+    class SlowHasher(PasswordHasher):
+        def verify(self, password, encoded):
+            release.wait(5)
+            return True
+
+    pool = CredentialPool(SlowHasher('scrypt', n=2 ** 8), workers=1, queue=1)
+    waiting = [threading.Thread(target=pool.verify, args=('secret', 'x')) for _ in range(2)]
+    for thread in waiting:
+        thread.start()
+    while pool._slots._value:
+        time.sleep(0.01)
+    with pytest.raises(CredentialsBusy):
+        pool.verify('secret', 'x')
+    release.set()
+    for thread in waiting:
+        thread.join()
+    assert pool.verify('secret', 'x')
+
+
+def test_pool_reports_a_hash_timeout_as_busy():
+    release = threading.Event()
+
+    class SlowHasher(PasswordHasher):
+        def verify(self, password, encoded):
+            release.wait(5)
+            return True
+
+    pool = CredentialPool(SlowHasher('scrypt', n=2 ** 8), workers=1, queue=1, timeout=0.05)
+    with pytest.raises(CredentialsBusy, match='timed out'):
+        pool.verify('secret', 'x')
+    release.set()
+
+
+def test_login_route_reports_busy(client, backend, monkeypatch):
+    def busy(password, encoded):
+        raise CredentialsBusy('Too many logins in progress, try again shortly')
+
+    assert User.register('ana@example.com', 'Ana', 'secret')['success']
+    monkeypatch.setattr(credentials.get_credentials(), 'verify', busy)
+    response = client.post('/api/memorymate/login', json={'email': 'ana@example.com', 'password': 'secret'})
+    assert response.status_code == 503
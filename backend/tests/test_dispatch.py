@@ -0,0 +1,112 @@
+import email
+import os
+import sys
+from datetime import datetime
+from email import policy
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import mailer
+import storage
+from app import app
+from dispatch import DISPATCHER, dispatch_reminders, reminder_message
+from mailer import MailQueue
+from reminders import doses_due
+from test_mailer import FakeMail
+
+SLOT = datetime(2024, 3, 1, 8, 0)
+MEDICINE = {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31', 'created_at': None}
+
+
+def add_user(backend, email, name, enabled, medicines):
+    backend.add_user({'email': email, 'name': name, 'password': 'x', 'created_at': None,
+                      'email_notifications_enabled': enabled})
+    for medicine in medicines:
+        backend.add_medicine(email, dict(MEDICINE, **medicine))
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.SQLiteStorage(str(tmp_path / 'memorymate.db'))
+    add_user(backend, 'ana@example.com', 'Ana', True, [{}, {'name': 'Zinc', 'time_of_day': 'night'}])
+    add_user(backend, 'bob@example.com', 'Bob', True, [{'time_of_day': 'afternoon'}])
+    add_user(backend, 'cy@example.com', 'Cy', False, [{}])
+    add_user(backend, 'di@example.com', 'Di', True, [])
+    storage.set_storage(backend)
+    yield backend
+    mailer.set_mail_queue(None)
+    storage.set_storage(None)
+
+
+def test_doses_due():
+    assert doses_due(MEDICINE, SLOT) == [(datetime(2024, 3, 1, 6), datetime(2024, 3, 1, 12))]
+    assert doses_due(MEDICINE, datetime(2024, 3, 1, 12, 0)) == []
+    night = dict(MEDICINE, time_of_day='night', frequency='twice')
+    assert doses_due(night, datetime(2024, 3, 2, 5, 0)) == [(datetime(2024, 3, 1, 18), datetime(2024, 3, 2, 6))]
+    assert doses_due(MEDICINE, datetime(2025, 3, 1, 8, 0)) == []
+
+
+def test_dispatch_emails_opted_in_users_with_due_doses(backend):
+    mail = FakeMail()
+    queue = MailQueue(app, mail, workers=2)
+    report = dispatch_reminders(queue, backend, now=SLOT)
+    assert queue.wait_idle(5)
+    assert {key: report[key] for key in ('users', 'opted_in', 'due', 'queued', 'duplicates', 'dropped')} == \
+        {'users': 4, 'opted_in': 3, 'due': 1, 'queued': 1, 'duplicates': 0, 'dropped': 0}
+    assert [message.recipients for message in mail.sent] == [['ana@example.com']]
+    assert 'Aspirin' in mail.sent[0].body and 'Zinc' not in mail.sent[0].body
+
+    # The same doses are not emailed twice
+    assert dispatch_reminders(queue, backend, now=SLOT)['duplicates'] == 1
+    report = dispatch_reminders(queue, backend, now=datetime(2024, 3, 1, 13, 0))
+    assert queue.wait_idle(5)
+    assert report['queued'] == 1 and mail.sent[-1].recipients == ['bob@example.com']
+    queue.stop()
+
+
+def test_prerendered_message_round_trips():
+    doses = [(dict(MEDICINE, id=1, name='Fish & Oil'), datetime(2024, 3, 1, 12))]
+    message, key = reminder_message('ana@example.com', 'Ana', doses)
+    assert key == ('reminder', 'ana@example.com', ((1, datetime(2024, 3, 1, 12)),))
+    with app.app_context():
+        message.date = 1700000000
+        parsed = email.message_from_bytes(message.as_bytes(), policy=policy.default)
+        assert parsed['To'] == 'ana@example.com' and parsed['Subject'] == message.subject
+        assert parsed.get_body(('plain',)).get_content() == message.body
+        assert parsed.get_body(('html',)).get_content() == message.html
+
+        # Long and non-ASCII headers are sanitized like Flask-Mail and folded with CRLF
+        message.subject = message.subject + ' for every medicine due this afternoon, ' * 3
+        assert b'\n' not in message.as_bytes().replace(b'\r\n', b'')
+        message.sender = ('MemoryMate Erinnerungsdienst für Medikamente und Termine', 'noreply@example.com')
+        message.recipients = ['José Núñez <jose@example.com>', 'ana@example.com', 'ana@example.com']
+        raw = message.as_bytes()
+        assert b'\n' not in raw.replace(b'\r\n', b'') and b'boundary="=_' in raw
+        parsed = email.message_from_bytes(raw, policy=policy.default)
+        assert parsed['Subject'] == message.subject
+        assert parsed['From'].addresses[0].display_name == message.sender[0]
+        assert [a.addr_spec for a in parsed['To'].addresses] == ['jose@example.com', 'ana@example.com']
+        assert parsed['To'].addresses[0].display_name == 'José Núñez'
+
+        # Anything beyond the plain layout goes through Flask-Mail
+        message.attach('notes.txt', 'text/plain', b'hello')
+        assert b'notes.txt' in message.as_bytes()
+
+
+def test_dispatch_route(client, backend, monkeypatch):
+    import memorymate_routes
+    monkeypatch.setattr(memorymate_routes, 'ADMIN_TOKEN', 'admin-secret')
+    mail = FakeMail()
+    mailer.set_mail_queue(MailQueue(app, mail, workers=1))
+    headers = {'Authorization': 'Bearer admin-secret'}
+
+    assert client.post('/api/memorymate/reminders/dispatch').status_code == 403
+    assert client.post('/api/memorymate/reminders/dispatch', headers=headers).status_code == 202
+    DISPATCHER.join(5)
+    response = client.get('/api/memorymate/reminders/dispatch', headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['running'] is False and body['report']['opted_in'] == 3
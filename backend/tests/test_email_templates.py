@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app
+from email_templates import Template, render_reminder
+from utils import build_medicine_reminder_message
+
+MEDICINES = [{'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once'},
+             {'name': 'Fish & <Oil>', 'dosage': '1g', 'frequency': 'twice'}]
+
+
+def test_template_fills_slots():
+    template = Template("""
+        <p>{{ greeting }}, {{name}}!</p>
+            <p>{{ greeting }}</p>
+    """, strip_indent=True)
+    assert template.slots == {'greeting', 'name'}
+    assert template.render(greeting='Hi', name='Ana') == '<p>Hi, Ana!</p>\n<p>Hi</p>'
+    with pytest.raises(KeyError):
+        template.render(greeting='Hi')
+
+
+def test_reminder_has_escaped_html_and_a_text_part():
+    html, text = render_reminder('Ana <b>', MEDICINES)
+    assert 'Hi <strong>Ana &lt;b&gt;</strong>' in html
+    assert '<strong>Fish &amp; &lt;Oil&gt;</strong>' in html
+    assert html.count('<tr>') == 3 and '{{' not in html
+    assert text.startswith('Hi Ana <b>,')
+    assert '- Aspirin: 100mg (once)\n- Fish & <Oil>: 1g (twice)' in text
+
+
+def test_reminder_message_is_multipart():
+    message = build_medicine_reminder_message('ana@example.com', 'Ana', MEDICINES)
+    assert message.recipients == ['ana@example.com']
+    assert '- Aspirin: 100mg (once)' in message.body
+    assert '<strong>Aspirin</strong>' in message.html
+    with app.app_context():
+        assert 'multipart/alternative' in message.as_string()
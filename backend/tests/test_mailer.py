@@ -0,0 +1,151 @@
+import os
+import socket
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import credentials
+import mailer
+import reminders
+import storage
+from app import app
+from credentials import CredentialPool, PasswordHasher
+from mailer import MailQueue
+from models import Medicine, User
+from reminders import ReminderScheduler
+
+MEDICINE = {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+class FakeMail:
+    """Stands in for Flask-Mail: records connections and sends, failing the first ``failures`` sends."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.connections = 0
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def connect(self):
+        mail = self
+
+        class Connection:
+            def __enter__(self):
+                with mail.lock:
+                    mail.connections += 1
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def send(self, message):
+                with mail.lock:
+                    if mail.failures:
+                        mail.failures -= 1
+                        raise OSError('connection reset')
+                    mail.sent.append(message)
+
+        return Connection()
+
+
+def test_connections_are_reused():
+    mail = FakeMail()
+    queue = MailQueue(app, mail, workers=2, idle_seconds=5)
+    for i in range(50):
+        assert queue.enqueue(f'message {i}')
+    assert queue.wait_idle(5)
+    queue.stop()
+
+    assert sorted(mail.sent) == sorted(f'message {i}' for i in range(50))
+    assert mail.connections <= 2
+    stats = queue.stats()
+    assert (stats['queued'], stats['sent'], stats['depth'], stats['outstanding']) == (50, 50, 0, 0)
+    assert stats['latency_p50'] is not None
+
+
+def test_failed_sends_are_retried_with_backoff():
+    mail = FakeMail(failures=2)
+    queue = MailQueue(app, mail, workers=1, retries=2, backoff=0.01)
+    assert queue.enqueue('hello', key='k')
+    assert queue.wait_idle(5)
+    assert mail.sent == ['hello'] and mail.connections == 3
+    assert queue.stats()['retried'] == 2
+
+    # Giving up forgets the key so a later request can try again
+    mail.failures = 5
+    assert queue.enqueue('again', key='k2')
+    assert queue.wait_idle(5)
+    queue.stop()
+    assert queue.stats()['failed'] == 1
+    assert queue.enqueue('again', key='k2')
+
+
+def test_duplicates_and_overflow_are_turned_away():
+    queue = MailQueue(app, FakeMail(), workers=1, maxsize=1)
+    queue.stop()  # keep everything queued
+    assert queue.enqueue('first', key=('reminder', 'ana@example.com', 1))
+    assert not queue.enqueue('first again', key=('reminder', 'ana@example.com', 1))
+    assert not queue.enqueue('second')
+    stats = queue.stats()
+    assert (stats['deduplicated'], stats['dropped'], stats['depth']) == (1, 1, 1)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json'))
+    storage.set_storage(backend)
+    credentials.set_credentials(CredentialPool(PasswordHasher('scrypt', n=2 ** 8), workers=1))
+    yield backend
+    mailer.set_mail_queue(None)
+    reminders.set_scheduler(None)
+    credentials.set_credentials(None)
+    storage.set_storage(None)
+
+
+def test_check_medicines_queues_one_reminder_per_due_dose(client, backend):
+    mail = FakeMail()
+    queue = MailQueue(app, mail, workers=1)
+    mailer.set_mail_queue(queue)
+    reminders.set_scheduler(ReminderScheduler(backend, tick_seconds=0, rebuild_seconds=0,
+                                              clock=lambda: datetime(2024, 3, 1, 8, 0)))
+    User.register('ana@example.com', 'Ana', 'secret')
+    token = client.post('/api/memorymate/login',
+                        json={'email': 'ana@example.com', 'password': 'secret'}).get_json()['token']
+    Medicine.add_medicine('ana@example.com', MEDICINE)
+
+    url = '/api/memorymate/check_medicines/ana@example.com?send_email=true'
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get(url, headers=headers).get_json()['email_sent'] is True
+    assert client.get(url, headers=headers).get_json()['email_sent'] is False
+    assert queue.wait_idle(5)
+    assert len(mail.sent) == 1 and mail.sent[0].recipients == ['ana@example.com']
+
+
+def test_delivers_through_a_local_smtp_server():
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+    from aiosmtpd.handlers import Sink
+    from flask import Flask
+    from flask_mail import Mail, Message
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    controller = controller_module.Controller(Sink(), hostname='127.0.0.1', port=port)
+    controller.start()
+    try:
+        local = Flask(__name__)
+        local.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port,
+                            MAIL_USE_TLS=False, MAIL_USERNAME=None, MAIL_PASSWORD=None)
+        queue = MailQueue(local, Mail(local), workers=2)
+        for i in range(10):
+            queue.enqueue(Message(f'Reminder {i}', sender='noreply@example.com', recipients=['ana@example.com']))
+        assert queue.wait_idle(10)
+        queue.stop()
+        assert queue.stats()['sent'] == 10
+    finally:
+        controller.stop()
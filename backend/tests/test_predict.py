@@ -0,0 +1,266 @@
+import json
+import os
+import sys
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import memorymate_routes
+import utils
+
+
+def test_aggregate_conditions_matches_knowledge_base():
+    scores = utils.aggregate_conditions(["fever", "cough"])
+    assert scores["Flu"] == (0.90 + 0.80) / 2
+    assert scores["Bronchitis"] == 0.85 / 2
+    assert "Migraine" not in scores
+
+
+def test_predict_conditions_ranked_and_limited():
+    results = utils.predict_conditions(30, "female", ["fever", "cough"], top_n=3)
+    assert [r["name"] for r in results] == ["Flu", "Common Cold", "Pneumonia"]
+    probabilities = [r["probability"] for r in results]
+    assert probabilities == sorted(probabilities, reverse=True)
+    assert all(r["suggestions"] for r in results)
+
+
+def test_predict_conditions_unknown_symptoms():
+    assert utils.predict_conditions(30, "male", ["not_a_symptom"]) == []
+    assert utils.predict_conditions(30, "male", []) == []
+
+
+def test_predict_conditions_batch_matches_single():
+    records = [
+        {"age": 30, "gender": "male", "symptoms": ["fever", "cough"]},
+        {"age": 70, "gender": "female", "symptoms": ["headache", "nausea", "nausea"]},
+        {"age": 8, "gender": "male", "symptoms": ["fatigue"]},
+    ]
+    batch = utils.predict_conditions_batch(records)
+    assert batch == [utils.predict_conditions(r["age"], r["gender"], r["symptoms"]) for r in records]
+
+
+def test_predict_batch_endpoint_reports_per_record_errors(client):
+    body = {"records": [
+        {"age": 30, "gender": "male", "symptoms": ["fever"]},
+        {"age": 30, "gender": "male", "symptoms": ["sneezing"]},
+        {"age": -5, "gender": "female", "symptoms": ["cough"]},
+    ]}
+    r = client.post('/api/predict/batch', json=body)
+    assert r.status_code == 200
+    data = r.get_json()
+    assert data["summary"] == {"total": 3, "succeeded": 1, "failed": 2}
+    assert data["results"][0]["conditions"][0]["name"] == "Flu"
+    assert [res["status"] for res in data["results"]] == ["success", "failed", "failed"]
+
+    r = client.post('/api/predict/batch', json={"records": []})
+    assert r.status_code == 400
+
+
+def test_prediction_cache_canonical_key_and_invalidation(client, monkeypatch):
+    utils.notify_knowledge_base_changed()
+    before = utils.PREDICTION_CACHE.stats()
+
+    first = utils.predict_conditions(30, "male", ["fever", "cough"])
+    first[0]["name"] = "mutated"
+    second = utils.predict_conditions(40, "male", ["Cough", "fever"])
+    assert second[0]["name"] == "Flu"
+
+    stats = client.get('/api/predict/cache').get_json()["cache"]
+    assert stats["hits"] == before["hits"] + 1
+    assert stats["misses"] == before["misses"] + 1
+    assert stats["size"] == 1
+
+    assert client.delete('/api/predict/cache').status_code == 403
+    assert utils.PREDICTION_CACHE.stats()["size"] == 1
+    monkeypatch.setattr(memorymate_routes, 'ADMIN_TOKEN', 'admin-token')
+    stats = client.delete('/api/predict/cache', headers={'Authorization': 'Bearer admin-token'}).get_json()["cache"]
+    assert stats["size"] == 0
+    assert stats["generation"] == before["generation"] + 1
+
+
+def test_prediction_cache_evicts_least_recently_used():
+    cache = utils.PredictionCache(max_size=2, ttl=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+    stale = cache.generation
+    cache.clear()
+    cache.put("d", 4, stale)
+    assert cache.get("d") is None
+
+
+def test_condition_resolvers_match_keyword_tables():
+    assert utils.classify_severity("Heart Attack") == "high"
+    assert utils.classify_severity("Tension Headache") == "low"
+    assert utils.classify_severity("Acute Bronchitis") == "medium"
+    assert utils.classify_severity("Totally Unknown") == "medium"
+    kb = utils.get_knowledge_base()
+    assert utils.get_condition_suggestions("flu") is kb.suggestions["Flu"]
+    assert utils.get_condition_suggestions("Chronic Migraine") is kb.suggestions["Migraine"]
+    assert utils.get_condition_suggestions("Unknown") is kb.default_suggestions
+    # Names outside the catalog still match keywords inside a longer token
+    assert utils.get_condition_suggestions("Migraines") is kb.suggestions["Migraine"]
+    assert utils.get_condition_suggestions("Recurring Migraines") is kb.suggestions["Migraine"]
+
+
+def test_knowledge_base_build_mmap_and_hot_reload(tmp_path):
+    import json
+    import numpy as np
+    from knowledge_base import SOURCE_FILE, KnowledgeBaseStore, build
+
+    source = json.loads(SOURCE_FILE.read_text(encoding='utf-8'))
+    source_file = tmp_path / 'kb.json'
+    source_file.write_text(json.dumps(source), encoding='utf-8')
+    out = tmp_path / 'compiled'
+    build(source_file, out)
+
+    store = KnowledgeBaseStore(out, source_file, check_interval=0)
+    events = []
+    store.add_listener(lambda: events.append(store.current().version))
+    kb = store.current()
+    assert isinstance(kb.data, np.memmap)
+
+    def flu_weight(kb):
+        ids, weights = kb.row(kb.symptom_index["fever"])
+        return weights[list(ids).index(kb.conditions.index("Flu"))]
+
+    assert flu_weight(kb) == 0.90
+
+    source["symptom_conditions"]["fever"]["Flu"] = 0.5
+    source_file.write_text(json.dumps(source), encoding='utf-8')
+    build(source_file, out)
+
+    reloaded = store.current()
+    assert reloaded.version != kb.version
+    assert flu_weight(reloaded) == 0.5
+    assert events == [reloaded.version]
+    # The previous build stays readable for requests still holding it
+    assert flu_weight(kb) == 0.90
+
+
+def test_naive_bayes_model_uses_age_and_gender_priors(client):
+    child = utils.predict_conditions(6, "male", ["chest_pain"], model="naive_bayes")
+    elderly = utils.predict_conditions(80, "male", ["chest_pain"], model="naive_bayes")
+    assert {r["name"] for r in child} == {"Angina", "Heart Attack", "Pneumonia"}
+    assert set(child[0]) == {"name", "probability", "severity", "color", "suggestions"}
+    heart_attack = {age: next(r["probability"] for r in results if r["name"] == "Heart Attack")
+                    for age, results in ((6, child), (80, elderly))}
+    assert heart_attack[80] > heart_attack[6]
+    assert sum(r["probability"] for r in elderly) <= 100.0
+
+    body = {"age": 80, "gender": "male", "symptoms": ["chest_pain"], "model": "naive_bayes"}
+    r = client.post('/api/predict', json=body)
+    assert r.status_code == 200
+    assert r.get_json()["conditions"] == elderly
+
+    body["model"] = "nope"
+    assert client.post('/api/predict', json=body).status_code == 400
+
+    # Batch records may pick their own model; the top-level one is the default
+    batch = {"model": "heuristic", "records": [
+        dict(body, model="naive_bayes"),
+        {"age": 80, "gender": "male", "symptoms": ["chest_pain"]},
+        dict(body, model="nope"),
+    ]}
+    results = client.post('/api/predict/batch', json=batch).get_json()["results"]
+    assert results[0]["conditions"] == elderly
+    assert results[1]["conditions"] == utils.predict_conditions(80, "male", ["chest_pain"], model="heuristic")
+    assert results[1]["conditions"] != elderly
+    assert results[2]["error"] == "Unknown model 'nope'"
+
+    # Non-string models are validation errors, not server errors
+    for bad in (["x"], {}, 1):
+        assert client.post('/api/predict', json=dict(body, model=bad)).status_code == 400
+    assert client.post('/api/predict/batch', json=dict(batch, model=["x"])).status_code == 400
+    batch["records"][2]["model"] = {}
+    results = client.post('/api/predict/batch', json=batch).get_json()["results"]
+    assert [r["status"] for r in results] == ["success", "success", "failed"]
+    lines = [json.dumps(dict(body, model=["x"])), json.dumps(dict(body, model="heuristic"))]
+    r = client.post('/api/predict/stream', data="\n".join(lines), content_type='application/x-ndjson')
+    assert [json.loads(line).get("status") for line in r.get_data(as_text=True).splitlines()][:2] == \
+        ["failed", "success"]
+
+    # As in batch, a record's own model wins over the ?model= default
+    lines = [json.dumps(dict(body, model="naive_bayes")), json.dumps(dict(body, model=None))]
+    r = client.post('/api/predict/stream?model=heuristic', data="\n".join(lines),
+                    content_type='application/x-ndjson')
+    streamed = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+    assert streamed[0]["conditions"] == elderly
+    assert streamed[1]["conditions"] == results[1]["conditions"]
+
+
+def test_predict_stream_ndjson(client):
+    body = "\n".join([
+        '{"age": 30, "gender": "male", "symptoms": ["fever"]}',
+        '',
+        'not json',
+        '{"age": 30, "gender": "male", "symptoms": ["sneezing"]}',
+        '{"age": 70, "gender": "female", "symptoms": ["cough", "fever"]}',
+    ])
+    r = client.post('/api/predict/stream', data=body, content_type='application/x-ndjson')
+    assert r.status_code == 200
+    assert r.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+    assert [line.get("line") for line in lines[:-1]] == [1, 3, 4, 5]
+    assert [line.get("status") for line in lines[:-1]] == ["success", "failed", "failed", "success"]
+    assert lines[0]["conditions"] == utils.predict_conditions(30, "male", ["fever"])
+    assert lines[-1]["summary"]["total"] == 4
+    assert lines[-1]["summary"]["succeeded"] == 2
+
+
+def test_score_dataset_cli_matches_predict(tmp_path):
+    import score_dataset
+
+    source = tmp_path / "intake.csv"
+    source.write_text("age,gender,symptoms\n30,male,fever;cough\nabc,male,fever\n70,female,chest_pain\n")
+    output = tmp_path / "scored.ndjson"
+    assert score_dataset.main([str(source), str(output), "--workers", "2", "--chunk-size", "1"]) == 0
+
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [line["row"] for line in lines] == [1, 2, 3]
+    assert [line["status"] for line in lines] == ["success", "failed", "success"]
+    assert lines[0]["conditions"] == utils.predict_conditions(30, "male", ["fever", "cough"])
+
+
+def test_predict_incremental_matches_full_prediction(client):
+    for model in ("heuristic", "naive_bayes"):
+        r = client.post('/api/predict/incremental', json={
+            "age": 70, "gender": "female", "add": ["fever", "headache"], "model": model})
+        assert r.status_code == 200
+        body = r.get_json()
+        assert body["conditions"] == utils.predict_conditions(70, "female", ["fever", "headache"], model=model)
+
+        r = client.post('/api/predict/incremental', json={
+            "token": body["token"], "add": ["cough", "fever"], "remove": ["headache"]})
+        body = r.get_json()
+        assert body["symptoms"] == ["cough", "fever"]
+        assert body["conditions"] == utils.predict_conditions(70, "female", ["fever", "cough"], model=model)
+
+        r = client.post('/api/predict/incremental', json={"token": body["token"], "remove": ["cough", "fever"]})
+        assert r.get_json()["symptoms"] == []
+        assert r.get_json()["conditions"] == []
+
+    token = body["token"]
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    assert client.post('/api/predict/incremental', json={"token": tampered, "add": ["fever"]}).status_code == 400
+    assert client.post('/api/predict/incremental', json={"add": ["fever"]}).status_code == 400
+    assert client.post('/api/predict/incremental', json={"token": token, "add": ["sneezing"]}).status_code == 400
+    for bad in (["x"], {}):
+        assert client.post('/api/predict/incremental', json={"token": token, "model": bad}).status_code == 400
+
+
+def test_score_token_secret_is_read_on_first_use(monkeypatch):
+    from incremental_prediction import ScoreTokenCodec
+
+    # Codecs created before .env is loaded still share the configured secret
+    first, second = ScoreTokenCodec(), ScoreTokenCodec()
+    monkeypatch.setenv('PREDICTION_TOKEN_SECRET', 'test-token-secret')
+    state = utils.SCORE_TOKENS.loads(utils.predict_conditions_incremental(None, ["fever"], [], 30, "male")[1])
+    token = first.dumps(state)
+    assert second.loads(token).symptoms == state.symptoms
+    assert ScoreTokenCodec('test-token-secret').loads(token).symptoms == state.symptoms
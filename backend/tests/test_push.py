@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import credentials
+import push
+import reminders
+import storage
+from credentials import CredentialPool, PasswordHasher
+from models import Medicine, User
+from push import HubFull, ReminderHub
+from reminders import ReminderScheduler
+
+MEDICINE = {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_hub_fans_out_per_user():
+    hub = ReminderHub(max_subscribers=3)
+    first, second, other = hub.subscribe('ana@example.com'), hub.subscribe('ana@example.com'), \
+        hub.subscribe('bob@example.com')
+    with pytest.raises(HubFull):
+        hub.subscribe('cy@example.com')
+
+    assert hub.publish('ana@example.com', {'name': 'Aspirin'}) == 2
+    assert first.get(0.1) == second.get(0.1) == {'name': 'Aspirin'}
+    assert other.get(0.01) is None
+
+    hub.unsubscribe(first)
+    hub.unsubscribe(first)
+    assert len(hub) == 2 and hub.publish('ana@example.com', {}) == 1
+    hub.subscribe('cy@example.com')
+
+
+def test_slow_subscribers_lose_their_oldest_events():
+    hub = ReminderHub()
+    subscription = hub.subscribe('ana@example.com')
+    for i in range(push.SSE_QUEUE_SIZE + 5):
+        hub.publish('ana@example.com', {'n': i})
+    assert subscription.get(0.1) == {'n': 5}
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json'))
+    storage.set_storage(backend)
+    credentials.set_credentials(CredentialPool(PasswordHasher('scrypt', n=2 ** 8), workers=1))
+    push.set_hub(ReminderHub())
+    yield backend
+    push.set_hub(None)
+    reminders.set_scheduler(None)
+    credentials.set_credentials(None)
+    storage.set_storage(None)
+
+
+def read_event(stream):
+    chunk = next(stream)
+    while chunk.startswith(b':'):
+        chunk = next(stream)
+    name, data = chunk.decode().strip().split('\n')
+    return name[len('event: '):], json.loads(data[len('data: '):])
+
+
+def test_events_stream_pushes_fired_doses(client, backend, monkeypatch):
+    import memorymate_routes
+    monkeypatch.setattr(memorymate_routes, 'SSE_HEARTBEAT', 0.05)
+    scheduler = ReminderScheduler(backend, tick_seconds=0, rebuild_seconds=0, clock=Clock(datetime(2024, 3, 1, 7)))
+    reminders.set_scheduler(scheduler)
+    User.register('ana@example.com', 'Ana', 'secret')
+    token = client.post('/api/memorymate/login',
+                        json={'email': 'ana@example.com', 'password': 'secret'}).get_json()['token']
+    Medicine.add_medicine('ana@example.com', MEDICINE)
+    Medicine.add_medicine('ana@example.com', dict(MEDICINE, name='Zinc', time_of_day='afternoon'))
+
+    assert client.get('/api/memorymate/events/ana@example.com').status_code == 401
+    assert client.get(f'/api/memorymate/events/bob@example.com?token={token}').status_code == 403
+
+    response = client.get(f'/api/memorymate/events/ana@example.com?token={token}', buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    assert next(stream).startswith(b'retry: ')
+    assert read_event(stream) == ('due', {'id': 1, 'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once',
+                                          'message': 'Time to take Aspirin - 100mg',
+                                          'until': '2024-03-01T12:00:00'})
+    # Idle streams get heartbeats
+    assert next(stream) == b': ping\n\n'
+
+    scheduler.clock.now = datetime(2024, 3, 1, 12, 30)
+    scheduler.tick()
+    assert read_event(stream)[1]['name'] == 'Zinc'
+
+    assert len(push.get_hub()) == 1
+    response.close()
+    assert len(push.get_hub()) == 0
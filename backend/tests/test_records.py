@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import records
+import storage
+from models import Medicine, User
+from records import MedicineRecord, RecordError, UserRecord
+
+MEDICINE = {'name': ' Aspirin ', 'dosage': 100, 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+def test_ingress_normalizes_and_validates():
+    user = UserRecord.from_input(' Ana@Example.com ', ' Ana ', ' secret ', created_at='2024-01-01T00:00:00')
+    assert (user.email, user.name, user.password) == ('ana@example.com', 'Ana', 'secret')
+    assert user.email_notifications_enabled is False
+    with pytest.raises(RecordError, match="'name' is required"):
+        UserRecord.from_input('ana@example.com', '  ', 'secret', created_at='2024-01-01T00:00:00')
+
+    medicine = MedicineRecord.clean_new(dict(MEDICINE, unknown='x'), created_at='2024-01-01T00:00:00')
+    assert medicine == {'name': 'Aspirin', 'dosage': '100', 'frequency': 'once', 'time_of_day': 'morning',
+                        'start_date': '2024-01-01', 'end_date': '2024-12-31', 'created_at': '2024-01-01T00:00:00'}
+    assert MedicineRecord.clean_fields({'dosage': ' 200mg ', 'id': 5}) == {'dosage': '200mg'}
+    for bad in ({'name': 'x'}, ['x'], None, True):
+        with pytest.raises(RecordError, match="'dosage' must be a string"):
+            MedicineRecord.clean_fields({'dosage': bad})
+
+
+def test_records_are_slotted():
+    medicine = MedicineRecord.from_dict({'id': 1, 'name': 'Aspirin'})
+    assert not hasattr(medicine, '__dict__')
+    with pytest.raises(AttributeError):
+        medicine.unknown = 'x'
+    assert medicine.replace({'name': 'Ibuprofen'}) == MedicineRecord(id=1, name='Ibuprofen')
+    assert records.MEDICINE_DEFAULTS['frequency'] == 'once'
+
+
+def test_records_round_trip_without_orjson(monkeypatch):
+    record = MedicineRecord.from_dict(dict(MedicineRecord.clean_new(MEDICINE, created_at='t'), id=3))
+    payload = {'ana@example.com': {'next_id': 4, 'medicines': {'3': record}}}
+    compact = records.dumps(payload)
+    assert b'\n' not in compact and b': ' not in compact
+
+    monkeypatch.setattr(records, 'orjson', None)
+    assert records.dumps(payload) == compact
+    assert MedicineRecord.from_dict(records.loads(compact)['ana@example.com']['medicines']['3']) == record
+
+
+def test_models_reject_malformed_fields(tmp_path):
+    storage.set_storage(storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json')))
+    try:
+        assert User.register('ana@example.com', 'Ana', ['secret']) == \
+            {'success': False, 'error': "Field 'password' must be a string"}
+        added = Medicine.add_medicine('ana@example.com', MEDICINE)['medicine']
+        assert (added['name'], added['dosage']) == ('Aspirin', '100')
+        assert Medicine.update_medicine('ana@example.com', 1, {'name': {'x': 1}})['error'] == \
+            "Field 'name' must be a string"
+        # Stored files are compact JSON without indentation
+        assert User.register('ana@example.com', 'Ana', 'secret')['success']
+        assert b'\n' not in (tmp_path / 'users.json').read_bytes()
+    finally:
+        storage.set_storage(None)
@@ -0,0 +1,126 @@
+import os
+import sys
+from datetime import date, datetime
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import credentials
+import reminders
+import storage
+from credentials import CredentialPool, PasswordHasher
+from models import Medicine, User
+from reminders import ReminderScheduler, dose_windows
+
+MEDICINE = {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json'))
+    storage.set_storage(backend)
+    yield backend
+    reminders.set_scheduler(None)
+    storage.set_storage(None)
+
+
+@pytest.fixture
+def scheduler(backend):
+    scheduler = ReminderScheduler(backend, tick_seconds=0, rebuild_seconds=0,
+                                  clock=Clock(datetime(2024, 3, 1, 5, 0)))
+    reminders.set_scheduler(scheduler)
+    return scheduler
+
+
+def test_dose_windows():
+    day = date(2024, 3, 1)
+    assert dose_windows(MEDICINE, day) == [(datetime(2024, 3, 1, 6), datetime(2024, 3, 1, 12))]
+    assert dose_windows(dict(MEDICINE, frequency='twice', time_of_day='night'), day) == [
+        (datetime(2024, 3, 1, 18), datetime(2024, 3, 2, 6)),
+        (datetime(2024, 3, 2, 6), datetime(2024, 3, 2, 18))]
+    assert [start.hour for start, end in dose_windows(dict(MEDICINE, frequency='thrice'), day)] == [6, 14, 22]
+    assert dose_windows(MEDICINE, date(2023, 12, 31)) == []
+    assert dose_windows(MEDICINE, date(2025, 1, 1)) == []
+    assert dose_windows(dict(MEDICINE, time_of_day='whenever'), day) == []
+
+
+def test_doses_fire_once_per_window(backend, scheduler):
+    fired = []
+    scheduler.on_fire.append(lambda email, medicine, window: fired.append((email, medicine['name'], window[0])))
+    backend.add_medicine('ana@example.com', dict(MEDICINE, created_at=None))
+    backend.add_medicine('bob@example.com', dict(MEDICINE, name='Zinc', time_of_day='night', created_at=None))
+
+    assert scheduler.tick() == []
+    assert scheduler.due('ana@example.com') == []
+
+    scheduler.clock.now = datetime(2024, 3, 1, 6, 30)
+    assert [(email, m['name']) for email, m in scheduler.tick()] == [('ana@example.com', 'Aspirin')]
+    assert scheduler.tick() == []
+    assert [m['name'] for m in scheduler.due('ana@example.com')] == ['Aspirin']
+    assert scheduler.due('bob@example.com') == []
+
+    scheduler.clock.now = datetime(2024, 3, 1, 19, 0)
+    assert [(email, m['name']) for email, m in scheduler.tick()] == [('bob@example.com', 'Zinc')]
+    assert scheduler.due('ana@example.com') == []
+    assert fired == [('ana@example.com', 'Aspirin', datetime(2024, 3, 1, 6)),
+                     ('bob@example.com', 'Zinc', datetime(2024, 3, 1, 18))]
+
+    # Rebuilding keeps doses that already fired quiet
+    scheduler.rebuild()
+    assert scheduler.tick() == [] and len(fired) == 2
+    assert [m['name'] for m in scheduler.due('bob@example.com')] == ['Zinc']
+
+
+def test_first_build_does_not_fire_open_windows(backend):
+    backend.add_medicine('ana@example.com', dict(MEDICINE, created_at=None))
+    scheduler = ReminderScheduler(backend, tick_seconds=0, rebuild_seconds=0,
+                                  clock=Clock(datetime(2024, 3, 1, 7, 0)))
+    assert scheduler.tick() == []
+    assert [m['name'] for m in scheduler.due('ana@example.com')] == ['Aspirin']
+
+
+def test_model_changes_update_the_index(backend, scheduler):
+    scheduler.tick()
+    medicine = Medicine.add_medicine('ana@example.com', MEDICINE)['medicine']
+    scheduler.clock.now = datetime(2024, 3, 1, 6, 30)
+    assert [m['name'] for m in scheduler.due('ana@example.com')] == ['Aspirin']
+
+    # Editing a due dose does not fire it again
+    assert Medicine.update_medicine('ana@example.com', medicine['id'], {'dosage': '200mg'})['success']
+    assert scheduler.tick() == []
+    assert [m['dosage'] for m in scheduler.due('ana@example.com')] == ['200mg']
+
+    assert Medicine.update_medicine('ana@example.com', medicine['id'], {'time_of_day': 'night'})['success']
+    assert scheduler.due('ana@example.com') == []
+
+    assert Medicine.delete_medicine('ana@example.com', medicine['id'])['success']
+    scheduler.clock.now = datetime(2024, 3, 1, 19, 0)
+    assert scheduler.tick() == []
+
+
+def test_check_medicines_route_uses_the_index(client, backend, scheduler):
+    credentials.set_credentials(CredentialPool(PasswordHasher('scrypt', n=2 ** 8), workers=1))
+    try:
+        User.register('ana@example.com', 'Ana', 'secret')
+        token = client.post('/api/memorymate/login',
+                            json={'email': 'ana@example.com', 'password': 'secret'}).get_json()['token']
+    finally:
+        credentials.set_credentials(None)
+    Medicine.add_medicine('ana@example.com', MEDICINE)
+    scheduler.clock.now = datetime(2024, 3, 1, 8, 0)
+
+    response = client.get('/api/memorymate/check_medicines/ana@example.com',
+                          headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.get_json()['due_medicines'] == [
+        {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'message': 'Time to take Aspirin - 100mg'}]
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import credentials
+import reminders
+import storage
+from credentials import CredentialPool, PasswordHasher
+from models import User
+from sessions import InvalidSession, SessionTokens
+
+SECRET = 'test-session-secret-0123456789abcdef'
+MEDICINE = {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json'))
+    storage.set_storage(backend)
+    credentials.set_credentials(CredentialPool(PasswordHasher('scrypt', n=2 ** 8), workers=1))
+    yield backend
+    reminders.set_scheduler(None)
+    credentials.set_credentials(None)
+    storage.set_storage(None)
+
+
+def login(client, email='ana@example.com', password='secret'):
+    response = client.post('/api/memorymate/login', json={'email': email, 'password': password})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def test_tokens_verify_expire_and_revoke():
+    tokens = SessionTokens(SECRET, ttl=60)
+    issued = tokens.issue('ana@example.com', 'Ana')
+    claims = tokens.verify(issued['token'])
+    assert (claims['sub'], claims['name'], claims['exp']) == ('ana@example.com', 'Ana', issued['expires_at'])
+
+    with pytest.raises(InvalidSession, match='Invalid'):
+        SessionTokens(SECRET[::-1]).verify(issued['token'])
+    with pytest.raises(InvalidSession, match='Missing'):
+        tokens.verify(None)
+
+    tokens.revoke(claims)
+    with pytest.raises(InvalidSession, match='revoked'):
+        tokens.verify(issued['token'])
+
+    expired = SessionTokens(SECRET, ttl=-1)
+    with pytest.raises(InvalidSession, match='expired'):
+        expired.verify(expired.issue('ana@example.com', 'Ana')['token'])
+    # Expired ids are dropped from the revocation set on the next revoke
+    tokens.revoked.add('stale', time.time() - 1)
+    assert 'stale' not in tokens.revoked and len(tokens.revoked) == 1
+
+
+def test_default_secret_is_read_on_first_use(monkeypatch):
+    # Workers created before .env is loaded still share the configured secret
+    first, second = SessionTokens(), SessionTokens()
+    monkeypatch.setenv('MEMORYMATE_SESSION_SECRET', SECRET)
+    issued = first.issue('ana@example.com', 'Ana')
+    assert second.verify(issued['token'])['sub'] == 'ana@example.com'
+    assert SessionTokens(SECRET).verify(issued['token'])['sub'] == 'ana@example.com'
+
+
+def test_routes_require_the_users_own_session(client, backend):
+    User.register('ana@example.com', 'Ana', 'secret')
+    User.register('bob@example.com', 'Bob', 'secret')
+
+    assert client.get('/api/memorymate/list_medicines/ana@example.com').status_code == 401
+    headers = login(client)
+    response = client.post('/api/memorymate/add_medicine', headers=headers, json=MEDICINE)
+    assert response.status_code == 201
+    assert response.get_json()['medicine']['id'] == 1
+    response = client.get('/api/memorymate/list_medicines/ana@example.com', headers=headers)
+    assert [m['name'] for m in response.get_json()['medicines']] == ['Aspirin']
+
+    assert client.get('/api/memorymate/list_medicines/bob@example.com', headers=headers).status_code == 403
+    assert client.delete('/api/memorymate/delete_medicine/bob@example.com/1', headers=headers).status_code == 403
+    assert client.post('/api/memorymate/add_medicine', headers=headers,
+                       json=dict(MEDICINE, email='bob@example.com')).status_code == 403
+
+    assert client.post('/api/memorymate/logout', headers=headers).status_code == 200
+    response = client.get('/api/memorymate/list_medicines/ana@example.com', headers=headers)
+    assert response.status_code == 401 and response.get_json()['error'] == 'Session revoked'
+
+
+def test_check_medicines_reads_no_user_record(client, backend, monkeypatch):
+    User.register('ana@example.com', 'Ana', 'secret')
+    headers = login(client)
+
+    def no_lookup(email):
+        raise AssertionError('check_medicines looked up the user')
+
+    monkeypatch.setattr(backend, 'get_user', no_lookup)
+    response = client.get('/api/memorymate/check_medicines/ana@example.com', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['due_medicines'] == []
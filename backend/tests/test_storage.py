@@ -0,0 +1,289 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Make backend importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import records
+import storage
+from models import Medicine, User
+
+
+def make_backend(name, tmp_path):
+    if name == 'json':
+        return storage.JSONStorage(str(tmp_path / 'users.json'), str(tmp_path / 'medicines.json'))
+    if name == 'sqlite':
+        return storage.SQLiteStorage(str(tmp_path / 'memorymate.db'))
+    return storage.ShardedStorage(str(tmp_path / 'shards'))
+
+
+@pytest.fixture(params=['json', 'sqlite', 'sharded'])
+def backend(request, tmp_path):
+    backend = make_backend(request.param, tmp_path)
+    storage.set_storage(backend)
+    yield backend
+    storage.set_storage(None)
+
+
+MEDICINE = {'name': 'Aspirin', 'dosage': '100mg', 'frequency': 'once', 'time_of_day': 'morning',
+            'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+
+
+def test_user_lifecycle(backend):
+    assert User.register(' Ana@Example.com ', 'Ana', 'secret')['success']
+    assert User.register('ana@example.com', 'Ana', 'other') == {'success': False, 'error': 'User already exists'}
+    assert User.login('ana@example.com', 'secret')['user'] == {'email': 'ana@example.com', 'name': 'Ana'}
+    assert User.login('ana@example.com', 'wrong')['error'] == 'Invalid password'
+    assert User.login('bob@example.com', 'secret')['error'] == 'User not found'
+
+    assert User.set_email_preference('ana@example.com', True)['email_notifications_enabled'] is True
+    assert User.get_user('ana@example.com')['email_notifications_enabled'] is True
+    assert not User.set_email_preference('bob@example.com', True)['success']
+
+
+def test_backends_return_the_same_user_records(backend):
+    assert backend.add_user({'email': 'ana@example.com', 'name': 'Ana', 'password': 'x'})
+    expected = {'email': 'ana@example.com', 'name': 'Ana', 'password': 'x', 'created_at': None,
+                'email_notifications_enabled': False}
+    assert backend.get_user('ana@example.com') == expected
+    assert backend.update_user('ana@example.com', {'email_notifications_enabled': True}) == \
+        dict(expected, email_notifications_enabled=True)
+    assert list(backend.iter_users()) == [dict(expected, email_notifications_enabled=True)]
+    assert backend.update_user('bob@example.com', {'name': 'Bob'}) is None
+
+
+def test_medicine_lifecycle(backend):
+    first = Medicine.add_medicine('ana@example.com', MEDICINE)['medicine']
+    second = Medicine.add_medicine('ana@example.com', dict(MEDICINE, name='Ibuprofen'))['medicine']
+    assert (first['id'], second['id']) == (1, 2)
+    assert [m['name'] for m in Medicine.get_medicines('ana@example.com')] == ['Aspirin', 'Ibuprofen']
+
+    updated = Medicine.update_medicine('ana@example.com', 2, {'dosage': ' 200mg '})
+    assert updated['medicine']['dosage'] == '200mg'
+    assert updated['medicine']['name'] == 'Ibuprofen'
+    assert Medicine.update_medicine('ana@example.com', 9, {'dosage': '1mg'})['error'] == 'Medicine not found'
+    assert Medicine.update_medicine('bob@example.com', 1, {'dosage': '1mg'})['error'] == 'No medicines found'
+
+    assert Medicine.delete_medicine('ana@example.com', 1)['success']
+    assert Medicine.delete_medicine('ana@example.com', 1)['error'] == 'Medicine not found'
+    assert [m['id'] for m in Medicine.get_medicines('ana@example.com')] == [2]
+
+
+def test_add_medicines_in_one_write(backend):
+    backend.add_medicine('ana@example.com', MEDICINE)
+    added = backend.add_medicines('ana@example.com', [dict(MEDICINE, name=f'm{i}') for i in range(50)])
+    assert [m['id'] for m in added] == list(range(2, 52))
+    assert [m['name'] for m in backend.get_medicines('ana@example.com')] == \
+        ['Aspirin'] + [f'm{i}' for i in range(50)]
+    assert backend.add_medicines('ana@example.com', []) == []
+    assert backend.add_medicine('ana@example.com', MEDICINE)['id'] == 52
+
+
+def test_medicine_ids_are_never_reused(backend, request, tmp_path):
+    for name in ('Aspirin', 'Ibuprofen', 'Vitamin D'):
+        backend.add_medicine('ana@example.com', dict(MEDICINE, name=name))
+    assert backend.delete_medicine('ana@example.com', 3)
+    assert backend.add_medicine('ana@example.com', MEDICINE)['id'] == 4
+    assert backend.delete_medicine('ana@example.com', 4)
+    assert backend.delete_medicine('ana@example.com', 2)
+    assert backend.get_medicine('ana@example.com', 1)['name'] == 'Aspirin'
+    assert backend.get_medicine('ana@example.com', 2) is None
+
+    # The counter survives a restart
+    reopened = make_backend(request.node.callspec.params['backend'], tmp_path)
+    assert reopened.add_medicine('ana@example.com', MEDICINE)['id'] == 5
+    assert [m['id'] for m in reopened.get_medicines('ana@example.com')] == [1, 5]
+
+
+def test_medicine_ids_are_not_reused_after_deleting_all(backend, request, tmp_path):
+    for name in ('Aspirin', 'Ibuprofen'):
+        backend.add_medicine('ana@example.com', dict(MEDICINE, name=name))
+    assert backend.delete_medicine('ana@example.com', 1)
+    assert backend.delete_medicine('ana@example.com', 2)
+    assert backend.get_medicines('ana@example.com') == []
+    assert backend.add_medicine('ana@example.com', MEDICINE)['id'] == 3
+
+    reopened = make_backend(request.node.callspec.params['backend'], tmp_path)
+    assert reopened.add_medicine('ana@example.com', MEDICINE)['id'] == 4
+
+
+def test_legacy_medicine_lists_are_converted(tmp_path):
+    from medicine_book import MedicineBook
+
+    legacy = [dict(MEDICINE, id=1), dict(MEDICINE, id=2, name='Ibuprofen'), dict(MEDICINE, id=2, name='Vitamin D')]
+    (tmp_path / 'medicines.json').write_text(json.dumps({'ana@example.com': legacy}))
+    backend = make_backend('json', tmp_path)
+    # Repeated ids from the old len + 1 scheme get fresh ids instead of shadowing each other
+    assert [(m['id'], m['name']) for m in backend.get_medicines('ana@example.com')] == \
+        [(1, 'Aspirin'), (2, 'Ibuprofen'), (3, 'Vitamin D')]
+    assert backend.add_medicine('ana@example.com', MEDICINE)['id'] == 4
+
+    book = MedicineBook.from_json(legacy)
+    assert MedicineBook.from_json(records.loads(records.dumps(book.to_json()))).list() == book.list()
+
+
+def test_sqlite_concurrent_writers_get_distinct_ids(tmp_path):
+    backend = storage.SQLiteStorage(str(tmp_path / 'memorymate.db'))
+
+    def add_many():
+        for _ in range(25):
+            backend.add_medicine('ana@example.com', MEDICINE)
+
+    threads = [threading.Thread(target=add_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [m['id'] for m in backend.get_medicines('ana@example.com')]
+    assert ids == list(range(1, 201))
+
+
+@pytest.mark.parametrize('target_name', ['sqlite', 'sharded'])
+def test_migrate_json(tmp_path, target_name):
+    source = make_backend('json', tmp_path)
+    for email in ('ana@example.com', 'bob@example.com'):
+        source.add_user({'email': email, 'name': 'Ana', 'password': 'secret',
+                         'created_at': '2024-01-01T00:00:00', 'email_notifications_enabled': True})
+        source.add_medicine(email, dict(MEDICINE, created_at='2024-01-01T00:00:00'))
+        source.add_medicine(email, dict(MEDICINE, name='Ibuprofen', created_at='2024-01-01T00:00:00'))
+    source.delete_medicine('bob@example.com', 2)
+
+    target = make_backend(target_name, tmp_path)
+    assert target.import_records(source.iter_users(), source.iter_medicines()) == (2, 3)
+    for email in ('ana@example.com', 'bob@example.com'):
+        assert target.get_user(email) == source.get_user(email)
+        assert target.get_medicines(email) == source.get_medicines(email)
+    assert sorted(u['email'] for u in target.iter_users()) == ['ana@example.com', 'bob@example.com']
+    # Id counters are migrated too, so bob's deleted id 2 is not handed out again
+    assert target.add_medicine('bob@example.com', MEDICINE)['id'] == 3
+
+
+def test_json_document_serves_reads_from_memory_and_sees_external_writes(tmp_path, monkeypatch):
+    path = tmp_path / 'users.json'
+    document = storage.JSONDocument(str(path), check_interval=0)
+    document.modify(lambda data: (None, data.update(ana={'name': 'Ana'}) or True))
+
+    loads = []
+    real_loads = storage.loads
+    monkeypatch.setattr(storage, 'loads', lambda raw: loads.append(1) or real_loads(raw))
+    for _ in range(10):
+        assert document.read() == {'ana': {'name': 'Ana'}}
+    assert loads == []
+
+    # Another worker replaces the file
+    other = storage.JSONDocument(str(path), check_interval=0)
+    other.modify(lambda data: (None, data.update(bob={'name': 'Bob'}) or True))
+    assert set(document.read()) == {'ana', 'bob'}
+    assert len(loads) == 2
+    assert not list(tmp_path.glob('.users.json.*'))
+
+
+def test_medicine_journal_replays_and_compacts(tmp_path):
+    from medicine_journal import MedicineJournal
+
+    path = str(tmp_path / 'medicines.json')
+    journal = MedicineJournal(path, compact_ops=0)
+    for name in ('Aspirin', 'Ibuprofen', 'Vitamin D'):
+        journal.add('ana@example.com', dict(MEDICINE, name=name))
+    journal.update('ana@example.com', 2, {'dosage': '200mg'})
+    journal.delete('ana@example.com', 1)
+    expected = journal.read()['ana@example.com'].list()
+    journal.close()
+
+    # Writes only touched the log; a crash leaves a torn record at its end
+    assert json.loads((tmp_path / 'medicines.json').read_text()) == {}
+    with open(path + '.log', 'ab') as f:
+        f.write(b'{"op":"add","email":"ana@exa')
+
+    replayed = MedicineJournal(path, compact_ops=0)
+    assert replayed.read()['ana@example.com'].list() == expected
+    replayed.add('bob@example.com', MEDICINE)
+    stale_log = (tmp_path / 'medicines.json.log').read_bytes()
+    replayed.compact()
+    assert (tmp_path / 'medicines.json.log').read_bytes() == b''
+
+    # A crash between writing the snapshot and swapping the log replays it again: still idempotent
+    (tmp_path / 'medicines.json.log').write_bytes(stale_log)
+    reopened = MedicineJournal(path, compact_ops=0)
+    assert reopened.read()['ana@example.com'].list() == expected
+    assert [m.id for m in reopened.read()['ana@example.com'].list()] == [2, 3]
+    assert len(reopened.read()['bob@example.com']) == 1
+
+
+def test_medicine_journal_background_compaction(tmp_path):
+    from medicine_journal import MedicineJournal
+
+    path = str(tmp_path / 'medicines.json')
+    journal = MedicineJournal(path, compact_ops=10)
+    for _ in range(25):
+        journal.add('ana@example.com', MEDICINE)
+    for _ in range(100):
+        if not journal._compacting:
+            break
+        time.sleep(0.01)
+
+    snapshot = json.loads((tmp_path / 'medicines.json').read_text())
+    assert len(snapshot['ana@example.com']['medicines']) >= 10
+    assert len(MedicineJournal(path, compact_ops=0).read()['ana@example.com']) == 25
+
+
+def test_sharded_layout_keeps_users_apart(tmp_path):
+    backend = make_backend('sharded', tmp_path)
+    backend.add_medicine('ana@example.com', MEDICINE)
+    backend.add_medicine('bob@example.com', MEDICINE)
+
+    shards = sorted(p.relative_to(tmp_path / 'shards') for p in (tmp_path / 'shards').rglob('*.json'))
+    assert len(shards) == 2
+    assert all(len(p.parts) == 3 and p.parts[0] == p.name[:2] and p.parts[1] == p.name[2:4] for p in shards)
+
+    def add_many(email):
+        for _ in range(25):
+            backend.add_medicine(email, MEDICINE)
+
+    threads = [threading.Thread(target=add_many, args=(email,))
+               for email in ('ana@example.com', 'bob@example.com') for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [m['id'] for m in backend.get_medicines('ana@example.com')] == list(range(1, 102))
+
+
+def _hammer_add_medicine(backend_name, tmp_path, worker, count):
+    # Each process gets its own backend instance and caches, like a gunicorn worker
+    from app import app as flask_app
+    from sessions import SESSIONS
+    storage.set_storage(make_backend(backend_name, tmp_path))
+    client = flask_app.test_client()
+    headers = {'Authorization': f"Bearer {SESSIONS.issue('ana@example.com', 'Ana')['token']}"}
+    for i in range(count):
+        r = client.post('/api/memorymate/add_medicine', headers=headers, json=dict(
+            MEDICINE, email='ana@example.com', name=f'w{worker}-{i}'))
+        assert r.status_code == 201
+        r = client.get('/api/memorymate/list_medicines/ana@example.com', headers=headers)
+        assert r.status_code == 200 and isinstance(r.get_json()['medicines'], list)
+
+
+@pytest.mark.parametrize('backend_name', ['json', 'sqlite', 'sharded'])
+def test_concurrent_workers_lose_no_updates(tmp_path, backend_name):
+    import multiprocessing
+
+    context = multiprocessing.get_context('fork')
+    workers, per_worker = 6, 30
+    make_backend(backend_name, tmp_path)
+    processes = [context.Process(target=_hammer_add_medicine, args=(backend_name, tmp_path, w, per_worker))
+                 for w in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+    assert [p.exitcode for p in processes] == [0] * workers
+
+    medicines = make_backend(backend_name, tmp_path).get_medicines('ana@example.com')
+    assert sorted(m['id'] for m in medicines) == list(range(1, workers * per_worker + 1))
+    assert {m['name'] for m in medicines} == {f'w{w}-{i}' for w in range(workers) for i in range(per_worker)}
@@ -4,8 +4,14 @@ Utility functions for disease prediction and API integration.
 
 import requests
 import logging
-from collections import defaultdict
-from typing import List, Dict, Any
+import os
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Callable, Hashable
+from prediction_cache import PredictionCache
+from knowledge_base import KnowledgeBase, KnowledgeBaseStore
+from prediction_models import MODELS, age_band, get_model
+from incremental_prediction import InvalidScoreToken, ScoreState, ScoreTokenCodec
+from email_templates import REMINDER_SUBJECT, PrerenderedMessage, render_reminder
 
 logger = logging.getLogger(__name__)
 
@@ -23,12 +29,37 @@ SYMPTOM_MAPPINGS = {
     "fatigue": ["fatigue", "tiredness"],
 }
 
-# Severity classification based on condition characteristics
-SEVERITY_MAPPING = {
-    "low": ["common cold", "allergies", "rhinitis", "headache", "minor cuts"],
-    "medium": ["flu", "bronchitis", "migraine", "gastroenteritis", "sinusitis"],
-    "high": ["pneumonia", "meningitis", "appendicitis", "heart attack", "stroke"],
-}
+# Condition knowledge base (symptom weights, severity keywords, suggestions),
+# memory-mapped from data/knowledge_base/ and hot-reloaded when rebuilt
+KNOWLEDGE_BASE = KnowledgeBaseStore(
+    check_interval=float(os.getenv('KNOWLEDGE_BASE_CHECK_INTERVAL', 2.0)),
+)
+
+# Memoized predictions keyed on canonical symptom sets
+PREDICTION_CACHE = PredictionCache(
+    max_size=int(os.getenv('PREDICTION_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('PREDICTION_CACHE_TTL', 300)),
+)
+KNOWLEDGE_BASE.add_listener(PREDICTION_CACHE.clear)
+
+# Signs incremental prediction tokens; set PREDICTION_TOKEN_SECRET so tokens
+# stay valid across workers and restarts (read when the first token is made)
+SCORE_TOKENS = ScoreTokenCodec()
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """Return the active knowledge base (reloaded if its files changed)."""
+    return KNOWLEDGE_BASE.current()
+
+
+def register_knowledge_base_listener(callback: Callable[[], None]) -> None:
+    """Register a callback to run when the knowledge tables change."""
+    KNOWLEDGE_BASE.add_listener(callback)
+
+
+def notify_knowledge_base_changed() -> None:
+    """Invalidate caches and derived state after the knowledge tables change."""
+    KNOWLEDGE_BASE.notify()
 
 
 def fetch_diseases_for_symptom(symptom: str) -> List[Dict[str, Any]]:
@@ -62,10 +93,34 @@ def fetch_diseases_for_symptom(symptom: str) -> List[Dict[str, Any]]:
         return []
 
 
+def symptom_rows(symptoms: List[str], kb: Optional[KnowledgeBase] = None) -> List[int]:
+    """
+    Map symptoms to knowledge base rows (repeats kept, unknown symptoms ignored).
+    """
+    return (kb or get_knowledge_base()).rows_for(symptoms)
+
+
+def score_conditions(symptoms: List[str], kb: Optional[KnowledgeBase] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score the conditions linked to the given symptoms.
+    
+    Args:
+        symptoms: List of symptoms
+        kb: Knowledge base to score against (defaults to the active one)
+        
+    Returns:
+        Tuple of (condition ids, aggregate scores) for every touched condition
+    """
+    kb = kb or get_knowledge_base()
+    columns, sums = kb.accumulate(kb.rows_for(symptoms))
+    
+    # Normalize by number of symptoms
+    return columns, sums / max(len(symptoms), 1)
+
+
 def aggregate_conditions(symptoms: List[str]) -> Dict[str, float]:
     """
     Aggregate conditions from multiple symptoms.
-    Uses mock data if real API isn't available.
     
     Args:
         symptoms: List of symptoms
@@ -73,80 +128,9 @@ def aggregate_conditions(symptoms: List[str]) -> Dict[str, float]:
     Returns:
         Dictionary mapping condition names to probability scores
     """
-    condition_scores = defaultdict(float)
-    
-    # Mock data for demonstration (replace with real API integration)
-    mock_conditions = {
-        "headache": {
-            "Migraine": 0.85,
-            "Tension Headache": 0.70,
-            "Cluster Headache": 0.40,
-        },
-        "fever": {
-            "Flu": 0.90,
-            "Common Cold": 0.80,
-            "Pneumonia": 0.60,
-            "COVID-19": 0.75,
-        },
-        "cough": {
-            "Common Cold": 0.75,
-            "Flu": 0.80,
-            "Bronchitis": 0.85,
-            "Pneumonia": 0.70,
-        },
-        "sore_throat": {
-            "Strep Throat": 0.80,
-            "Common Cold": 0.70,
-            "Pharyngitis": 0.75,
-        },
-        "chest_pain": {
-            "Angina": 0.80,
-            "Heart Attack": 0.60,
-            "Pneumonia": 0.50,
-        },
-        "shortness_of_breath": {
-            "Asthma": 0.85,
-            "Pneumonia": 0.75,
-            "Heart Disease": 0.70,
-        },
-        "nausea": {
-            "Gastroenteritis": 0.80,
-            "Migraine": 0.60,
-            "Food Poisoning": 0.75,
-        },
-        "diarrhea": {
-            "Gastroenteritis": 0.90,
-            "IBS": 0.60,
-            "Food Poisoning": 0.85,
-        },
-        "body_aches": {
-            "Flu": 0.85,
-            "Common Cold": 0.60,
-            "COVID-19": 0.80,
-        },
-        "fatigue": {
-            "Anemia": 0.75,
-            "Thyroid Disorder": 0.70,
-            "Depression": 0.65,
-            "COVID-19": 0.80,
-        },
-    }
-    
-    for symptom in symptoms:
-        # Normalize symptom name
-        symptom_key = symptom.lower().replace(" ", "_")
-        
-        # Get conditions for this symptom
-        if symptom_key in mock_conditions:
-            for condition, score in mock_conditions[symptom_key].items():
-                condition_scores[condition] += score
-    
-    # Normalize scores by number of symptoms
-    if symptoms:
-        for condition in condition_scores:
-            condition_scores[condition] /= len(symptoms)
-    
-    return condition_scores
+    kb = get_knowledge_base()
+    columns, scores = score_conditions(symptoms, kb)
+    return {kb.conditions[column]: score for column, score in zip(columns.tolist(), scores.tolist()) if score > 0}
 
 
 def classify_severity(condition: str) -> str:
@@ -159,15 +143,7 @@ def classify_severity(condition: str) -> str:
     Returns:
         Severity level: 'low', 'medium', or 'high'
     """
-    condition_lower = condition.lower()
-    
-    for severity, conditions in SEVERITY_MAPPING.items():
-        for cond in conditions:
-            if cond.lower() in condition_lower or condition_lower in cond.lower():
-                return severity
-    
-    # Default to medium severity
-    return "medium"
+    return get_knowledge_base().severity_resolver.resolve(condition)
 
 
 def get_severity_color(severity: str) -> str:
@@ -188,7 +164,19 @@ def get_severity_color(severity: str) -> str:
     return color_map.get(severity, "gray")
 
 
-def predict_conditions(age: int, gender: str, symptoms: List[str], top_n: int = 5) -> List[Dict[str, Any]]:
+def prediction_cache_key(age: int, gender: str, symptoms: List[str], top_n: int, model: str) -> Hashable:
+    """
+    Canonical cache key for a prediction request.
+    
+    Symptom order and spelling ("Sore Throat" vs "sore_throat") do not change
+    the result, so the key uses the sorted normalized symptoms.
+    """
+    canonical = tuple(sorted(symptom.lower().replace(" ", "_") for symptom in symptoms))
+    return canonical, str(gender).lower(), age_band(age), top_n, model
+
+
+def predict_conditions(age: int, gender: str, symptoms: List[str], top_n: int = 5,
+                       model: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Predict conditions based on age, gender, and symptoms.
     
@@ -197,6 +185,7 @@ def predict_conditions(age: int, gender: str, symptoms: List[str], top_n: int =
         gender: Patient gender (male/female)
         symptoms: List of symptoms
         top_n: Number of top conditions to return
+        model: Scoring model name (defaults to PREDICTION_MODEL)
         
     Returns:
         List of predicted conditions with probabilities and severity
@@ -204,173 +193,259 @@ def predict_conditions(age: int, gender: str, symptoms: List[str], top_n: int =
     if not symptoms:
         return []
     
-    # Aggregate conditions from symptoms
-    condition_scores = aggregate_conditions(symptoms)
+    scorer = get_model(model)
+    
+    # Picks up a rebuilt knowledge base (and clears the cache) before the lookup
+    get_knowledge_base()
+    
+    key = prediction_cache_key(age, gender, symptoms, top_n, scorer.name)
+    cached = PREDICTION_CACHE.get(key)
+    if cached is None:
+        generation = PREDICTION_CACHE.generation
+        kb = get_knowledge_base()
+        cached = _build_results(kb, scorer.rank(kb, age, gender, symptoms, top_n))
+        PREDICTION_CACHE.put(key, cached, generation)
+    
+    # Hand out copies so callers can annotate results without touching the cache
+    return [dict(condition) for condition in cached]
+
+
+def predict_conditions_batch(records: List[Dict[str, Any]], top_n: int = 5,
+                             model: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Predict conditions for many records at once.
     
-    if not condition_scores:
+    Args:
+        records: List of validated {"age", "gender", "symptoms"} dictionaries
+        top_n: Number of top conditions to return per record
+        model: Scoring model name (defaults to PREDICTION_MODEL)
+        
+    Returns:
+        List of prediction lists (same shape as predict_conditions), in input order
+    """
+    if not records:
         return []
     
-    # Age and gender adjustments (simple heuristics)
-    age_multiplier = 1.0
-    if age < 12:
-        age_multiplier = 0.9  # Children have different condition distributions
-    elif age > 65:
-        age_multiplier = 1.1  # Elderly have higher risk for chronic conditions
+    kb = get_knowledge_base()
+    rankings = get_model(model).rank_batch(kb, records, top_n)
     
-    # Build result list
-    results = []
-    for condition, score in sorted(condition_scores.items(), key=lambda x: x[1], reverse=True)[:top_n]:
-        # Normalize score to 0-1 range
-        normalized_score = min(score / 2.0, 1.0)  # Divide by 2 to normalize aggregate scores
+    # Severity and suggestions only depend on the condition, so resolve each once per batch
+    enrichment: Dict[int, Dict[str, Any]] = {}
+    return [_build_results(kb, ranking, enrichment) for ranking in rankings]
+
+
+def predict_conditions_incremental(token: Optional[str], added: List[str], removed: List[str],
+                                   age: Optional[int] = None, gender: Optional[str] = None,
+                                   top_n: int = 5, model: Optional[str] = None) -> Tuple[List[Dict[str, Any]], str, List[str]]:
+    """
+    Update a running prediction with added/removed symptoms.
+    
+    Args:
+        token: Score token from the previous call (None starts a new assessment)
+        added: Symptoms ticked since the last call
+        removed: Symptoms unticked since the last call
+        age: Patient age (required without a token, otherwise overrides it)
+        gender: Patient gender (required without a token, otherwise overrides it)
+        top_n: Number of top conditions to return
+        model: Scoring model name (defaults to the token's model, then PREDICTION_MODEL)
         
-        severity = classify_severity(condition)
+    Returns:
+        Tuple of (predicted conditions, new token, current symptoms)
         
-        results.append({
-            "name": condition,
-            "probability": round(normalized_score * 100, 1),
-            "severity": severity,
-            "color": get_severity_color(severity),
-            # suggestions will be filled by get_condition_suggestions
-            "suggestions": {}
-        })
-    
-    # Enrich each result with suggestions
-    for r in results:
-        try:
-            name = r.get('name')
-            r['suggestions'] = get_condition_suggestions(name)
-        except Exception:
-            r['suggestions'] = {}
+    Raises:
+        InvalidScoreToken: If the token was tampered with or is malformed
+    """
+    kb = get_knowledge_base()
+    
+    if token:
+        state = SCORE_TOKENS.loads(token)
+        scorer = get_model(model or state.model)
+        if age is not None:
+            state.age = age
+        if gender is not None:
+            state.gender = gender
+        # Rebuilds the sums if the knowledge base or model changed since the token was issued
+        state = state.apply(kb, scorer, added, removed)
+    else:
+        scorer = get_model(model)
+        state = ScoreState.build(kb, scorer, age, gender, added)
+    
+    conditions = _build_results(kb, state.rank(kb, scorer, top_n)) if state.symptoms else []
+    return conditions, SCORE_TOKENS.dumps(state), sorted(state.symptoms)
 
-    return results
 
+def _build_results(kb: KnowledgeBase, ranking: List[Tuple[int, float]],
+                   enrichment: Optional[Dict[int, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Turn (condition id, probability 0-1) pairs into prediction entries."""
+    enrichment = {} if enrichment is None else enrichment
+    results = []
+    for column, probability in ranking:
+        if column not in enrichment:
+            enrichment[column] = _condition_result(kb, kb.conditions[column])
+        result = dict(enrichment[column])
+        result["probability"] = round(probability * 100, 1)
+        results.append(result)
+    return results
 
 
-# Suggestions for conditions: medicines (general/supportive), diet, and precautions.
-# These are general educational suggestions for early-stage supportive care only.
-# Always advise users to consult a healthcare professional for diagnosis and prescription.
-SUGGESTIONS = {
-    "Migraine": {
-        "medicines": ["paracetamol (acetaminophen)", "ibuprofen (if tolerated)"] ,
-        "diet": ["avoid known triggers (caffeine, aged cheese, processed meats)", "stay hydrated"],
-        "precautions": ["rest in a quiet, dark room", "apply cold compress to forehead"],
-        "advice": "If headaches are sudden, severe, or accompanied by weakness, seek urgent care."
-    },
-    "Tension Headache": {
-        "medicines": ["paracetamol", "ibuprofen (if appropriate)"],
-        "diet": ["maintain regular meals and hydration"],
-        "precautions": ["practice relaxation and posture correction", "take regular breaks from screens"],
-        "advice": "Regular sleep and stress reduction often help. See a clinician if persistent."
-    },
-    "Cluster Headache": {
-        "medicines": ["seek medical review (some treatments require prescription)"],
-        "diet": ["avoid alcohol during cluster periods"],
-        "precautions": ["track attack patterns and triggers"],
-        "advice": "Cluster headaches can be severe — consult a specialist."
-    },
-    "Flu": {
-        "medicines": ["paracetamol for fever/pain", "rest and symptomatic care"],
-        "diet": ["hydration, warm broths, light easily digestible foods"],
-        "precautions": ["stay home to reduce spread", "hand hygiene and masks if needed"],
-        "advice": "If shortness of breath or high fever develops, seek medical care."
-    },
-    "Common Cold": {
-        "medicines": ["paracetamol or ibuprofen for symptoms", "saline nasal drops"],
-        "diet": ["warm fluids, honey for cough in adults/older children"],
-        "precautions": ["rest, hand hygiene, avoid close contact"],
-        "advice": "Most colds resolve in a week; see a clinician if symptoms worsen."
-    },
-    "Pneumonia": {
-        "medicines": ["medical assessment required (antibiotics may be needed)"],
-        "diet": ["maintain hydration and nutrition"],
-        "precautions": ["seek prompt medical attention for cough with fever and breathlessness"],
-        "advice": "Pneumonia can be serious — seek urgent medical care."
-    },
-    "COVID-19": {
-        "medicines": ["paracetamol for fever/pain", "follow local public health guidance"],
-        "diet": ["hydration, easy-to-digest nutritious foods"],
-        "precautions": ["isolate per guidelines, monitor breathing and oxygen levels"],
-        "advice": "Seek care for worsening breathlessness or persistent high fever."
-    },
-    "Bronchitis": {
-        "medicines": ["symptomatic care (expectorants, paracetamol)", "inhalers if previously prescribed"],
-        "diet": ["fluids and warm teas"],
-        "precautions": ["rest, avoid smoking/irritants"],
-        "advice": "See a clinician if cough is severe or prolonged."
-    },
-    "Strep Throat": {
-        "medicines": ["medical review — antibiotics may be required"],
-        "diet": ["soft, cool foods if sore throat makes swallowing painful"],
-        "precautions": ["avoid sharing utensils, practice hand hygiene"],
-        "advice": "Get a clinical assessment for sore throat with fever."
-    },
-    "Pharyngitis": {
-        "medicines": ["paracetamol for pain", "salt water gargles"],
-        "diet": ["soft, soothing foods and fluids"],
-        "precautions": ["rest voice if hoarse, seek care if severe"],
-        "advice": "If symptoms persist or worsen, consult a clinician."
-    },
-    "Angina": {
-        "medicines": ["medical review required — angina can need prescription therapy"],
-        "diet": ["heart-healthy diet (low salt, low saturated fat)"],
-        "precautions": ["seek urgent care for new/worsening chest pain"],
-        "advice": "Chest pain should be evaluated urgently."
-    },
-    "Heart Attack": {
-        "medicines": ["emergency care required — call emergency services immediately"],
-        "diet": ["N/A in emergency"],
-        "precautions": ["do not delay — seek immediate emergency care"],
-        "advice": "Immediate emergency response is essential."
-    },
-    "Asthma": {
-        "medicines": ["use prescribed inhaler (short-acting bronchodilator) if available"],
-        "diet": ["maintain hydration and avoid known food triggers"],
-        "precautions": ["avoid smoke and allergens, have inhaler accessible"],
-        "advice": "If breathing worsens despite inhaler, seek urgent care."
-    },
-    "Heart Disease": {
-        "medicines": ["medical management required — follow clinician guidance"],
-        "diet": ["heart-healthy diet, reduce salt and saturated fats"],
-        "precautions": ["monitor symptoms and seek care for chest pain or severe breathlessness"],
-        "advice": "Regular follow-up with cardiology is important."
-    },
-    "Gastroenteritis": {
-        "medicines": ["oral rehydration solutions for dehydration", "antiemetics if prescribed"],
-        "diet": ["BRAT diet (bananas, rice, applesauce, toast) initially", "avoid dairy and heavy foods"],
-        "precautions": ["maintain hydration, hand hygiene"],
-        "advice": "Seek care if unable to keep fluids down or signs of dehydration."
-    },
-    "Food Poisoning": {
-        "medicines": ["oral rehydration", "seek care if severe"],
-        "diet": ["clear fluids then bland diet as tolerated"],
-        "precautions": ["rest, avoid solid foods until vomiting subsides"],
-        "advice": "Seek medical help for high fever, bloody stools, or dehydration."
-    },
-    "IBS": {
-        "medicines": ["discuss with clinician; fibre modifications and antispasmodics may help"],
-        "diet": ["consider low-FODMAP approach with dietitian guidance"],
-        "precautions": ["track triggers, manage stress"],
-        "advice": "See a gastroenterologist or dietitian for chronic symptoms."
-    },
-    "Anemia": {
-        "medicines": ["iron supplements if diagnosed by a clinician"],
-        "diet": ["iron-rich foods (red meat, leafy greens), vitamin C to enhance absorption"],
-        "precautions": ["avoid self-medicating without testing"],
-        "advice": "Investigate causes with blood tests and clinician advice."
-    },
-    "Thyroid Disorder": {
-        "medicines": ["requires medical evaluation and blood tests"],
-        "diet": ["balanced diet, avoid excessive iodine without guidance"],
-        "precautions": ["do not self-prescribe thyroid hormone"],
-        "advice": "Get thyroid function tests and follow clinician treatment."
-    },
-    "Depression": {
-        "medicines": ["psychological support and clinician assessment for therapy/medication"],
-        "diet": ["regular nutritious meals and maintaining social contact"],
-        "precautions": ["seek help if suicidal thoughts or severe functional decline"],
-        "advice": "Contact mental health services for assessment and support."
+def _condition_result(kb: KnowledgeBase, condition: str) -> Dict[str, Any]:
+    """Build a single prediction entry with severity and suggestions."""
+    severity = kb.severity_resolver.resolve(condition)
+    
+    try:
+        suggestions = kb.suggestion_resolver.resolve(condition)
+    except Exception:
+        suggestions = {}
+    
+    return {
+        "name": condition,
+        "probability": 0.0,
+        "severity": severity,
+        "color": get_severity_color(severity),
+        "suggestions": suggestions
     }
-}
+
+
+def available_symptoms() -> List[str]:
+    """Available symptoms list, taken from the active knowledge base."""
+    return get_knowledge_base().symptoms
+
+
+def validate_prediction_input(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Validate a single {age, gender, symptoms} prediction record.
+    Shared by the prediction endpoints and the offline scoring CLI.
+    
+    Args:
+        data: Parsed JSON record
+        
+    Returns:
+        Tuple of (validated record, None) or (None, error response body)
+    """
+    if not isinstance(data, dict):
+        return None, {
+            "error": "Record must be a JSON object",
+            "status": "failed"
+        }
+    
+    # Validate required fields
+    age = data.get('age')
+    gender = data.get('gender')
+    symptoms = data.get('symptoms', [])
+    
+    # Validation
+    if age is None:
+        return None, {
+            "error": "Age is required",
+            "status": "failed"
+        }
+    
+    if not isinstance(age, int) or age < 0 or age > 150:
+        return None, {
+            "error": "Age must be a valid integer between 0 and 150",
+            "status": "failed"
+        }
+    
+    if not gender or not isinstance(gender, str) or gender.lower() not in ['male', 'female']:
+        return None, {
+            "error": "Gender must be 'male' or 'female'",
+            "status": "failed"
+        }
+    
+    if not symptoms or not isinstance(symptoms, list) or len(symptoms) == 0:
+        return None, {
+            "error": "At least one symptom is required",
+            "status": "failed"
+        }
+    
+    # Validate symptoms (hash lookups against the knowledge base symptom index)
+    symptom_index = get_knowledge_base().symptom_index
+    invalid_symptoms = [s for s in symptoms if not isinstance(s, str) or s.lower() not in symptom_index]
+    if invalid_symptoms:
+        return None, {
+            "error": f"Invalid symptoms: {invalid_symptoms}",
+            "status": "failed",
+            "available_symptoms": available_symptoms()
+        }
+    
+    model = data.get('model')
+    if model is not None and (not isinstance(model, str) or model not in MODELS):
+        return None, {
+            "error": f"Unknown model '{model}'",
+            "status": "failed",
+            "available_models": sorted(MODELS)
+        }
+    
+    return {"age": age, "gender": gender, "symptoms": symptoms, "model": model}, None
+
+
+def validate_incremental_input(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Validate an incremental {token, add, remove, age, gender, model} request.
+    Age and gender are required only when no token is given.
+    
+    Args:
+        data: Parsed JSON body
+        
+    Returns:
+        Tuple of (validated request, None) or (None, error response body)
+    """
+    if not isinstance(data, dict):
+        return None, {
+            "error": "Request must be a JSON object",
+            "status": "failed"
+        }
+    
+    token = data.get('token')
+    if token is not None and (not isinstance(token, str) or not token):
+        return None, {
+            "error": "Token must be a non-empty string",
+            "status": "failed"
+        }
+    
+    age = data.get('age')
+    gender = data.get('gender')
+    if token is None or age is not None:
+        if not isinstance(age, int) or age < 0 or age > 150:
+            return None, {
+                "error": "Age must be a valid integer between 0 and 150",
+                "status": "failed"
+            }
+    if token is None or gender is not None:
+        if not gender or not isinstance(gender, str) or gender.lower() not in ['male', 'female']:
+            return None, {
+                "error": "Gender must be 'male' or 'female'",
+                "status": "failed"
+            }
+    
+    delta = {}
+    symptom_index = get_knowledge_base().symptom_index
+    for field in ('add', 'remove'):
+        symptoms = data.get(field, [])
+        if not isinstance(symptoms, list):
+            return None, {
+                "error": f"'{field}' must be a list of symptoms",
+                "status": "failed"
+            }
+        invalid_symptoms = [s for s in symptoms if not isinstance(s, str) or s.lower() not in symptom_index]
+        if invalid_symptoms:
+            return None, {
+                "error": f"Invalid symptoms: {invalid_symptoms}",
+                "status": "failed",
+                "available_symptoms": available_symptoms()
+            }
+        delta[field] = symptoms
+    
+    model = data.get('model')
+    if model is not None and (not isinstance(model, str) or model not in MODELS):
+        return None, {
+            "error": f"Unknown model '{model}'",
+            "status": "failed",
+            "available_models": sorted(MODELS)
+        }
+    
+    return {"token": token, "age": age, "gender": gender, "add": delta['add'],
+            "remove": delta['remove'], "model": model}, None
 
 
 def get_condition_suggestions(condition: str) -> Dict[str, Any]:
@@ -378,27 +453,13 @@ def get_condition_suggestions(condition: str) -> Dict[str, Any]:
     Return supportive suggestions for a condition: medicines, diet, precautions, and advice.
     This is educational and not a substitute for professional medical advice.
     """
-    # Try direct match, then case-insensitive contains match
-    if condition in SUGGESTIONS:
-        return SUGGESTIONS[condition]
-
-    cond_lower = condition.lower()
-    for key, val in SUGGESTIONS.items():
-        if key.lower() in cond_lower or cond_lower in key.lower():
-            return val
-
-    # Default generic supportive suggestions
-    return {
-        "medicines": ["paracetamol for fever/pain as needed"],
-        "diet": ["stay hydrated, eat light nutritious meals"],
-        "precautions": ["rest and monitor symptoms, seek care if worsening"],
-        "advice": "Consult a healthcare professional for diagnosis and treatment."
-    }
+    return get_knowledge_base().suggestion_resolver.resolve(condition)
 
 
 def send_medicine_reminder_email(mail, recipient_email: str, user_name: str, medicines: List[Dict[str, Any]]) -> bool:
     """
-    Send medicine reminder email to user.
+    Send medicine reminder email to user (blocks on SMTP; the routes queue
+    reminders through mailer.MailQueue instead).
     
     Args:
         mail: Flask-Mail instance
@@ -410,92 +471,7 @@ def send_medicine_reminder_email(mail, recipient_email: str, user_name: str, med
         True if email sent successfully, False otherwise
     """
     try:
-        from flask_mail import Message
-        
-        # Build medicine list HTML
-        medicine_html = ""
-        for med in medicines:
-            medicine_html += f"""
-            <tr>
-                <td style="padding: 12px; border-bottom: 1px solid #ddd;">
-                    <strong>{med.get('name', 'Unknown')}</strong>
-                </td>
-                <td style="padding: 12px; border-bottom: 1px solid #ddd;">
-                    {med.get('dosage', 'N/A')}
-                </td>
-                <td style="padding: 12px; border-bottom: 1px solid #ddd;">
-                    {med.get('frequency', 'N/A')}
-                </td>
-            </tr>
-            """
-        
-        # Create email HTML body
-        html_body = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; background: #f9f9f9; }}
-                    .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; text-align: center; }}
-                    .content {{ background: white; padding: 20px; }}
-                    .medicine-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                    .medicine-table th {{ background: #667eea; color: white; padding: 12px; text-align: left; }}
-                    .footer {{ background: #f0f0f0; padding: 15px; text-align: center; font-size: 12px; color: #666; border-radius: 0 0 8px 8px; }}
-                    .button {{ background: #667eea; color: white; padding: 10px 20px; text-decoration: none; border-radius: 4px; display: inline-block; margin-top: 15px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>💊 MemoryMate Medicine Reminder</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hi <strong>{user_name}</strong>,</p>
-                        <p>This is your medicine reminder from MemoryMate. The following medicines are due now:</p>
-                        
-                        <table class="medicine-table">
-                            <thead>
-                                <tr>
-                                    <th>Medicine Name</th>
-                                    <th>Dosage</th>
-                                    <th>Frequency</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                                {medicine_html}
-                            </tbody>
-                        </table>
-                        
-                        <p><strong>⏰ Action Required:</strong> Please take your medications as prescribed.</p>
-                        <p>If you have any questions about your medicines, consult your healthcare provider.</p>
-                        
-                        <center>
-                            <a href="http://localhost:3000/memorymate" class="button">View MemoryMate Dashboard</a>
-                        </center>
-                        
-                        <p style="margin-top: 30px; font-size: 12px; color: #999;">
-                            You're receiving this email because you have medicine reminders enabled in MemoryMate.
-                        </p>
-                    </div>
-                    <div class="footer">
-                        <p>MemoryMate © 2025 - Your Personal Health Assistant</p>
-                        <p><a href="http://localhost:3000" style="color: #667eea; text-decoration: none;">Visit MemoryMate</a></p>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-        
-        # Create message
-        msg = Message(
-            subject="💊 MemoryMate - Medicine Reminder",
-            recipients=[recipient_email],
-            html=html_body,
-            sender="MemoryMate <noreply@memorymate.com>"
-        )
-        
-        # Send email
-        mail.send(msg)
+        mail.send(build_medicine_reminder_message(recipient_email, user_name, medicines))
         logger.info(f"Medicine reminder email sent successfully to {recipient_email}")
         return True
         
@@ -503,3 +479,25 @@ def send_medicine_reminder_email(mail, recipient_email: str, user_name: str, med
         logger.error(f"Failed to send medicine reminder email to {recipient_email}: {str(e)}")
         return False
 
+
+def build_medicine_reminder_message(recipient_email: str, user_name: str, medicines: List[Dict[str, Any]]):
+    """
+    Build the medicine reminder email from the precompiled templates.
+    
+    Args:
+        recipient_email: User's email address
+        user_name: User's name for personalization
+        medicines: List of medicine dictionaries with name, dosage, frequency
+        
+    Returns:
+        Flask-Mail message with HTML and plain-text parts
+    """
+    html_body, text_body = render_reminder(user_name, medicines)
+    return PrerenderedMessage(
+        subject=REMINDER_SUBJECT,
+        recipients=[recipient_email],
+        body=text_body,
+        html=html_body,
+        sender="MemoryMate <noreply@memorymate.com>"
+    )
+
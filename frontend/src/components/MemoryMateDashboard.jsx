@@ -1,16 +1,20 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 
 /**
  * MemoryMate Medicine Dashboard Component
  */
-export default function MemoryMateDashboard({ userEmail, onLogout }) {
+export default function MemoryMateDashboard({ userEmail, sessionToken, onLogout }) {
+  // Every MemoryMate call after login carries the session token
+  const api = axios.create({ headers: { Authorization: `Bearer ${sessionToken}` } });
   const [medicines, setMedicines] = useState([]);
   const [showForm, setShowForm] = useState(false);
   const [notificationEnabled, setNotificationEnabled] = useState(
     'Notification' in window && Notification.permission === 'granted'
   );
   const [emailNotificationsEnabled, setEmailNotificationsEnabled] = useState(false);
+  // Read by the event stream handlers, which outlive a render
+  const emailNotificationsRef = useRef(false);
   const [formData, setFormData] = useState({
     name: '',
     dosage: '',
@@ -29,16 +33,51 @@ export default function MemoryMateDashboard({ userEmail, onLogout }) {
     // Load email preference
     loadEmailPreference();
     loadMedicines();
-    // Check for medicine reminders every minute
+    // Due medicines are pushed over Server-Sent Events (EventSource cannot set
+    // headers, so the session token goes in the query string)
+    if ('EventSource' in window) {
+      const events = new EventSource(
+        `http://localhost:5000/api/memorymate/events/${userEmail}?token=${encodeURIComponent(sessionToken)}`
+      );
+      // Events arriving together (on connect, or from one scheduler tick) are
+      // handled as one batch, with at most one email request per batch
+      let pending = [];
+      let flushTimer = null;
+      const flushDueEvents = () => {
+        flushTimer = null;
+        const due = pending;
+        pending = [];
+        notifyDueMedicines(due);
+        if (emailNotificationsRef.current) {
+          sendReminderEmail();
+        }
+      };
+      events.addEventListener('due', (event) => {
+        pending.push(JSON.parse(event.data));
+        if (flushTimer === null) {
+          flushTimer = setTimeout(flushDueEvents, 2000);
+        }
+      });
+      events.addEventListener('expired', () => events.close());
+      return () => {
+        clearTimeout(flushTimer);
+        events.close();
+      };
+    }
+    // Without EventSource, check for medicine reminders every minute
     const interval = setInterval(checkMedicineReminders, 60000);
     // Also check immediately on load
     checkMedicineReminders();
     return () => clearInterval(interval);
   }, []);
 
+  useEffect(() => {
+    emailNotificationsRef.current = emailNotificationsEnabled;
+  }, [emailNotificationsEnabled]);
+
   const loadMedicines = async () => {
     try {
-      const response = await axios.get(
+      const response = await api.get(
         `http://localhost:5000/api/memorymate/list_medicines/${userEmail}`
       );
       setMedicines(response.data.medicines || []);
@@ -49,7 +88,7 @@ export default function MemoryMateDashboard({ userEmail, onLogout }) {
 
   const loadEmailPreference = async () => {
     try {
-      const response = await axios.get(
+      const response = await api.get(
         `http://localhost:5000/api/memorymate/email_preference/${userEmail}`
       );
       setEmailNotificationsEnabled(response.data.email_notifications_enabled || false);
@@ -61,7 +100,7 @@ export default function MemoryMateDashboard({ userEmail, onLogout }) {
   const toggleEmailNotifications = async () => {
     try {
       const newStatus = !emailNotificationsEnabled;
-      const response = await axios.post(
+      const response = await api.post(
         `http://localhost:5000/api/memorymate/email_preference/${userEmail}`,
         { enabled: newStatus }
       );
@@ -77,41 +116,54 @@ export default function MemoryMateDashboard({ userEmail, onLogout }) {
 
   const checkMedicineReminders = async () => {
     try {
-      const response = await axios.get(
-        `http://localhost:5000/api/memorymate/check_medicines/${userEmail}?send_email=${emailNotificationsEnabled}`
+      const response = await api.get(
+        `http://localhost:5000/api/memorymate/check_medicines/${userEmail}?send_email=${emailNotificationsRef.current}`
       );
-      const dueMedicines = response.data.due_medicines || [];
+      notifyDueMedicines(response.data.due_medicines || []);
       
-      if (dueMedicines.length > 0) {
-        dueMedicines.forEach(med => {
-          // Show browser notification if permission granted
-          if ('Notification' in window && Notification.permission === 'granted') {
-            try {
-              new Notification('💊 MemoryMate Medicine Reminder', {
-                body: med.message,
-                icon: '⚕️',
-                tag: `medicine-${med.name}`,
-                requireInteraction: true,
-                badge: '💊'
-              });
-            } catch (notifErr) {
-              console.error('Notification error:', notifErr);
-            }
-          }
-          // Always show toast alert as backup
-          showToast(med.message);
-        });
-        
-        // Log email status
-        if (response.data.email_sent) {
-          console.log('Email notification sent successfully');
-        }
+      // Log email status
+      if (response.data.email_sent) {
+        console.log('Email notification sent successfully');
       }
     } catch (err) {
       console.error('Error checking medicines:', err);
     }
   };
 
+  const sendReminderEmail = async () => {
+    try {
+      const response = await api.get(
+        `http://localhost:5000/api/memorymate/check_medicines/${userEmail}?send_email=true`
+      );
+      if (response.data.email_sent) {
+        console.log('Email notification sent successfully');
+      }
+    } catch (err) {
+      console.error('Error sending reminder email:', err);
+    }
+  };
+
+  const notifyDueMedicines = (dueMedicines) => {
+    dueMedicines.forEach(med => {
+      // Show browser notification if permission granted
+      if ('Notification' in window && Notification.permission === 'granted') {
+        try {
+          new Notification('💊 MemoryMate Medicine Reminder', {
+            body: med.message,
+            icon: '⚕️',
+            tag: `medicine-${med.name}`,
+            requireInteraction: true,
+            badge: '💊'
+          });
+        } catch (notifErr) {
+          console.error('Notification error:', notifErr);
+        }
+      }
+      // Always show toast alert as backup
+      showToast(med.message);
+    });
+  };
+
   const showToast = (message) => {
     // Enhanced toast notification
     const toast = document.createElement('div');
@@ -174,7 +226,7 @@ export default function MemoryMateDashboard({ userEmail, onLogout }) {
     setError('');
 
     try {
-      const response = await axios.post(
+      const response = await api.post(
         'http://localhost:5000/api/memorymate/add_medicine',
         {
           email: userEmail,
@@ -204,7 +256,7 @@ export default function MemoryMateDashboard({ userEmail, onLogout }) {
 
   const handleDeleteMedicine = async (medicineId) => {
     try {
-      const response = await axios.delete(
+      const response = await api.delete(
         `http://localhost:5000/api/memorymate/delete_medicine/${userEmail}/${medicineId}`
       );
 
@@ -38,7 +38,7 @@ export default function MemoryMateLogin({ onLoginSuccess }) {
       if (response.data.success) {
         // Ensure we pass email and name separately to the parent
         const user = response.data.user || {};
-        onLoginSuccess(user.email || formData.email, user.name || formData.name);
+        onLoginSuccess(user.email || formData.email, user.name || formData.name, response.data.token);
         setFormData({ email: '', password: '', name: '' });
       } else {
         setError(response.data.error || 'Operation failed');
@@ -1,4 +1,5 @@
 import React, { useState } from 'react';
+import axios from 'axios';
 import MemoryMateLogin from '../components/MemoryMateLogin';
 import MemoryMateDashboard from '../components/MemoryMateDashboard';
 
@@ -8,15 +9,25 @@ import MemoryMateDashboard from '../components/MemoryMateDashboard';
 export default function MemoryMatePage() {
   const [userEmail, setUserEmail] = useState(null);
   const [userName, setUserName] = useState(null);
+  const [sessionToken, setSessionToken] = useState(null);
 
-  const handleLoginSuccess = (email, name) => {
+  const handleLoginSuccess = (email, name, token) => {
     setUserEmail(email);
     setUserName(name);
+    setSessionToken(token);
   };
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    try {
+      await axios.post('http://localhost:5000/api/memorymate/logout', null, {
+        headers: { Authorization: `Bearer ${sessionToken}` }
+      });
+    } catch (err) {
+      // The token expires on its own; log out locally regardless
+    }
     setUserEmail(null);
     setUserName(null);
+    setSessionToken(null);
   };
 
   return (
@@ -28,7 +39,7 @@ export default function MemoryMatePage() {
           </div>
         ) : (
           <div className="max-w-4xl mx-auto">
-            <MemoryMateDashboard userEmail={userEmail} onLogout={handleLogout} />
+            <MemoryMateDashboard userEmail={userEmail} sessionToken={sessionToken} onLogout={handleLogout} />
           </div>
         )}
       </div>
@@ -43,6 +43,26 @@ export const predictConditions = async (data) => {
   }
 };
 
+/**
+ * Update a running prediction with only the symptoms that changed
+ * @param {Object} data - Incremental prediction data
+ * @param {string} [data.token] - Token from the previous response (omit on the first call)
+ * @param {number} [data.age] - Patient age (required without a token)
+ * @param {string} [data.gender] - Patient gender (required without a token)
+ * @param {Array<string>} [data.add] - Symptoms added since the last call
+ * @param {Array<string>} [data.remove] - Symptoms removed since the last call
+ * @returns {Promise} Conditions, current symptoms and the next token
+ */
+export const predictIncremental = async (data) => {
+  try {
+    const response = await apiClient.post('/predict/incremental', data);
+    return response.data;
+  } catch (error) {
+    console.error('Error updating prediction:', error);
+    throw error.response?.data || error;
+  }
+};
+
 /**
  * Health check endpoint
  * @returns {Promise} Health status